@@ -0,0 +1,94 @@
+"""
+Benchmark: crawl-over-crawl diff of two synthetic crawls.
+
+Writes two crawls' columns to a temporary directory (the head re-crawls
+most base pages with shifted inlinks and depth, drops some and adds new
+ones), then times interning the URL keys (first diff of a crawl), the
+join and summary with keys already saved, and streaming every changed
+row. Peak RSS is reported after each step.
+
+Usage (from backend/):
+    python benchmarks/crawl_diff.py [--pages 2000000] [--batch-size 5000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from columns import CrawlColumns
+from diff import CrawlDiff, url_keys
+
+
+def synthetic_rows(urls, rng: np.random.Generator):
+    """SOURCE_COLUMNS rows for sorted URLs, with power-law inlinks."""
+    nb_inlinks = np.minimum(rng.zipf(1.6, len(urls)) - 1, 100_000).tolist()
+    depth = rng.integers(1, 10, len(urls)).tolist()
+    status = np.where(rng.random(len(urls)) < 0.95, 200, 404).tolist()
+    for url, inlinks, page_depth, status_code in zip(urls, nb_inlinks, depth, status):
+        yield url, None, inlinks, page_depth, status_code, 500, True, 1, False
+
+
+def synthetic_crawls(num_pages: int, directory: str, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    base_urls = [f"https://squareup.com/us/en/page-{i}" for i in range(num_pages)]
+    # 90% of base pages kept (some with a trailing slash), 10% replaced by new pages
+    kept = rng.random(num_pages) < 0.9
+    head_urls = [
+        url + '/' if i % 7 == 0 else url for i, url in enumerate(base_urls) if kept[i]
+    ] + [f"https://squareup.com/us/en/new-{i}" for i in range(num_pages - int(kept.sum()))]
+
+    for crawl_id, urls in (('base', base_urls), ('head', head_urls)):
+        urls.sort()
+        CrawlColumns.from_rows(crawl_id, synthetic_rows(urls, rng)).save(os.path.join(directory, crawl_id))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, default=2_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='diff-') as directory:
+        # Written by a child process, so peak RSS below is the diff's own
+        started = time.perf_counter()
+        writer = multiprocessing.Process(target=synthetic_crawls, args=(args.pages, directory))
+        writer.start()
+        writer.join()
+        print(f"{args.pages} pages per crawl, written in {time.perf_counter() - started:.1f}s")
+
+        base_path, head_path = os.path.join(directory, 'base'), os.path.join(directory, 'head')
+        base, head = CrawlColumns.load('base', base_path), CrawlColumns.load('head', head_path)
+
+        started = time.perf_counter()
+        url_keys(base, base_path)
+        url_keys(head, head_path)
+        print(f"  intern URL keys  {time.perf_counter() - started:7.2f}s  (peak RSS {peak_rss_mb():.0f} MB)")
+
+        # Keys are now saved next to the columns, as after a crawl's first diff
+        base.crawl_id, head.crawl_id = base_path, head_path
+        started = time.perf_counter()
+        diff = CrawlDiff(base, head, base.status_code == 200, head.status_code == 200)
+        summary = diff.summary()
+        print(f"  join + summary   {time.perf_counter() - started:7.2f}s  (peak RSS {peak_rss_mb():.0f} MB)")
+
+        started = time.perf_counter()
+        rows = sum(len(batch) for batch in diff.iter_rows(args.batch_size))
+        print(f"  stream rows      {time.perf_counter() - started:7.2f}s  {rows} rows  "
+              f"(peak RSS {peak_rss_mb():.0f} MB)")
+        print(f"  {summary['pages']}")
+
+
+if __name__ == '__main__':
+    main()
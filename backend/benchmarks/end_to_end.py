@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark of the dashboard endpoints against the fake OnCrawl API.
+
+Starts benchmarks/fake_oncrawl.py and the backend (uvicorn main:app) as
+separate processes on free ports, with a throwaway database directory.
+For each crawl size it measures, live from the fake API and then from a
+local snapshot:
+
+    metrics         GET /api/dashboard/metrics
+    priority_pages  GET /api/dashboard/priority-pages
+    summary         GET /api/oncrawl/crawl/{crawl_id}/summary (get_technical_summary)
+
+The first request of each endpoint is timed on its own (cold: nothing
+cached yet), then `--requests` requests are sent `--concurrency` at a time
+for p50 / p99 latency and throughput. Results are written as JSON so runs
+can be compared with --compare.
+
+Usage (from backend/):
+    python benchmarks/end_to_end.py [--pages 10000 100000 1000000] [--requests 200] [--concurrency 8]
+        [--latency 20] [--rate-429 0.01] [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Any
+
+import httpx
+import numpy as np
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Generous: live priority pages of a 2M page crawl page through every gap page first
+REQUEST_TIMEOUT = 1800
+
+MODES = ['live', 'snapshot']
+
+
+def endpoints(crawl_id: str, market: str) -> Dict[str, str]:
+    return {
+        'metrics': f"/api/dashboard/metrics?crawl_id={crawl_id}&market={market}",
+        'priority_pages': f"/api/dashboard/priority-pages?crawl_id={crawl_id}&market={market}&limit=100",
+        'summary': f"/api/oncrawl/crawl/{crawl_id}/summary"
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_process(args: List[str], env: Dict[str, str], ready_url: str, log_path: str) -> subprocess.Popen:
+    """Start a server process and wait until `ready_url` answers."""
+    log = open(log_path, 'w')
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{args[1]} exited with {process.returncode}; see {log_path}")
+        try:
+            httpx.get(ready_url, timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{args[1]} did not start within 60s; see {log_path}")
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Cold latency of one request, then latency percentiles and throughput of `requests` more."""
+    started = time.perf_counter()
+    resp = await client.get(path)
+    cold = time.perf_counter() - started
+    if resp.status_code != 200:
+        raise RuntimeError(f"GET {path} returned {resp.status_code}: {resp.text[:200]}")
+
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            request_started = time.perf_counter()
+            resp = await client.get(path)
+            latencies.append(time.perf_counter() - request_started)
+            if resp.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        'cold_ms': round(cold * 1000, 2),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'mean_ms': round(float(ms.mean()), 2),
+        'throughput_rps': round(requests / elapsed, 1),
+        'requests': requests,
+        'errors': errors
+    }
+
+
+async def run_size(base_url: str, num_pages: int, args) -> Dict[str, Any]:
+    crawl_id = f"bench-{num_pages}"
+    results: Dict[str, Any] = {'pages': num_pages, 'crawl_id': crawl_id, 'modes': {}}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT, limits=limits) as client:
+        for mode in args.modes:
+            if mode == 'snapshot':
+                started = time.perf_counter()
+                resp = await client.post(f"/api/snapshots/{crawl_id}/sync")
+                if resp.status_code != 200 or not resp.json().get('success'):
+                    raise RuntimeError(f"Snapshot sync failed: {resp.text[:200]}")
+                results['sync_seconds'] = round(time.perf_counter() - started, 2)
+                print(f"  synced {num_pages} pages in {results['sync_seconds']}s")
+
+            results['modes'][mode] = {}
+            for name, path in endpoints(crawl_id, args.market).items():
+                stats = await measure(client, path, args.requests, args.concurrency)
+                results['modes'][mode][name] = stats
+                print(f"  {mode:8} {name:15} cold {stats['cold_ms']:9.1f} ms  p50 {stats['p50_ms']:8.1f} ms  "
+                      f"p99 {stats['p99_ms']:8.1f} ms  {stats['throughput_rps']:7.1f} req/s"
+                      + (f"  {stats['errors']} errors" if stats['errors'] else ""))
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], previous_path: str) -> None:
+    """Print p50 / p99 / throughput changes against an earlier results file."""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {
+        (size['pages'], mode, name): stats
+        for size in previous['sizes']
+        for mode, named in size['modes'].items()
+        for name, stats in named.items()
+    }
+    print(f"\nCompared with {previous_path} (commit {previous.get('git_commit')}):")
+    for size in current['sizes']:
+        for mode, named in size['modes'].items():
+            for name, stats in named.items():
+                old = before.get((size['pages'], mode, name))
+                if old is None:
+                    continue
+                changes = [
+                    f"{key} {old[key]:.1f} -> {stats[key]:.1f} ({(stats[key] - old[key]) / old[key] * 100:+.0f}%)"
+                    for key in ('p50_ms', 'p99_ms', 'throughput_rps')
+                    if old[key]
+                ]
+                print(f"  {size['pages']:>8} {mode:8} {name:15} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10_000, 100_000], help="Crawl sizes to run")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--market', default='us')
+    parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=20, help="Mean fake API latency per request (ms)")
+    parser.add_argument('--rate-429', type=float, default=0, help="Fraction of fake API requests answered with 429")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/end_to_end-<time>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"end_to_end-{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        fake_port, backend_port = free_port(), free_port()
+        fake = start_process(
+            [sys.executable, 'benchmarks/fake_oncrawl.py', '--port', str(fake_port), '--pages', str(args.pages[0]),
+             '--latency', str(args.latency), '--rate-429', str(args.rate_429)],
+            {},
+            f"http://127.0.0.1:{fake_port}/stats",
+            os.path.join(workdir, 'fake_oncrawl.log')
+        )
+        backend = None
+        try:
+            backend = start_process(
+                [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(backend_port), '--log-level', 'warning'],
+                {
+                    'ONCRAWL_BASE_URL': f"http://127.0.0.1:{fake_port}/api/v2",
+                    'ONCRAWL_API_TOKEN': 'benchmark',
+                    'ONCRAWL_PROJECT_ID': 'bench',
+                    'CRAWL_WATCH_INTERVAL': '0',
+                    'DATABASE_PATH': os.path.join(workdir, 'data', 'cache.db')
+                },
+                f"http://127.0.0.1:{backend_port}/health",
+                os.path.join(workdir, 'backend.log')
+            )
+
+            sizes = []
+            for num_pages in args.pages:
+                print(f"{num_pages} pages:")
+                sizes.append(asyncio.run(run_size(f"http://127.0.0.1:{backend_port}", num_pages, args)))
+            fake_stats = httpx.get(f"http://127.0.0.1:{fake_port}/stats").json()
+        finally:
+            for process in (backend, fake):
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=30)
+
+    results = {
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'market': args.market,
+            'latency_ms': args.latency,
+            'rate_429': args.rate_429
+        },
+        'fake_api': fake_stats,
+        'sizes': sizes
+    }
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
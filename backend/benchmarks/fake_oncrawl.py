@@ -0,0 +1,335 @@
+"""
+Offline stand-in for the OnCrawl v2 Data API, serving synthetic crawls.
+
+Implements the endpoints the backend calls (/projects, /crawls/{id},
+/data/crawl/{id}/pages, /pages/aggs, /pages/fields and /links) under
+/api/v2, with OQL filters, sorting and offset paging. Crawl `bench-<n>`
+has n pages whose inlink counts follow a power law; its links are
+generated to match those counts. Latency and a 429 rate can be injected
+to exercise the client's retries.
+
+Usage (from backend/):
+    python benchmarks/fake_oncrawl.py [--port 8900] [--pages 100000] [--latency 20] [--rate-429 0.01]
+
+Then point the backend at it with ONCRAWL_BASE_URL=http://127.0.0.1:8900/api/v2.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Any
+
+import numpy as np
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+MARKETS = ['us', 'ca', 'gb', 'au', 'ie', 'es', 'jp', 'fr']
+TOPICS = ['payments', 'point of sale', 'invoices', 'payroll', 'online store', 'appointments']
+
+# Crawls kept generated at once, and filtered/sorted row lists kept per crawl
+CRAWL_CACHE_SIZE = 1
+SELECTION_CACHE_SIZE = 32
+
+
+class SyntheticCrawl:
+    """
+    A deterministic synthetic crawl of `num_pages` pages.
+
+    About `orphan_rate` of pages have no inlinks; the rest have a Zipf
+    distributed count (exponent `inlink_exponent`), so most pages have a
+    few inlinks and a handful have thousands. Deeper pages have fewer
+    inlinks, and about 2% of pages are on an excluded community domain.
+    """
+
+    def __init__(
+        self,
+        crawl_id: str,
+        num_pages: int,
+        seed: int = 0,
+        orphan_rate: float = 0.05,
+        inlink_exponent: float = 2.1
+    ):
+        self.crawl_id = crawl_id
+        self.num_pages = num_pages
+        rng = np.random.default_rng(seed)
+
+        inlinks = np.minimum(rng.zipf(inlink_exponent, num_pages), max(num_pages - 1, 1))
+        inlinks[rng.random(num_pages) < orphan_rate] = 0
+        depth = 1 + rng.poisson(4.0 / np.log2(2 + inlinks))
+        depth[0] = 1
+
+        markets = rng.integers(0, len(MARKETS), num_pages)
+        community = rng.random(num_pages) < 0.02
+        topics = rng.integers(0, len(TOPICS), num_pages)
+        self.urls = [
+            f"https://{'community.squareup.com' if community[i] else 'squareup.com'}"
+            f"/{MARKETS[markets[i]]}/en/page-{i}"
+            for i in range(num_pages)
+        ]
+        self.urls[0] = 'https://squareup.com/us/en'
+        self.titles = [f"Page {i} about {TOPICS[topics[i]]}" for i in range(num_pages)]
+        self.columns: Dict[str, np.ndarray] = {
+            'nb_inlinks': inlinks.astype(np.int64),
+            'depth': depth.astype(np.int64),
+            'status_code': rng.choice([200, 301, 404], num_pages, p=[0.92, 0.05, 0.03]),
+            'word_count': rng.lognormal(6.5, 0.6, num_pages).astype(np.int64),
+            'in_sitemap': rng.random(num_pages) < 0.85,
+            'fetched': np.ones(num_pages, dtype=bool)
+        }
+        # Position of each page in URL order (sort key and tiebreak)
+        self.url_rank = np.empty(num_pages, dtype=np.int64)
+        self.url_rank[np.argsort(np.array(self.urls))] = np.arange(num_pages)
+
+        self._page_columns = {**self.columns, 'url': self.url_rank}
+        self._seed = seed
+        self._links: Optional[Dict[str, np.ndarray]] = None
+        self._link_columns: Optional[Dict[str, np.ndarray]] = None
+        self._selections: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Requests are answered on worker threads
+        self._lock = threading.Lock()
+
+    # ============== Pages ==============
+
+    def _mask(self, oql: Optional[Dict[str, Any]], columns: Dict[str, np.ndarray]) -> np.ndarray:
+        if not oql:
+            return np.ones(len(next(iter(columns.values()))), dtype=bool)
+        if 'and' in oql:
+            mask = self._mask(None, columns)
+            for condition in oql['and']:
+                mask &= self._mask(condition, columns)
+            return mask
+        if 'or' in oql:
+            mask = ~self._mask(None, columns)
+            for condition in oql['or']:
+                mask |= self._mask(condition, columns)
+            return mask
+
+        field, op, value = oql['field']
+        if field not in columns:
+            raise HTTPException(status_code=400, detail=f"Unsupported OQL field: {field}")
+        column = columns[field]
+        if op == 'equals':
+            return column == value
+        if op in ('gt', 'gte', 'lt', 'lte'):
+            return getattr(np, {'gt': 'greater', 'gte': 'greater_equal', 'lt': 'less', 'lte': 'less_equal'}[op])(
+                column, value
+            )
+        raise HTTPException(status_code=400, detail=f"Unsupported OQL operator: {op}")
+
+    def _select(self, kind: str, oql, sort, columns: Dict[str, np.ndarray], tiebreak: np.ndarray) -> np.ndarray:
+        """Row numbers matching `oql` in `sort` order, cached per query."""
+        key = json.dumps([kind, oql, sort], sort_keys=True)
+        with self._lock:
+            rows = self._selections.get(key)
+            if rows is not None:
+                self._selections.move_to_end(key)
+                return rows
+
+        rows = np.flatnonzero(self._mask(oql, columns))
+        # np.lexsort sorts by the last key first
+        keys = [tiebreak[rows]]
+        for item in reversed(sort or []):
+            values = columns[item['field']][rows].astype(np.int64)
+            keys.append(-values if item.get('order') == 'desc' else values)
+        rows = rows[np.lexsort(keys)]
+
+        with self._lock:
+            self._selections[key] = rows
+            if len(self._selections) > SELECTION_CACHE_SIZE:
+                self._selections.popitem(last=False)
+        return rows
+
+    def _page_value(self, field: str, i: int) -> Any:
+        if field == 'url':
+            return self.urls[i]
+        if field == 'title':
+            return self.titles[i]
+        return self.columns[field][i].item()
+
+    def query_pages(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self._select('pages', payload.get('oql'), payload.get('sort'), self._page_columns, self.url_rank)
+        offset, limit = payload.get('offset', 0), payload.get('limit', 100)
+        fields = payload.get('fields') or ['url']
+        return {
+            'meta': {'total_hits': len(rows)},
+            'urls': [
+                {field: self._page_value(field, i) for field in fields}
+                for i in rows[offset:offset + limit].tolist()
+            ]
+        }
+
+    def aggregate(self, aggs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        results = []
+        for agg in aggs:
+            mask = self._mask(agg.get('oql'), self.columns)
+            fields = agg.get('fields')
+            if not fields:
+                results.append({'cols': ['count'], 'rows': [[int(np.count_nonzero(mask))]]})
+                continue
+            name = fields[0]['name']
+            values = self.columns[name][mask]
+            if 'ranges' in fields[0]:
+                rows = []
+                for bucket in fields[0]['ranges']:
+                    selected = np.ones(len(values), dtype=bool)
+                    if 'from' in bucket:
+                        selected &= values >= bucket['from']
+                    if 'to' in bucket:
+                        selected &= values < bucket['to']
+                    rows.append([bucket['name'], int(np.count_nonzero(selected))])
+            else:
+                unique, counts = np.unique(values, return_counts=True)
+                rows = [[value, count] for value, count in zip(unique.tolist(), counts.tolist())]
+            results.append({'cols': [name, 'count'], 'rows': rows})
+        return {'aggs': results}
+
+    # ============== Links ==============
+
+    @property
+    def links(self) -> Dict[str, np.ndarray]:
+        """One link per inlink of every page, from random origins (generated on first use)."""
+        with self._lock:
+            if self._links is None:
+                rng = np.random.default_rng(self._seed + 1)
+                inlinks = self.columns['nb_inlinks']
+                destination = np.repeat(np.arange(self.num_pages), inlinks)
+                origin = rng.integers(0, self.num_pages, len(destination))
+                follow = rng.random(len(destination)) > 0.1
+                self._links = {'origin': origin, 'destination': destination, 'follow': follow}
+                # Sorting by URL means sorting by each end's URL rank
+                self._link_columns = {
+                    'origin': self.url_rank[origin],
+                    'destination': self.url_rank[destination],
+                    'follow': follow
+                }
+        return self._links
+
+    def _link_value(self, field: str, i: int) -> Any:
+        links = self.links
+        if field in ('origin', 'destination'):
+            return self.urls[links[field][i]]
+        if field == 'type':
+            return 'internal'
+        return links[field][i].item()
+
+    def query_links(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        links = self.links
+        rows = self._select(
+            'links', payload.get('oql'), payload.get('sort'), self._link_columns, np.arange(len(links['origin']))
+        )
+        offset, limit = payload.get('offset', 0), payload.get('limit', 100)
+        fields = payload.get('fields') or ['origin', 'destination']
+        return {
+            'meta': {'total_hits': len(rows)},
+            'urls': [
+                {field: self._link_value(field, i) for field in fields}
+                for i in rows[offset:offset + limit].tolist()
+            ]
+        }
+
+
+def create_app(
+    default_pages: int = 100_000,
+    latency_ms: float = 0,
+    rate_429: float = 0,
+    retry_after: float = 0,
+    seed: int = 0
+) -> FastAPI:
+    """
+    The fake API app. Crawl `bench-<n>` has n pages; the one project's
+    last crawl is `bench-<default_pages>`.
+    """
+    app = FastAPI(title="Fake OnCrawl API")
+    router = APIRouter(prefix="/api/v2")
+    crawls: "OrderedDict[str, SyntheticCrawl]" = OrderedDict()
+    stats = {'requests': 0, 'throttled': 0}
+    rng = random.Random(seed)
+
+    def get_crawl(crawl_id: str) -> SyntheticCrawl:
+        crawl = crawls.get(crawl_id)
+        if crawl is None:
+            prefix, _, size = crawl_id.rpartition('-')
+            if prefix != 'bench' or not size.isdigit() or int(size) < 1:
+                raise HTTPException(status_code=404, detail="Crawl not found")
+            while len(crawls) >= CRAWL_CACHE_SIZE:
+                crawls.popitem(last=False)
+            crawl = crawls[crawl_id] = SyntheticCrawl(crawl_id, int(size), seed)
+        return crawl
+
+    @app.middleware("http")
+    async def inject_latency_and_throttling(request: Request, call_next):
+        stats['requests'] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000 * rng.uniform(0.5, 1.5))
+        if rate_429 and request.url.path.startswith('/api/v2') and rng.random() < rate_429:
+            stats['throttled'] += 1
+            return JSONResponse({'error': 'rate limited'}, status_code=429, headers={'Retry-After': str(retry_after)})
+        return await call_next(request)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @router.get("/projects")
+    async def list_projects():
+        return {'projects': [{'id': 'bench', 'name': 'Benchmark', 'last_crawl_id': f"bench-{default_pages}"}]}
+
+    @router.get("/crawls/{crawl_id}")
+    async def crawl_details(crawl_id: str):
+        crawl = get_crawl(crawl_id)
+        return {'crawl': {
+            'id': crawl_id,
+            'project_id': 'bench',
+            'status': 'done',
+            'link_status': 'live',
+            'crawl_config': {'start_url': crawl.urls[0]}
+        }}
+
+    @router.get("/data/crawl/{crawl_id}/pages/fields")
+    async def page_fields(crawl_id: str):
+        crawl = get_crawl(crawl_id)
+        return {'fields': [{'name': name} for name in ('url', 'title', *crawl.columns)]}
+
+    @router.post("/data/crawl/{crawl_id}/pages")
+    async def pages(crawl_id: str, request: Request):
+        crawl = get_crawl(crawl_id)
+        return await asyncio.to_thread(crawl.query_pages, await request.json())
+
+    @router.post("/data/crawl/{crawl_id}/pages/aggs")
+    async def aggs(crawl_id: str, request: Request):
+        crawl = get_crawl(crawl_id)
+        return await asyncio.to_thread(crawl.aggregate, (await request.json()).get('aggs', []))
+
+    @router.post("/data/crawl/{crawl_id}/links")
+    async def links(crawl_id: str, request: Request):
+        crawl = get_crawl(crawl_id)
+        return await asyncio.to_thread(crawl.query_links, await request.json())
+
+    app.include_router(router)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--pages', type=int, default=100_000, help="Pages of the project's last crawl")
+    parser.add_argument('--latency', type=float, default=0, help="Mean added latency per request (ms)")
+    parser.add_argument('--rate-429', type=float, default=0, help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=0, help="Retry-After of 429 responses (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        create_app(args.pages, args.latency, args.rate_429, args.retry_after, args.seed),
+        host=args.host, port=args.port, log_level='warning'
+    )
+
+
+if __name__ == '__main__':
+    main()
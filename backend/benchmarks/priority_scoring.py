@@ -0,0 +1,134 @@
+"""
+Benchmark: vectorized priority ranking vs the per-page dict loop it replaced.
+
+Builds synthetic orphaned / low-inlinks / deep-page results, checks that
+rank_priority_pages returns exactly the pages, order and scores of the
+original loop, then times both.
+
+Usage (from backend/):
+    python benchmarks/priority_scoring.py [--pages 300000] [--limit 5000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from link_graph import LinkGraph
+from priority import calculate_priority, rank_priority_pages
+
+
+MARKETS = ['us', 'ca', 'gb', 'au', 'ie', 'es', 'jp', 'fr']
+
+
+def synthetic_results(num_pages: int, seed: int = 0):
+    """Gap query results shaped like the Data API's, with overlapping deep pages."""
+    rng = random.Random(seed)
+    orphaned, low_inlinks, deep_pages = [], [], []
+    for i in range(num_pages):
+        host = 'community.squareup.com' if i % 50 == 0 else 'squareup.com'
+        page = {
+            'url': f"https://{host}/{rng.choice(MARKETS)}/en/page-{i}",
+            'nb_inlinks': rng.choice([0, 0, 1, 2, 3, 5, 12]),
+            'depth': rng.randint(1, 9),
+            'status_code': 200
+        }
+        if page['nb_inlinks'] == 0:
+            orphaned.append(page)
+        elif page['nb_inlinks'] <= 3:
+            low_inlinks.append(page)
+        if page['depth'] >= 4:
+            deep_pages.append(dict(page))
+    return [
+        ('orphaned', {'urls': orphaned}),
+        ('low_inlinks', {'urls': low_inlinks}),
+        ('deep_page', {'urls': deep_pages})
+    ]
+
+
+def synthetic_graph(gap_results, seed: int = 0) -> LinkGraph:
+    urls = sorted({page['url'] for _, result in gap_results for page in result['urls']})
+    graph = LinkGraph('bench', urls, np.zeros(len(urls) + 1, dtype=np.int64),
+                      np.zeros(0, dtype=np.int32), np.zeros(0, dtype=bool))
+    graph.link_equity = np.random.default_rng(seed).random(len(urls))
+    return graph
+
+
+def legacy_rank(gap_results, include, limit, graph=None):
+    """The priority-pages merge loop as it was before vectorization."""
+    if graph is not None:
+        for _, result in gap_results:
+            for page in result.get('urls', []):
+                page['link_equity'] = round(graph.link_equity_of(page.get('url')), 4)
+
+    all_pages = {}
+    for gap, result in gap_results:
+        for page in result.get('urls', []):
+            url = page.get('url')
+            if url and include(url):
+                if url in all_pages:
+                    all_pages[url]['technical_gaps'].append(gap)
+                    all_pages[url]['priority_score'] = calculate_priority(
+                        page, all_pages[url]['technical_gaps']
+                    )
+                else:
+                    all_pages[url] = {
+                        **page,
+                        'technical_gaps': [gap],
+                        'priority_score': calculate_priority(page, [gap])
+                    }
+
+    return sorted(all_pages.values(), key=lambda x: x.get('priority_score', 0), reverse=True)[:limit]
+
+
+def us_market(url: str) -> bool:
+    return '/us/' in url.lower() and 'community.squareup.com' not in url.lower()
+
+
+def global_market(url: str) -> bool:
+    return 'community.squareup.com' not in url.lower()
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, default=300_000)
+    parser.add_argument('--limit', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    gap_results = synthetic_results(args.pages)
+    rows = sum(len(result['urls']) for _, result in gap_results)
+    print(f"{args.pages} pages, {rows} gap rows, limit {args.limit}")
+
+    graph = synthetic_graph(gap_results)
+    for market, include in (('global', global_market), ('us', us_market)):
+        for label, link_graph in (('no link equity', None), ('link equity', graph)):
+            # Fresh rows each time: the legacy loop writes link_equity into them
+            gap_results = synthetic_results(args.pages)
+            expected = legacy_rank(gap_results, include, args.limit, link_graph)
+            actual = rank_priority_pages(gap_results, include, args.limit, link_graph)
+            assert actual == expected, f"vectorized ranking differs from the original ({market}, {label})"
+
+            legacy = best_of(args.repeat, lambda: legacy_rank(gap_results, include, args.limit, link_graph))
+            vectorized = best_of(
+                args.repeat, lambda: rank_priority_pages(gap_results, include, args.limit, link_graph)
+            )
+            print(f"market={market}, {label}: legacy {legacy * 1000:.0f} ms, "
+                  f"vectorized {vectorized * 1000:.0f} ms ({legacy / vectorized:.1f}x), identical results")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+In-memory response cache and request coalescing for OnCrawl Data API calls.
+
+Entries are keyed on (endpoint, crawl_id, canonical payload) and stored as
+raw response bytes, so every hit is decoded into a fresh object that callers
+can mutate freely, and the memory bound is an exact byte count.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Hashable, Callable, Awaitable
+
+
+CacheKey = Tuple[str, str, str]
+
+# A TTL of None means the entry never expires (only LRU eviction removes it)
+NEVER_EXPIRES = None
+
+
+def make_key(endpoint: str, crawl_id: Optional[str], payload: Optional[Dict[str, Any]] = None) -> CacheKey:
+    """Build a cache key; payloads that differ only in key order map to the same entry."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':')) if payload else ''
+    return (endpoint, crawl_id or '', canonical)
+
+
+class ResponseCache:
+    """TTL + LRU cache of response bodies, bounded by total stored bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """Return the decoded cached response, or None on a miss or expired entry."""
+        endpoint = key[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            body, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+                return json.loads(body)
+            self._remove(key)
+        self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+        return None
+
+    def set(self, key: CacheKey, body: bytes, ttl: Optional[float]) -> None:
+        """Store a response body for `ttl` seconds (None = until evicted)."""
+        if ttl is not None and ttl <= 0:
+            return
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (body, expires_at)
+        self._bytes += len(body)
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_crawl(self, crawl_id: str) -> int:
+        """Drop every entry for a crawl. Returns the number removed."""
+        keys = [key for key in self._entries if key[1] == crawl_id]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per endpoint plus overall size."""
+        total_hits = sum(self.hits.values())
+        total_misses = sum(self.misses.values())
+        lookups = total_hits + total_misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_ratio': round(total_hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'by_endpoint': {
+                endpoint: {
+                    'hits': self.hits.get(endpoint, 0),
+                    'misses': self.misses.get(endpoint, 0)
+                }
+                for endpoint in sorted(set(self.hits) | set(self.misses))
+            }
+        }
+
+    def _remove(self, key: CacheKey) -> None:
+        body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller starts the work; callers arriving before it finishes
+    await the same task and receive the same result (or exception). The task
+    is shielded, so a cancelled caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,202 @@
+"""
+Columnar, memory-mapped copies of snapshotted crawls.
+
+Each snapshotted crawl is also written as one fixed-width NumPy array per
+page field (missing values stored as -1) plus UTF-8 string tables for URLs
+and titles, as .npy files under data/columns/<crawl_id>/. Rows are in URL
+order. The files are memory-mapped read-only, so opening a crawl costs a
+few milliseconds whatever its size, pages are only paged in when a query
+touches them, and every worker process maps the same copy from the OS page
+cache. Queries build Python dicts only for the pages they return.
+"""
+
+import bisect
+import os
+import shutil
+from array import array
+from typing import Optional, Dict, List, Any, Iterable
+
+import numpy as np
+
+from config import config
+
+
+# Stored value of missing integer fields
+MISSING = -1
+
+# Bits of the `flags` column
+FLAG_IN_SITEMAP = 1
+FLAG_NOT_IN_SITEMAP = 2
+# Excluded domain, or not classified (neither passes a market filter)
+FLAG_EXCLUDED = 4
+FLAG_HAS_TITLE = 8
+
+# Integer columns and their dtypes
+INT_COLUMNS = {
+    'nb_inlinks': np.int32,
+    'depth': np.int32,
+    'status_code': np.int16,
+    'word_count': np.int32
+}
+
+COLUMN_ARRAYS = [
+    *INT_COLUMNS, 'flags', 'market_mask', 'url_offsets', 'url_blob', 'title_offsets', 'title_blob'
+]
+
+# Column order of the rows passed to CrawlColumns.from_rows
+SOURCE_COLUMNS = [
+    'url', 'title', 'nb_inlinks', 'depth', 'status_code', 'word_count', 'in_sitemap',
+    'market_mask', 'excluded'
+]
+
+
+def columns_dir() -> str:
+    """Directory holding columnar crawls (next to the snapshot database)."""
+    return os.path.join(os.path.dirname(config.DATABASE_PATH) or '.', 'columns')
+
+
+def columns_path(crawl_id: str) -> str:
+    return os.path.join(columns_dir(), crawl_id)
+
+
+class StringTable:
+    """Strings stored as one UTF-8 blob plus int64 offsets (string i is blob[offsets[i]:offsets[i + 1]])."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def take(self, rows: np.ndarray) -> List[str]:
+        """Strings at the given row numbers, in order."""
+        blob = memoryview(self.blob)
+        starts = self.offsets[rows].tolist()
+        ends = self.offsets[rows + 1].tolist()
+        return [bytes(blob[start:end]).decode('utf-8') for start, end in zip(starts, ends)]
+
+
+def _string_table(encoded: List[bytes]) -> tuple:
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+class CrawlColumns:
+    """The pages of one crawl, one array per field, in URL order."""
+
+    def __init__(self, crawl_id: str, arrays: Dict[str, np.ndarray]):
+        self.crawl_id = crawl_id
+        self.arrays = arrays
+        self.nb_inlinks = arrays['nb_inlinks']
+        self.depth = arrays['depth']
+        self.status_code = arrays['status_code']
+        self.word_count = arrays['word_count']
+        self.flags = arrays['flags']
+        self.market_mask = arrays['market_mask']
+        self.urls = StringTable(arrays['url_offsets'], arrays['url_blob'])
+        self.titles = StringTable(arrays['title_offsets'], arrays['title_blob'])
+
+    @property
+    def num_pages(self) -> int:
+        return len(self.nb_inlinks)
+
+    @classmethod
+    def from_rows(cls, crawl_id: str, rows: Iterable[tuple]) -> "CrawlColumns":
+        """Build from (SOURCE_COLUMNS) tuples, which must already be in URL order."""
+        ints = {name: array('q') for name in INT_COLUMNS}
+        flags = array('B')
+        market_masks = array('q')
+        urls: List[bytes] = []
+        titles: List[bytes] = []
+
+        for url, title, nb_inlinks, depth, status_code, word_count, in_sitemap, market_mask, excluded in rows:
+            for name, value in zip(INT_COLUMNS, (nb_inlinks, depth, status_code, word_count)):
+                ints[name].append(MISSING if value is None else value)
+            flag = 0
+            if in_sitemap is not None:
+                flag |= FLAG_IN_SITEMAP if in_sitemap else FLAG_NOT_IN_SITEMAP
+            if excluded is None or excluded:
+                flag |= FLAG_EXCLUDED
+            if title is not None:
+                flag |= FLAG_HAS_TITLE
+            flags.append(flag)
+            market_masks.append(market_mask or 0)
+            urls.append(url.encode('utf-8'))
+            titles.append(b'' if title is None else title.encode('utf-8'))
+
+        arrays = {name: np.array(values, dtype=INT_COLUMNS[name]) for name, values in ints.items()}
+        arrays['flags'] = np.array(flags, dtype=np.uint8)
+        arrays['market_mask'] = np.array(market_masks, dtype=np.int64)
+        arrays['url_offsets'], arrays['url_blob'] = _string_table(urls)
+        arrays['title_offsets'], arrays['title_blob'] = _string_table(titles)
+        return cls(crawl_id, arrays)
+
+    # ============== Rows ==============
+
+    def column(self, field: str, rows: np.ndarray) -> List[Any]:
+        """A page field at the given row numbers, as the snapshot database returns it (None when missing)."""
+        if field == 'url':
+            return self.urls.take(rows)
+        flags = self.flags[rows].tolist()
+        if field == 'title':
+            return [
+                title if flag & FLAG_HAS_TITLE else None
+                for title, flag in zip(self.titles.take(rows), flags)
+            ]
+        if field == 'in_sitemap':
+            return [
+                True if flag & FLAG_IN_SITEMAP else (False if flag & FLAG_NOT_IN_SITEMAP else None)
+                for flag in flags
+            ]
+        return [None if value == MISSING else value for value in self.arrays[field][rows].tolist()]
+
+    def row_of(self, url: str) -> Optional[int]:
+        """Row number of a URL (rows are in URL order), or None if it is not in the crawl."""
+        row = bisect.bisect_left(self.urls, url)
+        return row if row < self.num_pages and self.urls[row] == url else None
+
+    def pages(self, rows: np.ndarray, fields: List[str]) -> List[Dict[str, Any]]:
+        """Dicts of `fields` for the given row numbers, in order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = [self.column(field, rows) for field in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    # ============== Persistence ==============
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write every column as an .npy file, replacing the crawl's directory atomically."""
+        directory = path or columns_path(self.crawl_id)
+        # Per-process temp directory, so concurrent workers never write into each other's
+        tmp_directory = f"{directory}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        for name in COLUMN_ARRAYS:
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), self.arrays[name])
+
+        # Readers that already mapped the old files keep them until they let go
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        return directory
+
+    @classmethod
+    def load(cls, crawl_id: str, path: Optional[str] = None) -> "CrawlColumns":
+        """Memory-map a saved crawl (read-only; nothing is read until queried)."""
+        directory = path or columns_path(crawl_id)
+        return cls(crawl_id, {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in COLUMN_ARRAYS
+        })
+
+    @staticmethod
+    def exists(crawl_id: str, path: Optional[str] = None) -> bool:
+        directory = path or columns_path(crawl_id)
+        return all(os.path.exists(os.path.join(directory, f"{name}.npy")) for name in COLUMN_ARRAYS)
+
+    @staticmethod
+    def delete(crawl_id: str, path: Optional[str] = None) -> None:
+        shutil.rmtree(path or columns_path(crawl_id), ignore_errors=True)
@@ -13,7 +13,30 @@ class Config:
     # OnCrawl API
     ONCRAWL_API_TOKEN = os.getenv("ONCRAWL_API_TOKEN", "")
     ONCRAWL_PROJECT_ID = os.getenv("ONCRAWL_PROJECT_ID", "")
-    ONCRAWL_BASE_URL = "https://app.oncrawl.com/api/v2"
+    ONCRAWL_BASE_URL = os.getenv("ONCRAWL_BASE_URL", "https://app.oncrawl.com/api/v2")
+    ONCRAWL_MAX_CONNECTIONS = int(os.getenv("ONCRAWL_MAX_CONNECTIONS", 20))
+    ONCRAWL_MAX_CONCURRENCY = int(os.getenv("ONCRAWL_MAX_CONCURRENCY", 8))
+    
+    # OnCrawl rate limiting and retries
+    ONCRAWL_RATE_LIMIT = float(os.getenv("ONCRAWL_RATE_LIMIT", 10))  # requests/second
+    ONCRAWL_RATE_BURST = float(os.getenv("ONCRAWL_RATE_BURST", 20))
+    ONCRAWL_MAX_RETRIES = int(os.getenv("ONCRAWL_MAX_RETRIES", 5))
+    ONCRAWL_BACKOFF_BASE = float(os.getenv("ONCRAWL_BACKOFF_BASE", 0.5))  # seconds
+    ONCRAWL_BACKOFF_MAX = float(os.getenv("ONCRAWL_BACKOFF_MAX", 30))  # seconds
+    
+    # OnCrawl response cache
+    ONCRAWL_CACHE_MAX_BYTES = int(os.getenv("ONCRAWL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Seconds per endpoint; crawl data (pages/aggs/links/fields) of 'done' crawls never expires
+    ONCRAWL_CACHE_TTLS = {
+        'projects': 300,
+        'crawl': 30,
+        'pages': 60,
+        'aggs': 60,
+        'links': 60,
+        'fields': 300
+    }
+    # Seconds to cache the details of a done or archived crawl, whose status no longer changes often
+    ONCRAWL_FINISHED_CRAWL_TTL = float(os.getenv("ONCRAWL_FINISHED_CRAWL_TTL", 3600))
     
     # Server
     HOST = os.getenv("HOST", "127.0.0.1")
@@ -22,6 +45,45 @@ class Config:
     # Database
     DATABASE_PATH = os.getenv("DATABASE_PATH", "data/cache.db")
     
+    # Link equity (internal PageRank)
+    PAGERANK_DAMPING = float(os.getenv("PAGERANK_DAMPING", 0.85))
+    PAGERANK_TOLERANCE = float(os.getenv("PAGERANK_TOLERANCE", 1e-6))
+    PAGERANK_MAX_ITER = int(os.getenv("PAGERANK_MAX_ITER", 100))
+    # Max priority boost for pages with the least link equity (0.2 = +20%)
+    LINK_EQUITY_WEIGHT = float(os.getenv("LINK_EQUITY_WEIGHT", 0.2))
+    
+    # Relevance engine (TF-IDF recommendations)
+    # Optional page text per crawl: <CORPUS_DIR>/<crawl_id>.jsonl of {"url", "title", "h1", "text"}
+    CORPUS_DIR = os.getenv("CORPUS_DIR", "data/corpus")
+    # Target pages per blocked sparse similarity product
+    RELEVANCE_BLOCK_SIZE = int(os.getenv("RELEVANCE_BLOCK_SIZE", 512))
+    
+    # MinHash/LSH index (candidate preselection and near-duplicates)
+    MINHASH_NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", 128))
+    # Rows per LSH band: few rows = high recall (candidates), many rows = high precision (duplicates)
+    LSH_CANDIDATE_ROWS = int(os.getenv("LSH_CANDIDATE_ROWS", 2))
+    LSH_DUPLICATE_ROWS = int(os.getenv("LSH_DUPLICATE_ROWS", 8))
+    # Estimated Jaccard similarity at which two pages count as near-duplicates
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+    
+    # Background jobs (batch recommendations)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 1))
+    # Target pages per process-pool task; smaller chunks mean finer progress and cancellation
+    JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", 64))
+    # Finished jobs (and their results) kept in memory
+    JOB_HISTORY = int(os.getenv("JOB_HISTORY", 20))
+    
+    # Live priority pages (crawls without a snapshot): rows read per gap query,
+    # so each dashboard request makes one upstream call per gap (exports read every row)
+    LIVE_PRIORITY_QUERY_LIMIT = int(os.getenv("LIVE_PRIORITY_QUERY_LIMIT", 1000))
+    
+    # Streaming exports: pages read per batch, and gzip level (1 = fastest, 9 = smallest)
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+    EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", 6))
+    
+    # Crawl watcher: seconds between status checks of configured crawls (0 = disabled)
+    CRAWL_WATCH_INTERVAL = float(os.getenv("CRAWL_WATCH_INTERVAL", 300))
+    
     # Thresholds (defaults from criteria doc)
     DEFAULT_INLINK_THRESHOLD = 5
     DEFAULT_RANKING_DROP_THRESHOLD = 5
@@ -0,0 +1,292 @@
+"""
+Crawl-over-crawl diffs of two snapshotted crawls.
+
+Pages of a base and a head crawl are joined on their normalised URL. Each
+crawl's URLs are normalised and interned once as 64-bit keys, saved next
+to its columns (crawls never change, so the keys are computed once per
+sync). The join sorts the keys of one crawl and binary-searches the other
+(np.unique / np.searchsorted), and every delta, gap label and aggregate is
+computed on arrays, so memory stays at a few dozen bytes per page. Only
+the rows of the batch being streamed are built as dicts.
+"""
+
+import hashlib
+import os
+from typing import Optional, Dict, List, Any, Iterator
+
+import numpy as np
+
+from columns import CrawlColumns, MISSING, columns_path
+from priority import PRIORITY_GAPS, MASK_GAPS
+from simulate import LOW_INLINKS_MAX, DEEP_PAGE_MIN_DEPTH
+
+
+URL_KEYS_FILE = 'url_keys.npy'
+
+# URLs decoded at a time while computing keys
+KEY_BATCH_SIZE = 100_000
+
+# Delta of a field missing in either crawl (any int32 difference is a real delta)
+NO_DELTA = np.iinfo(np.int64).min
+
+
+def normalise_url(url: bytes) -> bytes:
+    """
+    Join key of a UTF-8 URL: scheme and host lowercased, fragment dropped
+    and trailing slashes stripped from the path (the query string is kept).
+    """
+    url = url.split(b'#', 1)[0]
+    scheme, sep, rest = url.partition(b'://')
+    if not sep:
+        scheme, rest = b'', url
+    host, _, path = rest.partition(b'/')
+    path, question, query = path.partition(b'?')
+    return b''.join((scheme.lower(), sep, host.lower(), b'/', path.rstrip(b'/'), question, query))
+
+
+def url_keys(columns: CrawlColumns, path: Optional[str] = None) -> np.ndarray:
+    """
+    Interned normalised URL of every row, as int64 hashes. Saved in the
+    crawl's columns directory on first use and memory-mapped after that.
+    """
+    directory = path or columns_path(columns.crawl_id)
+    filename = os.path.join(directory, URL_KEYS_FILE)
+    if os.path.exists(filename):
+        keys = np.load(filename, mmap_mode='r')
+        if len(keys) == columns.num_pages:
+            return keys
+
+    keys = np.empty(columns.num_pages, dtype=np.int64)
+    offsets = columns.urls.offsets
+    for start in range(0, columns.num_pages, KEY_BATCH_SIZE):
+        stop = min(start + KEY_BATCH_SIZE, columns.num_pages)
+        bounds = (offsets[start:stop + 1] - offsets[start]).tolist()
+        blob = columns.urls.blob[offsets[start]:offsets[stop]].tobytes()
+        keys[start:stop] = np.frombuffer(b''.join([
+            hashlib.blake2b(normalise_url(blob[begin:end]), digest_size=8).digest()
+            for begin, end in zip(bounds, bounds[1:])
+        ]), dtype=np.int64)
+    if os.path.isdir(directory):
+        tmp_filename = f"{filename}.tmp{os.getpid()}.npy"
+        np.save(tmp_filename, keys)
+        os.replace(tmp_filename, filename)
+    return keys
+
+
+def _gap_masks(columns: CrawlColumns, rows: np.ndarray) -> np.ndarray:
+    """PRIORITY_GAPS bitmask of each row, with the dashboard's thresholds."""
+    nb_inlinks = columns.nb_inlinks[rows]
+    depth = columns.depth[rows]
+    masks = np.zeros(len(rows), dtype=np.int64)
+    masks[nb_inlinks == 0] |= 1 << PRIORITY_GAPS.index('orphaned')
+    masks[(nb_inlinks > 0) & (nb_inlinks <= LOW_INLINKS_MAX)] |= 1 << PRIORITY_GAPS.index('low_inlinks')
+    masks[depth >= DEEP_PAGE_MIN_DEPTH] |= 1 << PRIORITY_GAPS.index('deep_page')
+    return masks
+
+
+def _first_of_each_key(keys: np.ndarray, rows: np.ndarray) -> tuple:
+    """
+    Sorted distinct keys and, for each, the first of `rows` (URL order)
+    with that key; later duplicates of a normalised URL are ignored.
+    """
+    unique, first = np.unique(keys[rows], return_index=True)
+    return unique, rows[first]
+
+
+def _lookup(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Position of each key in `sorted_keys`, or -1 when absent."""
+    if len(sorted_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_keys, keys)
+    positions[positions == len(sorted_keys)] = 0
+    return np.where(sorted_keys[positions] == keys, positions, -1)
+
+
+def _aligned(values: np.ndarray, matched: np.ndarray, fill: int) -> np.ndarray:
+    """Values of the matched head pages spread over all head pages, `fill` for the rest."""
+    aligned = np.full(len(matched), fill, dtype=np.int64)
+    aligned[matched] = values
+    return aligned
+
+
+def _delta(base: np.ndarray, head: np.ndarray) -> np.ndarray:
+    """head - base, NO_DELTA where either side is missing."""
+    return np.where((base == MISSING) | (head == MISSING), NO_DELTA, head.astype(np.int64) - base)
+
+
+class CrawlDiff:
+    """
+    The joined pages of two crawls, restricted to the `selected` rows of each.
+
+    `head_rows` are the head's pages in URL order and `base_match` the base
+    row of each (-1 for added pages); the deltas and gap masks are aligned
+    with them. `removed_rows` are base pages with no head page.
+    """
+
+    def __init__(
+        self,
+        base: CrawlColumns,
+        head: CrawlColumns,
+        base_selected: np.ndarray,
+        head_selected: np.ndarray
+    ):
+        self.base = base
+        self.head = head
+
+        head_row_keys = url_keys(head)
+        base_keys, base_first = _first_of_each_key(url_keys(base), np.flatnonzero(base_selected))
+        head_keys, head_first = _first_of_each_key(head_row_keys, np.flatnonzero(head_selected))
+        self.head_rows = np.sort(head_first)
+        positions = _lookup(base_keys, head_row_keys[self.head_rows])
+        self.matched = positions >= 0
+        self.base_match = np.full(len(self.head_rows), -1, dtype=np.int64)
+        self.base_match[self.matched] = base_first[positions[self.matched]]
+        self.removed_rows = np.sort(base_first[_lookup(head_keys, base_keys) < 0])
+        self.base_total = len(base_keys)
+        self.head_total = len(head_keys)
+
+        # Added pages compare against a missing base page with no gaps
+        base_matched = self.base_match[self.matched]
+        base_inlinks = _aligned(base.nb_inlinks[base_matched], self.matched, MISSING)
+        base_depth = _aligned(base.depth[base_matched], self.matched, MISSING)
+        head_inlinks = head.nb_inlinks[self.head_rows]
+        head_depth = head.depth[self.head_rows]
+        self.nb_inlinks_delta = _delta(base_inlinks, head_inlinks)
+        self.depth_delta = _delta(base_depth, head_depth)
+        self.base_gaps = _aligned(_gap_masks(base, base_matched), self.matched, 0)
+        self.head_gaps = _gap_masks(head, self.head_rows)
+        self.changed = self.matched & (
+            (base_inlinks != head_inlinks) | (base_depth != head_depth) | (self.base_gaps != self.head_gaps)
+        )
+
+    # ============== Summary ==============
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate movement between the two crawls."""
+        inlinks_delta = self.nb_inlinks_delta[self.nb_inlinks_delta != NO_DELTA]
+        depth_delta = self.depth_delta[self.depth_delta != NO_DELTA]
+        base_gaps = self.base_gaps[self.matched]
+        head_gaps = self.head_gaps[self.matched]
+
+        gaps = {}
+        for bit, gap in enumerate(PRIORITY_GAPS):
+            before = (base_gaps >> bit) & 1 == 1
+            after = (head_gaps >> bit) & 1 == 1
+            gaps[gap] = {
+                'base': int(np.count_nonzero(before)),
+                'head': int(np.count_nonzero(after)),
+                'gained': int(np.count_nonzero(after & ~before)),
+                'resolved': int(np.count_nonzero(before & ~after))
+            }
+
+        moved = base_gaps != head_gaps
+        transitions, counts = np.unique(
+            base_gaps[moved] * (1 << len(PRIORITY_GAPS)) + head_gaps[moved], return_counts=True
+        )
+        orphaned_bit = 1 << PRIORITY_GAPS.index('orphaned')
+
+        return {
+            'pages': {
+                'base': self.base_total,
+                'head': self.head_total,
+                'matched': int(np.count_nonzero(self.matched)),
+                'added': int(np.count_nonzero(~self.matched)),
+                'removed': len(self.removed_rows),
+                'changed': int(np.count_nonzero(self.changed))
+            },
+            'nb_inlinks': {
+                'gained': int(np.count_nonzero(inlinks_delta > 0)),
+                'lost': int(np.count_nonzero(inlinks_delta < 0)),
+                'net_change': int(inlinks_delta.sum())
+            },
+            'depth': {
+                'deeper': int(np.count_nonzero(depth_delta > 0)),
+                'shallower': int(np.count_nonzero(depth_delta < 0))
+            },
+            'newly_orphaned': gaps['orphaned']['gained'],
+            'no_longer_orphaned': gaps['orphaned']['resolved'],
+            'added_orphaned': int(np.count_nonzero(self.head_gaps[~self.matched] & orphaned_bit)),
+            'gaps': gaps,
+            'gap_transitions': [
+                {
+                    'from': MASK_GAPS[int(transition) >> len(PRIORITY_GAPS)],
+                    'to': MASK_GAPS[int(transition) & ((1 << len(PRIORITY_GAPS)) - 1)],
+                    'pages': int(count)
+                }
+                for transition, count in sorted(zip(transitions, counts), key=lambda item: -item[1])
+            ]
+        }
+
+    # ============== Rows ==============
+
+    def _head_page_rows(self, positions: np.ndarray) -> List[Dict[str, Any]]:
+        """Rows of the head pages at `positions` of head_rows (added, changed or unchanged)."""
+        head_rows = self.head_rows[positions]
+        matched = self.matched[positions]
+        base_rows = self.base_match[positions][matched]
+        base_pages = zip(
+            self.base.urls.take(base_rows),
+            self.base.column('nb_inlinks', base_rows),
+            self.base.column('depth', base_rows)
+        )
+
+        rows = []
+        for url, head_inlinks, head_depth, head_gaps, is_matched, changed, base_gaps, inlinks_delta, depth_delta in zip(
+            self.head.urls.take(head_rows),
+            self.head.column('nb_inlinks', head_rows),
+            self.head.column('depth', head_rows),
+            self.head_gaps[positions].tolist(),
+            matched.tolist(),
+            self.changed[positions].tolist(),
+            self.base_gaps[positions].tolist(),
+            self.nb_inlinks_delta[positions].tolist(),
+            self.depth_delta[positions].tolist()
+        ):
+            rows.append({
+                'url': url,
+                'change': ('changed' if changed else 'unchanged') if is_matched else 'added',
+                'base': _page_state(*next(base_pages), base_gaps) if is_matched else None,
+                'head': _page_state(url, head_inlinks, head_depth, head_gaps),
+                'nb_inlinks_delta': None if inlinks_delta == NO_DELTA else inlinks_delta,
+                'depth_delta': None if depth_delta == NO_DELTA else depth_delta,
+                'gaps_added': MASK_GAPS[head_gaps & ~base_gaps],
+                'gaps_removed': MASK_GAPS[base_gaps & ~head_gaps]
+            })
+        return rows
+
+    def _removed_page_rows(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                'url': url,
+                'change': 'removed',
+                'base': _page_state(url, nb_inlinks, depth, gaps),
+                'head': None,
+                'nb_inlinks_delta': None,
+                'depth_delta': None,
+                'gaps_added': [],
+                'gaps_removed': MASK_GAPS[gaps]
+            }
+            for url, nb_inlinks, depth, gaps in zip(
+                self.base.urls.take(rows),
+                self.base.column('nb_inlinks', rows),
+                self.base.column('depth', rows),
+                _gap_masks(self.base, rows).tolist()
+            )
+        ]
+
+    def iter_rows(self, batch_size: int, include_unchanged: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Per-page rows in batches: head pages in URL order (added, changed
+        and optionally unchanged), then removed base pages in URL order.
+        """
+        positions = np.arange(len(self.head_rows))
+        if not include_unchanged:
+            positions = positions[~self.matched | self.changed]
+        for start in range(0, len(positions), batch_size):
+            yield self._head_page_rows(positions[start:start + batch_size])
+        for start in range(0, len(self.removed_rows), batch_size):
+            yield self._removed_page_rows(self.removed_rows[start:start + batch_size])
+
+
+def _page_state(url: str, nb_inlinks: Optional[int], depth: Optional[int], gaps: int) -> Dict[str, Any]:
+    return {'url': url, 'nb_inlinks': nb_inlinks, 'depth': depth, 'technical_gaps': MASK_GAPS[gaps]}
@@ -0,0 +1,83 @@
+"""
+Streaming exports of priority pages.
+
+Pages arrive in batches (keyset-paged from the snapshot store, or sliced
+from an in-memory ranking for live crawls), are encoded as CSV or NDJSON
+one batch at a time and, when the client accepts it, gzip-compressed as
+they are produced. Only the current batch is ever held in memory, so
+memory use does not grow with the size of the export.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Optional, Dict, List, Any, AsyncIterator, Callable
+
+from config import config
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+EXPORT_COLUMNS = [
+    'url', 'title', 'markets', 'priority_score', 'category', 'technical_gaps',
+    'nb_inlinks', 'depth', 'link_equity'
+]
+
+
+def export_row(page: Dict[str, Any], markets: List[str], category: str) -> Dict[str, Any]:
+    """The exported fields of a priority page."""
+    return {
+        'url': page['url'],
+        'title': page.get('title'),
+        'markets': markets,
+        'priority_score': page['priority_score'],
+        'category': category,
+        'technical_gaps': page['technical_gaps'],
+        'nb_inlinks': page.get('nb_inlinks'),
+        'depth': page.get('depth'),
+        'link_equity': page.get('link_equity')
+    }
+
+
+async def encode_csv(rows: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """CSV with a header line; list fields are joined with ';'."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for batch in rows:
+        for row in batch:
+            writer.writerow([
+                ';'.join(value) if isinstance(value, list) else ('' if value is None else value)
+                for value in (row[column] for column in EXPORT_COLUMNS)
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+async def encode_ndjson(rows: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """One JSON object per line."""
+    async for batch in rows:
+        yield ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in batch).encode('utf-8')
+
+
+ENCODERS: Dict[str, Callable[[AsyncIterator[List[Dict[str, Any]]]], AsyncIterator[bytes]]] = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson
+}
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Gzip-compress a byte stream incrementally (wbits=31 writes the gzip header and trailer)."""
+    compressor = zlib.compressobj(config.EXPORT_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
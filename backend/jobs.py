@@ -0,0 +1,194 @@
+"""
+Background jobs for CPU-bound work.
+
+Jobs run as asyncio tasks in the API process and hand their heavy lifting
+to a shared ProcessPoolExecutor, so a full-site run can use every core
+while the event loop keeps serving requests. Each job reports progress,
+can be cancelled, and keeps its result in memory until it ages out of
+the job history.
+"""
+
+import asyncio
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Any, Callable, Awaitable
+
+from config import config
+from relevance import RelevanceIndex, score_feature_chunk, suggest_anchor_text
+
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+
+class Job:
+    """One submitted job: status, progress and (once done) its result."""
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.progress_done = 0
+        self.progress_total = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': {
+                'done': self.progress_done,
+                'total': self.progress_total,
+                'percent': round(100 * self.progress_done / self.progress_total, 1) if self.progress_total else 0.0
+            },
+            'elapsed_seconds': round(end - self.started_at, 2) if self.started_at else None,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """Runs jobs on the event loop and a shared process pool, keeping the last JOB_HISTORY jobs."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or config.JOB_WORKERS
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, Job] = {}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def shutdown(self) -> None:
+        """Cancel running jobs and stop the worker processes."""
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, kind: str, params: Dict[str, Any], work: Callable[[Job], Awaitable[Dict[str, Any]]]) -> Job:
+        """Start `work(job)` in the background and return the job immediately."""
+        job = Job(kind, params)
+        self._jobs[job.id] = job
+        self._evict()
+        job.task = asyncio.create_task(self._run(job, work))
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Dict[str, Any]]]) -> None:
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = await work(job)
+            job.status = 'done'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job. Chunks not yet started in the pool are dropped; chunks
+        already running finish in their worker but their results are discarded.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and job.task is not None and not job.task.done():
+            job.task.cancel()
+        return job
+
+    def _evict(self) -> None:
+        finished = [job for job in self.list() if job.finished]
+        for job in finished[config.JOB_HISTORY:]:
+            del self._jobs[job.id]
+
+
+async def run_recommendation_job(
+    job: Job,
+    pool: ProcessPoolExecutor,
+    index: RelevanceIndex,
+    target_urls: List[str],
+    k: int,
+    exclude_urls: Optional[Dict[str, set]] = None
+) -> Dict[str, Any]:
+    """
+    Score top-k link sources for every target URL across the process pool.
+
+    The index's features are saved once as .npy files that each worker
+    memory-maps; only row ids, per-target exclusions and results cross the
+    process boundary. Progress advances as each chunk of targets completes.
+    """
+    await index.ensure_features()
+
+    rows = [index.url_ids[url] for url in target_urls if url in index.url_ids]
+    missing = [url for url in target_urls if url not in index.url_ids]
+    exclude = {
+        index.url_ids[url]: {index.url_ids[u] for u in linked if u in index.url_ids}
+        for url, linked in (exclude_urls or {}).items()
+        if url in index.url_ids
+    }
+
+    chunk_size = config.JOB_CHUNK_SIZE
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    job.progress_total = len(rows)
+
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(
+            pool, score_feature_chunk, index.features_path, chunk, k,
+            {row: exclude[row] for row in chunk if row in exclude}
+        )
+        for chunk in chunks
+    ]
+
+    targets = []
+    try:
+        for future in asyncio.as_completed(futures):
+            for row, matches in await future:
+                anchor = suggest_anchor_text(index.documents[row])
+                targets.append({
+                    'target_url': index.urls[row],
+                    'recommendations': [
+                        {
+                            'source_url': index.urls[page_id],
+                            'source_title': index.documents[page_id].get('title'),
+                            'relevance_score': round(similarity * 100, 1),
+                            'matched_terms': [index.terms[term] for term in term_ids],
+                            'suggested_anchor_text': anchor
+                        }
+                        for page_id, similarity, term_ids in matches
+                    ]
+                })
+                job.progress_done += 1
+    finally:
+        for future in futures:
+            future.cancel()
+
+    # Report targets in submission order (chunks complete out of order)
+    position = {url: i for i, url in enumerate(target_urls)}
+    targets.sort(key=lambda target: position[target['target_url']])
+    return {'crawl_id': index.crawl_id, 'k': k, 'targets': targets, 'not_indexed': missing}
@@ -0,0 +1,330 @@
+"""
+In-memory link graph for a crawl, in compressed sparse row (CSR) form.
+
+URLs are interned to int32 node ids; out-links of node i are
+indices[indptr[i]:indptr[i + 1]], with a parallel boolean `follow` mask per
+edge. Graphs are built by streaming every link of a crawl once and saved as
+.npz files next to the SQLite snapshot, so link-level analyses run locally.
+Each saved graph also carries its per-page link equity (scaled PageRank)
+and BFS crawl depth from the start URL.
+"""
+
+import asyncio
+import os
+from array import array
+from typing import Optional, Dict, List, Any, Tuple
+
+import numpy as np
+
+from config import config
+from pagerank import pagerank, scale_to_link_equity
+
+
+# Depth assigned to the start URL (OnCrawl counts the homepage as depth 1)
+START_DEPTH = 1
+
+# Depth of pages the start URL cannot reach through follow links
+UNREACHABLE = -1
+
+
+def graph_dir() -> str:
+    """Directory holding persisted graphs (next to the snapshot database)."""
+    return os.path.join(os.path.dirname(config.DATABASE_PATH) or '.', 'graphs')
+
+
+def graph_path(crawl_id: str) -> str:
+    return os.path.join(graph_dir(), f"{crawl_id}.npz")
+
+
+class LinkGraph:
+    """CSR adjacency of a crawl's internal links."""
+
+    def __init__(
+        self,
+        crawl_id: str,
+        urls: List[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        follow: np.ndarray,
+        link_equity: Optional[np.ndarray] = None,
+        depth: Optional[np.ndarray] = None
+    ):
+        self.crawl_id = crawl_id
+        self.urls = urls
+        self.url_ids: Dict[str, int] = {url: i for i, url in enumerate(urls)}
+        self.indptr = indptr
+        self.indices = indices
+        self.follow = follow
+        self.link_equity = link_equity
+        self.depth = depth
+        self._in_degree: Dict[Tuple[bool, bool], np.ndarray] = {}
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.urls)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nofollow(self) -> np.ndarray:
+        return ~self.follow
+
+    @classmethod
+    def from_edges(
+        cls,
+        crawl_id: str,
+        urls: List[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        follow: np.ndarray
+    ) -> "LinkGraph":
+        """Build the CSR arrays from parallel edge arrays (any order)."""
+        num_nodes = len(urls)
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+        return cls(
+            crawl_id,
+            urls,
+            indptr,
+            targets[order].astype(np.int32, copy=False),
+            follow[order].astype(bool, copy=False)
+        )
+
+    def node_id(self, url: str) -> Optional[int]:
+        return self.url_ids.get(url)
+
+    def compute_link_equity(self) -> np.ndarray:
+        """Run PageRank over follow links and store the 0-1 scaled result."""
+        self.link_equity = scale_to_link_equity(pagerank(self))
+        return self.link_equity
+
+    def link_equity_of(self, url: str) -> float:
+        """Link equity of a URL; pages missing from the graph get no equity."""
+        node = self.url_ids.get(url)
+        if node is None or self.link_equity is None:
+            return 0.0
+        return float(self.link_equity[node])
+
+    def compute_depths(self, start_url: Optional[str] = None) -> np.ndarray:
+        """
+        BFS depth of every page from the start URL over follow links.
+
+        Falls back to the page with the most link equity (normally the
+        homepage) when the start URL is unknown. Unreachable pages get
+        UNREACHABLE. Each BFS level is expanded with vectorized CSR slicing.
+        """
+        depth = np.full(self.num_nodes, UNREACHABLE, dtype=np.int32)
+        if self.num_nodes == 0:
+            self.depth = depth
+            return depth
+
+        start = self.url_ids.get(start_url) if start_url else None
+        if start is None:
+            start = int(np.argmax(self.link_equity)) if self.link_equity is not None else 0
+
+        depth[start] = START_DEPTH
+        frontier = np.array([start], dtype=np.int64)
+        level = START_DEPTH
+        while frontier.size:
+            starts = self.indptr[frontier]
+            counts = self.indptr[frontier + 1] - starts
+            # Edge positions of every out-link of the frontier, in one array
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            edges = offsets + np.arange(counts.sum())
+            edges = edges[self.follow[edges]]
+
+            neighbours = self.indices[edges]
+            frontier = np.unique(neighbours[depth[neighbours] == UNREACHABLE]).astype(np.int64)
+            level += 1
+            depth[frontier] = level
+
+        self.depth = depth
+        return depth
+
+    def out_links(self, node: int, follow_only: bool = False) -> np.ndarray:
+        """Target node ids linked from `node`."""
+        start, end = self.indptr[node], self.indptr[node + 1]
+        targets = self.indices[start:end]
+        if follow_only:
+            targets = targets[self.follow[start:end]]
+        return targets
+
+    def in_links(self, node: int) -> np.ndarray:
+        """Source node ids linking to `node` (one scan over the edge array)."""
+        edges = np.flatnonzero(self.indices == node)
+        return np.unique(np.searchsorted(self.indptr, edges, side='right') - 1)
+
+    def in_links_by_target(self, nodes: List[int]) -> Dict[int, np.ndarray]:
+        """Source node ids linking to each of `nodes`, in one scan over the edge array."""
+        edges = np.flatnonzero(np.isin(self.indices, nodes))
+        sources = np.searchsorted(self.indptr, edges, side='right') - 1
+        targets = self.indices[edges]
+        order = np.argsort(targets, kind='stable')
+        targets, sources = targets[order], sources[order]
+        bounds = np.searchsorted(targets, nodes, side='left'), np.searchsorted(targets, nodes, side='right')
+        return {
+            int(node): np.unique(sources[start:end])
+            for node, start, end in zip(nodes, *bounds)
+        }
+
+    def in_degree(self, follow_only: bool = False, unique: bool = False) -> np.ndarray:
+        """
+        Number of incoming links per node (computed once, then reused).
+
+        With `unique`, repeated links from the same source count once.
+        """
+        key = (follow_only, unique)
+        if key not in self._in_degree:
+            edges = np.flatnonzero(self.follow) if follow_only else np.arange(self.num_edges)
+            targets = self.indices[edges].astype(np.int64)
+            if unique:
+                sources = np.searchsorted(self.indptr, edges, side='right') - 1
+                targets = np.unique(sources * self.num_nodes + targets) % self.num_nodes
+            self._in_degree[key] = np.bincount(targets, minlength=self.num_nodes)
+        return self._in_degree[key]
+
+    def out_degree(self, follow_only: bool = False) -> np.ndarray:
+        """Number of outgoing links per node."""
+        if not follow_only:
+            return np.diff(self.indptr)
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+        return np.bincount(sources[self.follow], minlength=self.num_nodes)
+
+    def stats(self) -> Dict[str, Any]:
+        follow_edges = int(self.follow.sum())
+        return {
+            'crawl_id': self.crawl_id,
+            'nodes': self.num_nodes,
+            'edges': self.num_edges,
+            'follow_edges': follow_edges,
+            'nofollow_edges': self.num_edges - follow_edges,
+            'memory_bytes': int(self.indptr.nbytes + self.indices.nbytes + self.follow.nbytes)
+        }
+
+    # ============== Persistence ==============
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the graph to an .npz file. URLs are stored as one UTF-8 blob plus offsets."""
+        path = path or graph_path(self.crawl_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        encoded = [url.encode('utf-8') for url in self.urls]
+        url_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(url) for url in encoded], out=url_offsets[1:])
+
+        # Write to a temp file first so a crash never leaves a truncated graph behind
+        tmp_path = path + '.tmp.npz'
+        arrays = {
+            'indptr': self.indptr,
+            'indices': self.indices,
+            'follow': self.follow,
+            'url_offsets': url_offsets,
+            'url_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        }
+        if self.link_equity is not None:
+            arrays['link_equity'] = self.link_equity
+        if self.depth is not None:
+            arrays['depth'] = self.depth
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, crawl_id: str, path: Optional[str] = None) -> "LinkGraph":
+        path = path or graph_path(crawl_id)
+        with np.load(path) as data:
+            blob = data['url_blob'].tobytes()
+            offsets = data['url_offsets']
+            urls = [
+                blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                for i in range(len(offsets) - 1)
+            ]
+            return cls(
+                crawl_id,
+                urls,
+                data['indptr'],
+                data['indices'],
+                data['follow'],
+                data['link_equity'] if 'link_equity' in data.files else None,
+                data['depth'] if 'depth' in data.files else None
+            )
+
+
+async def stream_link_edges(client, crawl_id: str) -> tuple:
+    """
+    Stream every internal link of a crawl into (urls, sources, targets, follow).
+
+    Edges are accumulated in compact int32/bool arrays as batches arrive, so
+    peak memory is proportional to the edge count plus the URL table. Each
+    batch is interned in a worker thread, so the event loop stays free.
+    Raises OnCrawlAPIError if the Data API fails mid-stream.
+    """
+    url_ids: Dict[str, int] = {}
+    sources = array('i')
+    targets = array('i')
+    follow = array('b')
+
+    def intern(url: str) -> int:
+        node = url_ids.get(url)
+        if node is None:
+            node = url_ids[url] = len(url_ids)
+        return node
+
+    def add_batch(batch: List[Dict[str, Any]]) -> None:
+        for link in batch:
+            if link.get('type') == 'external':
+                continue
+            origin, destination = link.get('origin'), link.get('destination')
+            if not origin or not destination:
+                continue
+            sources.append(intern(origin))
+            targets.append(intern(destination))
+            follow.append(1 if link.get('follow', True) else 0)
+
+    async for batch in client.iter_link_batches(crawl_id, cache=False):
+        await asyncio.to_thread(add_batch, batch)
+
+    return (
+        list(url_ids),
+        np.frombuffer(sources, dtype=np.int32),
+        np.frombuffer(targets, dtype=np.int32),
+        np.frombuffer(follow, dtype=np.int8).astype(bool)
+    )
+
+
+class LinkGraphStore:
+    """Loaded link graphs by crawl, backed by the .npz files on disk."""
+
+    def __init__(self):
+        self._graphs: Dict[str, LinkGraph] = {}
+
+    def get(self, crawl_id: str) -> Optional[LinkGraph]:
+        """Return the graph for a crawl, loading it from disk on first use."""
+        graph = self._graphs.get(crawl_id)
+        if graph is None and os.path.exists(graph_path(crawl_id)):
+            graph = self._graphs[crawl_id] = LinkGraph.load(crawl_id)
+            graph.in_degree(follow_only=True, unique=True)  # Warm the cached inlink counts used per request
+        return graph
+
+    async def build(self, client, crawl_id: str, start_url: Optional[str] = None) -> LinkGraph:
+        """
+        Build the graph for a crawl, score link equity and BFS depth from
+        `start_url`, then persist and cache it.
+        """
+        edges = await stream_link_edges(client, crawl_id)
+
+        # CSR build, PageRank, BFS and the .npz write all run off the event loop
+        def build() -> LinkGraph:
+            graph = LinkGraph.from_edges(crawl_id, *edges)
+            graph.compute_link_equity()
+            graph.compute_depths(start_url)
+            graph.in_degree(follow_only=True, unique=True)
+            graph.save()
+            return graph
+
+        graph = await asyncio.to_thread(build)
+        self._graphs[crawl_id] = graph
+        return graph
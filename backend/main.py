@@ -3,14 +3,37 @@ Internal Linking Tool - FastAPI Backend
 Connects to OnCrawl API for technical SEO data
 """
 
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import time
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import os
 from dotenv import load_dotenv
 
-from oncrawl_client import OnCrawlClient
+from config import config
+from oncrawl_client import AsyncOnCrawlClient, OnCrawlAPIError
+from snapshot import SnapshotStore
+from link_graph import LinkGraphStore
+from simulate import simulate_links
+from relevance import RelevanceStore
+from minhash import MinHashStore
+from jobs import JobManager, run_recommendation_job
+from priority import (
+    GAP_WEIGHTS, PRIORITY_SORT_FALLBACKS, PRIORITY_CATEGORIES, rank_priority_pages, page_category,
+    priority_query_key, encode_cursor, decode_cursor, query_ranked_pages
+)
+from url_classifier import UrlClassifier, MARKET_PREFIXES, GLOBAL_MARKET
+from rollups import MarketRollups
+from export import EXPORT_FORMATS, ENCODERS, encode_ndjson, export_row, gzip_stream
+from diff import CrawlDiff, url_keys
+from watcher import CrawlWatcher
+from metrics import (
+    registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUEST_SECONDS,
+    start_request_timing, timed
+)
 
 load_dotenv()
 
@@ -29,8 +52,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OnCrawl client
-oncrawl_client = OnCrawlClient()
+# Initialize OnCrawl client (shared connection pool, opened on startup)
+oncrawl_client = AsyncOnCrawlClient()
+
+# Local snapshots of finished crawls, queried instead of OnCrawl when present
+snapshot_store = SnapshotStore()
+
+# CSR link graphs of finished crawls, persisted next to the snapshots
+link_graphs = LinkGraphStore()
+
+# TF-IDF relevance indexes for link recommendations, built on first use
+relevance_indexes = RelevanceStore()
+
+# MinHash/LSH signatures for candidate preselection and near-duplicates
+minhash_indexes = MinHashStore()
+
+# Per-market summaries and priority lists of snapshotted crawls
+market_rollups = MarketRollups()
+
+# Background jobs for CPU-bound batch work, run on a shared process pool
+job_manager = JobManager()
+
+
+# Route templates by endpoint function, for metric labels (filled on first request)
+_route_paths: Dict[Any, str] = {}
+
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """Time every request into the route latency histogram and a Server-Timing header."""
+    timing = start_request_timing()
+    response = await call_next(request)
+    response.headers['Server-Timing'] = timing.server_timing()
+    
+    if not _route_paths:
+        _route_paths.update((route.endpoint, route.path) for route in app.routes if hasattr(route, 'endpoint'))
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - timing.started,
+        method=request.method,
+        route=_route_paths.get(request.scope.get('endpoint'), 'unmatched'),
+        status=response.status_code
+    )
+    return response
+
+
+# OnCrawl cache and rate limiter state, read when /metrics is scraped
+metrics_registry.callback(
+    'oncrawl_cache_hits_total', 'OnCrawl response cache hits.', 'counter',
+    lambda: {(endpoint,): count for endpoint, count in oncrawl_client.cache.hits.items()}, ('endpoint',)
+)
+metrics_registry.callback(
+    'oncrawl_cache_misses_total', 'OnCrawl response cache misses.', 'counter',
+    lambda: {(endpoint,): count for endpoint, count in oncrawl_client.cache.misses.items()}, ('endpoint',)
+)
+metrics_registry.callback(
+    'oncrawl_cache_hit_ratio', 'Share of OnCrawl cache lookups that were hits.', 'gauge',
+    lambda: {(): oncrawl_client.cache.stats()['hit_ratio']}
+)
+metrics_registry.callback(
+    'oncrawl_cache_bytes', 'Bytes of OnCrawl responses held in the cache.', 'gauge',
+    lambda: {(): oncrawl_client.cache.stats()['bytes']}
+)
+metrics_registry.callback(
+    'oncrawl_concurrency_limit', 'Current adaptive limit on concurrent OnCrawl calls.', 'gauge',
+    lambda: {(): oncrawl_client.rate_limiter.stats()['concurrency_limit']}
+)
+
+
+@app.on_event("startup")
+async def open_connections():
+    await oncrawl_client.open()
+    await snapshot_store.open()
+    crawl_watcher.start(watched_crawls)
+
+
+@app.on_event("shutdown")
+async def close_connections():
+    crawl_watcher.stop()
+    job_manager.shutdown()
+    await oncrawl_client.close()
+    await snapshot_store.close()
+
 
 # ============== Project Configuration ==============
 # Easy to switch between projects - just update these values
@@ -70,12 +172,19 @@ def get_active_crawl_id() -> str:
     active = PROJECT_CONFIG["active_project"]
     return PROJECT_CONFIG["projects"][active]["crawl_id"]
 
+async def get_data_source(crawl_id: str):
+    """Use the local snapshot for a crawl if one exists, else query OnCrawl live."""
+    if await snapshot_store.has_snapshot(crawl_id):
+        return snapshot_store
+    return oncrawl_client
+
+# Market prefixes and excluded domains compiled once; snapshots store its results per page
+url_classifier = UrlClassifier(MARKET_PREFIXES, PROJECT_CONFIG["excluded_domains"])
+snapshot_store.classifier = url_classifier
+
 def is_excluded_url(url: str) -> bool:
     """Check if URL should be excluded from analysis."""
-    for domain in PROJECT_CONFIG["excluded_domains"]:
-        if domain in url.lower():
-            return True
-    return False
+    return url_classifier.is_excluded(url)
 
 
 # ============== Models ==============
@@ -84,6 +193,25 @@ class ApiConfigRequest(BaseModel):
     oncrawl_token: Optional[str] = None
 
 
+class ProposedLink(BaseModel):
+    source: str
+    target: str
+    follow: bool = True
+
+
+class LinkSimulationRequest(BaseModel):
+    crawl_id: Optional[str] = None
+    links: List[ProposedLink]
+
+
+class RecommendationJobRequest(BaseModel):
+    crawl_id: Optional[str] = None
+    market: str = "global"
+    category: str = "all"
+    limit: int = 1000
+    k: int = 10
+
+
 class ThresholdSettings(BaseModel):
     low_inlinks_threshold: int = 3
     deep_page_threshold: int = 4
@@ -102,6 +230,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request, OnCrawl and compute metrics of this process in the Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 # ============== Project Configuration Endpoints ==============
 
 @app.get("/api/config")
@@ -143,7 +277,7 @@ async def switch_project(project_key: str):
     new_project = PROJECT_CONFIG["projects"][project_key]
     
     # Test if the crawl is accessible
-    crawl = oncrawl_client.get_crawl_details(new_project["crawl_id"])
+    crawl = await oncrawl_client.get_crawl_details(new_project["crawl_id"])
     status = "unknown"
     accessible = False
     
@@ -169,10 +303,13 @@ async def switch_project(project_key: str):
 async def check_crawl_status():
     """Check the status of all configured crawls."""
     results = []
+    projects = list(PROJECT_CONFIG["projects"].items())
+    crawls = await asyncio.gather(*[
+        oncrawl_client.get_crawl_details(project["crawl_id"]) for _, project in projects
+    ])
     
-    for key, project in PROJECT_CONFIG["projects"].items():
+    for (key, project), crawl in zip(projects, crawls):
         crawl_id = project["crawl_id"]
-        crawl = oncrawl_client.get_crawl_details(crawl_id)
         
         status_info = {
             "project_key": key,
@@ -206,28 +343,43 @@ async def check_crawl_status():
 @app.get("/api/oncrawl/test")
 async def test_oncrawl_connection():
     """Test OnCrawl API connection."""
-    result = oncrawl_client.test_connection()
+    result = await oncrawl_client.test_connection()
     return result
 
 
 @app.get("/api/oncrawl/projects")
 async def get_projects():
     """Get all OnCrawl projects."""
-    projects = oncrawl_client.get_projects()
+    projects = await oncrawl_client.get_projects()
     return {"projects": projects, "count": len(projects)}
 
 
 @app.get("/api/oncrawl/crawls/live")
 async def get_live_crawls():
     """Get all live crawls that can be queried."""
-    crawls = oncrawl_client.get_live_crawls()
+    crawls = await oncrawl_client.get_live_crawls()
     return {"crawls": crawls, "count": len(crawls)}
 
 
+@app.get("/api/oncrawl/cache")
+async def get_cache_stats():
+    """Get OnCrawl response cache hit/miss counters, size and coalesced request count."""
+    return {
+        **oncrawl_client.cache.stats(),
+        'coalesced_requests': oncrawl_client.inflight.coalesced
+    }
+
+
+@app.get("/api/oncrawl/rate-limit")
+async def get_rate_limit_stats():
+    """Get the OnCrawl client's current rate limit, concurrency and retry counters."""
+    return oncrawl_client.rate_limiter.stats()
+
+
 @app.get("/api/oncrawl/crawl/{crawl_id}")
 async def get_crawl_details(crawl_id: str):
     """Get details for a specific crawl."""
-    crawl = oncrawl_client.get_crawl_details(crawl_id)
+    crawl = await oncrawl_client.get_crawl_details(crawl_id)
     if not crawl:
         raise HTTPException(status_code=404, detail="Crawl not found")
     return {"crawl": crawl}
@@ -236,7 +388,8 @@ async def get_crawl_details(crawl_id: str):
 @app.get("/api/oncrawl/crawl/{crawl_id}/summary")
 async def get_technical_summary(crawl_id: str):
     """Get technical SEO summary for a crawl."""
-    summary = oncrawl_client.get_technical_summary(crawl_id)
+    source = await get_data_source(crawl_id)
+    summary = await source.get_technical_summary(crawl_id)
     return summary
 
 
@@ -249,7 +402,7 @@ async def get_pages(
     sort_order: str = Query(default="asc")
 ):
     """Get pages from a crawl with pagination."""
-    result = oncrawl_client.query_pages(
+    result = await oncrawl_client.query_pages(
         crawl_id=crawl_id,
         fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count'],
         sort=[{'field': sort_field, 'order': sort_order}],
@@ -275,7 +428,8 @@ async def get_orphaned_pages(
     limit: int = Query(default=100, le=1000)
 ):
     """Get orphaned pages (0 inlinks)."""
-    result = oncrawl_client.get_orphaned_pages(crawl_id, limit=limit)
+    source = await get_data_source(crawl_id)
+    result = await source.get_orphaned_pages(crawl_id, limit=limit)
     
     if result.get('error'):
         raise HTTPException(status_code=result.get('status_code', 500), detail=result.get('message'))
@@ -290,7 +444,8 @@ async def get_low_inlinks_pages(
     limit: int = Query(default=100, le=1000)
 ):
     """Get pages with low internal links."""
-    result = oncrawl_client.get_pages_with_low_inlinks(
+    source = await get_data_source(crawl_id)
+    result = await source.get_pages_with_low_inlinks(
         crawl_id=crawl_id,
         max_inlinks=max_inlinks,
         limit=limit
@@ -309,7 +464,8 @@ async def get_deep_pages(
     limit: int = Query(default=100, le=1000)
 ):
     """Get pages with high crawl depth."""
-    result = oncrawl_client.get_deep_pages(
+    source = await get_data_source(crawl_id)
+    result = await source.get_deep_pages(
         crawl_id=crawl_id,
         min_depth=min_depth,
         limit=limit
@@ -324,7 +480,8 @@ async def get_deep_pages(
 @app.get("/api/oncrawl/crawl/{crawl_id}/inlinks-distribution")
 async def get_inlinks_distribution(crawl_id: str):
     """Get distribution of pages by inlink count."""
-    result = oncrawl_client.get_inlinks_distribution(crawl_id)
+    source = await get_data_source(crawl_id)
+    result = await source.get_inlinks_distribution(crawl_id)
     
     if result.get('error'):
         raise HTTPException(status_code=result.get('status_code', 500), detail=result.get('message'))
@@ -335,7 +492,8 @@ async def get_inlinks_distribution(crawl_id: str):
 @app.get("/api/oncrawl/crawl/{crawl_id}/depth-distribution")
 async def get_depth_distribution(crawl_id: str):
     """Get distribution of pages by crawl depth."""
-    result = oncrawl_client.get_depth_distribution(crawl_id)
+    source = await get_data_source(crawl_id)
+    result = await source.get_depth_distribution(crawl_id)
     
     if result.get('error'):
         raise HTTPException(status_code=result.get('status_code', 500), detail=result.get('message'))
@@ -343,6 +501,304 @@ async def get_depth_distribution(crawl_id: str):
     return result
 
 
+# ============== Snapshot Endpoints ==============
+
+@app.get("/api/snapshots")
+async def list_snapshots():
+    """List crawls that have a local snapshot."""
+    snapshots = await snapshot_store.list_snapshots()
+    return {"snapshots": snapshots, "count": len(snapshots)}
+
+
+async def require_finished_crawl(crawl_id: str) -> Dict[str, Any]:
+    """Fetch crawl details, raising unless the crawl exists and is done."""
+    crawl = await oncrawl_client.get_crawl_details(crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    if crawl.get("status") != "done":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Crawl status is '{crawl.get('status')}'. Only finished crawls can be snapshotted."
+        )
+    return crawl
+
+
+@app.post("/api/snapshots/{crawl_id}/sync")
+async def sync_snapshot(crawl_id: str):
+    """
+    Copy every fetched page of a finished crawl into the local snapshot store.
+    
+    Only crawls with status 'done' are synced, since running crawls still change.
+    """
+    await require_finished_crawl(crawl_id)
+    
+    result = await snapshot_store.sync_crawl(oncrawl_client, crawl_id)
+    
+    if not result.get('success'):
+        raise HTTPException(status_code=result.get('status_code', 500), detail=result.get('message'))
+    
+    relevance_indexes.invalidate(crawl_id)
+    minhash_indexes.invalidate(crawl_id)
+    await market_rollups.build(snapshot_store, crawl_id, link_graphs.get(crawl_id))
+    return result
+
+
+# ============== Link Graph Endpoints ==============
+
+@app.post("/api/graph/{crawl_id}/build")
+async def build_graph(crawl_id: str):
+    """Stream every link of a finished crawl into a local CSR link graph."""
+    crawl = await require_finished_crawl(crawl_id)
+    start_url = crawl.get('crawl_config', {}).get('start_url')
+    
+    try:
+        graph = await link_graphs.build(oncrawl_client, crawl_id, start_url=start_url)
+    except OnCrawlAPIError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    # Priority scores in the market rollups now include link equity
+    if await snapshot_store.has_snapshot(crawl_id):
+        await market_rollups.build(snapshot_store, crawl_id, graph)
+    
+    return graph.stats()
+
+
+@app.get("/api/graph/{crawl_id}")
+async def get_link_graph_stats(crawl_id: str):
+    """Get node/edge counts for a crawl's local link graph."""
+    graph = link_graphs.get(crawl_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="No link graph for this crawl. Build it first.")
+    return graph.stats()
+
+
+@app.get("/api/graph/{crawl_id}/link-equity")
+async def get_link_equity(
+    crawl_id: str,
+    limit: int = Query(default=100, ge=1, le=5000),
+    order: str = Query(default="asc")
+):
+    """
+    Get pages ranked by link equity (0-1 scaled internal PageRank).
+    
+    order=asc lists the pages with the least equity first.
+    """
+    graph = link_graphs.get(crawl_id)
+    if graph is None or graph.link_equity is None:
+        raise HTTPException(status_code=404, detail="No link graph for this crawl. Build it first.")
+    
+    ranked = graph.link_equity.argsort(kind='stable')
+    if order == "desc":
+        ranked = ranked[::-1]
+    
+    return {
+        'crawl_id': crawl_id,
+        'pages': [
+            {'url': graph.urls[node], 'link_equity': round(float(graph.link_equity[node]), 4)}
+            for node in ranked[:limit]
+        ]
+    }
+
+
+@app.post("/api/simulate/links")
+async def simulate_proposed_links(request: LinkSimulationRequest):
+    """
+    Simulate adding internal links before shipping them.
+    
+    Returns before/after nb_inlinks, depth, orphan status, gap labels and
+    category for each target, plus every page whose depth would improve.
+    Runs on the crawl's local link graph, with nb_inlinks from its snapshot
+    (as in the priority table) when there is one.
+    """
+    crawl_id = request.crawl_id or get_active_crawl_id()
+    graph = link_graphs.get(crawl_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="No link graph for this crawl. Build it first.")
+    columns = await snapshot_store.get_columns(crawl_id) if await snapshot_store.has_snapshot(crawl_id) else None
+    
+    started = time.perf_counter()
+    result = simulate_links(graph, [(link.source, link.target, link.follow) for link in request.links], columns)
+    
+    for page in result['pages']:
+        for state in (page['before'], page['after']):
+            state['category'] = _page_category(state)
+    
+    return {
+        'crawl_id': crawl_id,
+        **result,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+# ============== Recommendation Endpoints ==============
+
+@app.get("/api/recommendations/{url:path}")
+async def get_recommendations(
+    url: str,
+    crawl_id: Optional[str] = None,
+    k: int = Query(default=10, ge=1, le=50)
+):
+    """
+    Recommend source pages to link to a target URL.
+    
+    Candidates are ranked by TF-IDF cosine similarity of title, H1 and body
+    text (0-100 relevance score), with suggested anchor text from the
+    target's title. Pages on excluded domains and pages already linking to
+    the target (when a link graph exists) are left out. Once the crawl's
+    MinHash index is built, only its LSH candidates are scored and the
+    target's near-duplicates are listed.
+    """
+    crawl_id = crawl_id or get_active_crawl_id()
+    index = await relevance_indexes.get(snapshot_store, crawl_id, exclude_source=is_excluded_url)
+    if index is None:
+        raise HTTPException(status_code=404, detail="No corpus or snapshot for this crawl. Sync a snapshot first.")
+    
+    already_linking = set()
+    graph = link_graphs.get(crawl_id)
+    if graph is not None and graph.node_id(url) is not None:
+        already_linking = {graph.urls[node] for node in graph.in_links(graph.node_id(url))}
+    
+    started = time.perf_counter()
+    candidate_urls, near_duplicates = None, None
+    lsh = await minhash_indexes.get(snapshot_store, crawl_id)
+    if lsh is not None:
+        candidate_urls = lsh.candidate_urls(url)
+        near_duplicates = (lsh.near_duplicates_of(url) or [])[:50]
+    
+    recommendations = index.recommend(url, k=k, exclude_urls=already_linking, candidate_urls=candidate_urls)
+    if recommendations is None:
+        raise HTTPException(status_code=404, detail="URL not found in this crawl's relevance index")
+    
+    return {
+        'crawl_id': crawl_id,
+        'target_url': url,
+        'recommendations': recommendations,
+        'near_duplicates': near_duplicates,
+        'candidates_scored': len(candidate_urls) if candidate_urls is not None else index.num_pages,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+@app.post("/api/minhash/{crawl_id}/build")
+async def build_minhash(crawl_id: str):
+    """
+    Build or refresh a crawl's MinHash/LSH index from its corpus or snapshot.
+    
+    Signatures of unchanged page text are reused; new text is hashed on the
+    shared job process pool.
+    """
+    result = await minhash_indexes.build(snapshot_store, crawl_id, job_manager.pool)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No corpus or snapshot for this crawl. Sync a snapshot first.")
+    return result
+
+
+@app.get("/api/near-duplicates")
+async def get_near_duplicates(
+    crawl_id: Optional[str] = None,
+    threshold: Optional[float] = Query(default=None, ge=0, le=1),
+    limit: int = Query(default=100, ge=1, le=1000)
+):
+    """Get clusters of near-duplicate pages (estimated Jaccard similarity >= threshold)."""
+    crawl_id = crawl_id or get_active_crawl_id()
+    lsh = await minhash_indexes.get(snapshot_store, crawl_id)
+    if lsh is None:
+        raise HTTPException(status_code=404, detail="No MinHash index for this crawl. Build it first.")
+    
+    clusters = await asyncio.to_thread(lsh.near_duplicate_clusters, threshold)
+    return {
+        'crawl_id': crawl_id,
+        'threshold': config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold,
+        'total_clusters': len(clusters),
+        'clusters': clusters[:limit]
+    }
+
+
+# ============== Job Endpoints ==============
+
+@app.post("/api/jobs/recommendations")
+async def submit_recommendation_job(request: RecommendationJobRequest):
+    """
+    Start a background job scoring link recommendations for every priority page.
+    
+    Targets are the priority pages for the given market/category (up to
+    `limit`). Scoring runs on a process pool over memory-mapped TF-IDF
+    features; poll GET /api/jobs/{job_id} for progress and results.
+    """
+    if not 1 <= request.limit <= 5000 or not 1 <= request.k <= 50:
+        raise HTTPException(status_code=400, detail="limit must be 1-5000 and k 1-50")
+    
+    crawl_id = request.crawl_id or get_active_crawl_id()
+    index = await relevance_indexes.get(snapshot_store, crawl_id, exclude_source=is_excluded_url)
+    if index is None:
+        raise HTTPException(status_code=404, detail="No corpus or snapshot for this crawl. Sync a snapshot first.")
+    
+    async def work(job):
+        priority = await get_priority_pages(
+            crawl_id=crawl_id, market=request.market, category=request.category, limit=request.limit
+        )
+        target_urls = [page['url'] for page in priority['pages']]
+        
+        # Skip sources that already link to each target
+        already_linking = {}
+        graph = link_graphs.get(crawl_id)
+        if graph is not None:
+            nodes = [graph.node_id(url) for url in target_urls if graph.node_id(url) is not None]
+            in_links = await asyncio.to_thread(graph.in_links_by_target, nodes)
+            already_linking = {
+                graph.urls[node]: {graph.urls[source] for source in sources}
+                for node, sources in in_links.items()
+            }
+        
+        return await run_recommendation_job(
+            job, job_manager.pool, index, target_urls, request.k, already_linking
+        )
+    
+    job = job_manager.submit('recommendations', {**request.dict(), 'crawl_id': crawl_id}, work)
+    return job.to_dict()
+
+
+@app.get("/api/jobs")
+async def list_jobs():
+    """List recent jobs (without results)."""
+    return {'jobs': [job.to_dict() for job in job_manager.list()]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=5000)
+):
+    """
+    Get a job's status and progress, plus a page of its results once done.
+    
+    Recommendation results are paged by target with offset/limit.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    response = job.to_dict()
+    if job.result is not None:
+        targets = job.result['targets']
+        response['result'] = {
+            **{key: value for key, value in job.result.items() if key != 'targets'},
+            'total_targets': len(targets),
+            'targets': targets[offset:offset + limit]
+        }
+    return response
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
 # ============== Dashboard Data Endpoints ==============
 
 @app.get("/api/dashboard/priority-pages")
@@ -350,117 +806,269 @@ async def get_priority_pages(
     crawl_id: Optional[str] = None,
     market: str = Query(default="global"),
     category: str = Query(default="all"),
-    limit: int = Query(default=100, le=5000)
+    limit: int = Query(default=100, ge=1, le=5000),
+    sort: str = "priority_score",
+    order: str = "desc",
+    gap: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
     """
     Get priority pages for internal linking based on technical gaps.
     
-    This combines OnCrawl data with priority scoring.
+    This combines OnCrawl data with priority scoring. Results are filtered
+    by `gap`, `category` and `search` (URL/title substring), sorted by
+    `sort`/`order` and paged with `limit`: pass the response's
+    `next_cursor` as `cursor` to get the following page. Snapshotted
+    crawls read pages from their indexed priority_pages table.
     """
+    _validate_priority_query(sort, order, category, gap)
+    
     # Use configured active project crawl if not specified
     if not crawl_id:
         crawl_id = get_active_crawl_id()
     
-    # Get pages with technical issues
-    orphaned = oncrawl_client.get_orphaned_pages(crawl_id, limit=limit)
-    low_inlinks = oncrawl_client.get_pages_with_low_inlinks(crawl_id, max_inlinks=3, limit=limit)
-    deep_pages = oncrawl_client.get_deep_pages(crawl_id, min_depth=4, limit=limit)
-    
-    # Combine and deduplicate pages
-    all_pages = {}
-    
-    # Process orphaned pages (highest priority)
-    if not orphaned.get('error'):
-        for page in orphaned.get('urls', []):
-            url = page.get('url')
-            if url and _matches_market(url, market) and not is_excluded_url(url):
-                all_pages[url] = {
-                    **page,
-                    'technical_gaps': ['orphaned'],
-                    'priority_score': _calculate_priority(page, ['orphaned'])
-                }
-    
-    # Process low inlinks pages
-    if not low_inlinks.get('error'):
-        for page in low_inlinks.get('urls', []):
-            url = page.get('url')
-            if url and _matches_market(url, market) and not is_excluded_url(url):
-                if url in all_pages:
-                    all_pages[url]['technical_gaps'].append('low_inlinks')
-                    all_pages[url]['priority_score'] = _calculate_priority(
-                        page, all_pages[url]['technical_gaps']
-                    )
-                else:
-                    all_pages[url] = {
-                        **page,
-                        'technical_gaps': ['low_inlinks'],
-                        'priority_score': _calculate_priority(page, ['low_inlinks'])
-                    }
-    
-    # Process deep pages
-    if not deep_pages.get('error'):
-        for page in deep_pages.get('urls', []):
-            url = page.get('url')
-            if url and _matches_market(url, market) and not is_excluded_url(url):
-                if url in all_pages:
-                    all_pages[url]['technical_gaps'].append('deep_page')
-                    all_pages[url]['priority_score'] = _calculate_priority(
-                        page, all_pages[url]['technical_gaps']
-                    )
-                else:
-                    all_pages[url] = {
-                        **page,
-                        'technical_gaps': ['deep_page'],
-                        'priority_score': _calculate_priority(page, ['deep_page'])
-                    }
-    
-    # Sort by priority score
-    sorted_pages = sorted(
-        all_pages.values(),
-        key=lambda x: x.get('priority_score', 0),
-        reverse=True
-    )[:limit]
-    
-    # Filter by category if specified
-    if category != "all":
-        sorted_pages = [p for p in sorted_pages if _matches_category(p, category)]
+    query_key = priority_query_key(crawl_id, market, category, sort, order, gap, search)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, query_key)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    query = {
+        'sort': sort,
+        'descending': order == "desc",
+        'limit': limit,
+        'after': after,
+        'gap': gap,
+        'category': category,
+        'search': search
+    }
+    source = await get_data_source(crawl_id)
+    graph = link_graphs.get(crawl_id)
+    if source is snapshot_store:
+        # Ranked at snapshot time (the global rollup holds every market's pages);
+        # each page of results is an index seek on the priority_pages table
+        await market_rollups.get(snapshot_store, crawl_id, GLOBAL_MARKET, graph)
+        with timed('snapshot_query'):
+            pages, total, last_key = await snapshot_store.query_priority_pages(crawl_id, market, **query)
+    else:
+        # Live crawls rank a bounded sample: each gap query reads one capped response
+        query_limit = max(limit, config.LIVE_PRIORITY_QUERY_LIMIT)
+        ranked = await _rank_priority_pages(source, crawl_id, market, None, graph, query_limit)
+        with timed('filter_sort_page'):
+            pages, total, last_key = query_ranked_pages(ranked, **query)
     
     return {
         'crawl_id': crawl_id,
         'market': market,
         'category': category,
-        'pages': sorted_pages,
-        'total': len(sorted_pages)
+        'sort': sort,
+        'order': order,
+        'pages': pages,
+        'total': len(pages),
+        'total_matches': total,
+        'next_cursor': encode_cursor(query_key, *last_key) if last_key is not None else None
     }
 
 
-@app.get("/api/dashboard/metrics")
-async def get_dashboard_metrics(crawl_id: Optional[str] = None):
-    """Get overview metrics for the dashboard."""
-    # Use configured active project crawl if not specified
+def _validate_priority_query(sort: str, order: str, category: str, gap: Optional[str]) -> None:
+    if sort not in PRIORITY_SORT_FALLBACKS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(PRIORITY_SORT_FALLBACKS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    if category not in PRIORITY_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"category must be one of {', '.join(PRIORITY_CATEGORIES)}")
+    if gap is not None and gap not in GAP_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"gap must be one of {', '.join(GAP_WEIGHTS)}")
+
+
+async def _rank_priority_pages(
+    source,
+    crawl_id: str,
+    market: str,
+    limit: Optional[int],
+    graph,
+    query_limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    Fetch pages with a technical gap in `market` and rank the top `limit` (None = all) by priority.
+    
+    Each gap query returns at most `query_limit` rows (None = every
+    matching row, for snapshots and exports).
+    """
+    # Get the pages with a technical issue (independent queries, fetched concurrently).
+    # Uncapped, the top `limit` by priority can sit anywhere in each list; a cap
+    # keeps live requests to one upstream call per query.
+    # Snapshots filter market / excluded domains in SQL on their stored classification.
+    if source is snapshot_store:
+        market_filter = {'market': market}
+        include = lambda url: True
+    else:
+        market_filter = {}
+        include = lambda url: url_classifier.includes(url, market)
+    orphaned, low_inlinks, deep_pages = await asyncio.gather(
+        source.get_orphaned_pages(crawl_id, limit=query_limit, **market_filter),
+        source.get_pages_with_low_inlinks(crawl_id, max_inlinks=3, limit=query_limit, **market_filter),
+        source.get_deep_pages(crawl_id, min_depth=4, limit=query_limit, **market_filter)
+    )
+    
+    # Merge, score and rank as NumPy columns (link equity comes from the graph, if built)
+    with timed('merge_score'):
+        return rank_priority_pages(
+            [('orphaned', orphaned), ('low_inlinks', low_inlinks), ('deep_page', deep_pages)],
+            include=include,
+            limit=limit,
+            graph=graph
+        )
+
+
+# ============== Export Endpoints ==============
+
+@app.get("/api/export/priority-pages.{fmt}")
+async def export_priority_pages(
+    fmt: str,
+    request: Request,
+    crawl_id: Optional[str] = None,
+    market: str = "global",
+    category: str = "all",
+    sort: str = "priority_score",
+    order: str = "desc",
+    gap: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """
+    Stream every priority page matching the filters as CSV or NDJSON.
+    
+    Takes the same filters and sort as /api/dashboard/priority-pages.
+    Snapshotted crawls are read in EXPORT_BATCH_SIZE keyset batches, so
+    memory stays flat for any crawl size; live crawls are ranked in memory
+    first. The body is gzip-compressed on the fly when the client sends
+    Accept-Encoding: gzip.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Export format must be one of {', '.join(EXPORT_FORMATS)}")
+    _validate_priority_query(sort, order, category, gap)
+    
     if not crawl_id:
         crawl_id = get_active_crawl_id()
     
-    summary = oncrawl_client.get_technical_summary(crawl_id)
+    query = {'sort': sort, 'descending': order == "desc", 'gap': gap, 'category': category, 'search': search}
+    source = await get_data_source(crawl_id)
+    graph = link_graphs.get(crawl_id)
+    if source is snapshot_store:
+        await market_rollups.get(snapshot_store, crawl_id, GLOBAL_MARKET, graph)
+        batches = snapshot_store.iter_priority_pages(
+            crawl_id, market, batch_size=config.EXPORT_BATCH_SIZE, **query
+        )
+    else:
+        ranked = await _rank_priority_pages(source, crawl_id, market, None, graph)
+        pages, _, _ = query_ranked_pages(ranked, limit=len(ranked), **query)
+        batches = _in_batches(
+            [(page, url_classifier.classify(page['url'])[0]) for page in pages], config.EXPORT_BATCH_SIZE
+        )
     
-    # Get total pages count
-    pages_result = oncrawl_client.query_pages(
-        crawl_id=crawl_id,
-        fields=['url'],
-        limit=1,
-        oql={
-            'and': [
-                {'field': ['fetched', 'equals', True]},
-                {'field': ['status_code', 'equals', 200]}
+    async def rows():
+        async for batch in batches:
+            yield [
+                export_row(page, url_classifier.markets_in(market_mask), page_category(page['technical_gaps']))
+                for page, market_mask in batch
             ]
-        }
-    )
     
-    total_pages = pages_result.get('meta', {}).get('total_hits', 0) if not pages_result.get('error') else 0
+    body = ENCODERS[fmt](rows())
+    headers = {
+        'Content-Disposition': f'attachment; filename="priority-pages-{crawl_id}-{market}.{fmt}"',
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[fmt], headers=headers)
+
+
+async def _in_batches(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ============== Diff Endpoints ==============
+
+@app.get("/api/diff")
+async def diff_crawls(
+    request: Request,
+    base: str,
+    head: str,
+    market: Optional[str] = None,
+    include_unchanged: bool = False
+):
+    """
+    Stream a crawl-over-crawl diff of two snapshotted crawls as NDJSON.
+    
+    Pages (status 200, in `market` when given) are joined on normalised
+    URL. The first line holds the aggregate movement (pages added, removed
+    and changed, inlinks gained and lost, deeper pages, newly orphaned
+    pages and gap label transitions). Every following line is one page:
+    its base and head nb_inlinks, depth and gap labels, their deltas and
+    the gaps it gained or lost. Head pages come first in URL order, then
+    removed pages. Unchanged pages are left out unless include_unchanged.
+    """
+    for crawl_id in (base, head):
+        if not await snapshot_store.has_snapshot(crawl_id):
+            raise HTTPException(status_code=404, detail=f"No snapshot for crawl {crawl_id}. Sync a snapshot first.")
+    
+    base_columns, head_columns = await snapshot_store.get_columns(base), await snapshot_store.get_columns(head)
+    with timed('crawl_diff'):
+        diff = await asyncio.to_thread(
+            CrawlDiff,
+            base_columns,
+            head_columns,
+            snapshot_store.select_pages(base_columns, market),
+            snapshot_store.select_pages(head_columns, market)
+        )
+        summary = await asyncio.to_thread(diff.summary)
+    
+    async def lines():
+        yield [{'base': base, 'head': head, 'market': market, 'summary': summary}]
+        for batch in diff.iter_rows(config.EXPORT_BATCH_SIZE, include_unchanged):
+            yield batch
+    
+    body = encode_ndjson(lines())
+    headers = {'Vary': 'Accept-Encoding'}
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(body, media_type=EXPORT_FORMATS['ndjson'], headers=headers)
+
+
+@app.get("/api/dashboard/metrics")
+async def get_dashboard_metrics(crawl_id: Optional[str] = None, market: Optional[str] = None):
+    """
+    Get overview metrics for the dashboard.
+    
+    With a `market`, snapshotted crawls return that market's precomputed
+    rollup (excluded domains left out, as in priority pages). Live crawls
+    always report the whole crawl; the response's `market` is None then.
+    """
+    # Use configured active project crawl if not specified
+    if not crawl_id:
+        crawl_id = get_active_crawl_id()
+    
+    source = await get_data_source(crawl_id)
+    rollup = None
+    if market and source is snapshot_store:
+        rollup = await market_rollups.get(snapshot_store, crawl_id, market, link_graphs.get(crawl_id))
+    
+    if rollup is not None:
+        summary = rollup['summary']
+    else:
+        # One batched aggregation (or snapshot query) covers distributions, gap counts and total
+        summary = await source.get_technical_summary(crawl_id)
     
     return {
         'crawl_id': crawl_id,
-        'total_pages': total_pages,
+        'market': market if rollup is not None else None,
+        'total_pages': summary.get('total_pages', 0),
         'orphaned_pages': summary.get('orphaned_count', 0),
         'low_inlinks_pages': summary.get('low_inlinks_count', 0),
         'deep_pages': summary.get('deep_pages_count', 0),
@@ -470,75 +1078,78 @@ async def get_dashboard_metrics(crawl_id: Optional[str] = None):
     }
 
 
-# ============== Helper Functions ==============
+# ============== Crawl Watcher ==============
+# Warms each configured crawl once it finishes, so the first request after a crawl completes is fast
 
-def _matches_market(url: str, market: str) -> bool:
-    """Check if URL matches the specified market."""
-    if market == "global":
-        return True
-    
-    market_prefixes = {
-        'us': ['/us/', '/en-us/', 'squareup.com/us'],
-        'ca': ['/ca/', '/en-ca/', 'squareup.com/ca'],
-        'gb': ['/gb/', '/en-gb/', 'squareup.com/gb'],
-        'au': ['/au/', '/en-au/', 'squareup.com/au'],
-        'ie': ['/ie/', '/en-ie/', 'squareup.com/ie'],
-        'es': ['/es/', '/es-es/', 'squareup.com/es'],
-        'jp': ['/jp/', '/ja-jp/', 'squareup.com/jp'],
-        'fr': ['/fr/', '/fr-fr/', 'squareup.com/fr']
-    }
-    
-    prefixes = market_prefixes.get(market.lower(), [])
-    return any(prefix in url.lower() for prefix in prefixes)
+async def _warm_snapshot(crawl_id: str, crawl: Dict) -> None:
+    if await snapshot_store.has_snapshot(crawl_id):
+        return
+    result = await snapshot_store.sync_crawl(oncrawl_client, crawl_id)
+    if not result.get('success'):
+        raise RuntimeError(f"Snapshot sync failed: {result.get('message')}")
+    relevance_indexes.invalidate(crawl_id)
+    minhash_indexes.invalidate(crawl_id)
 
 
-def _matches_category(page: Dict, category: str) -> bool:
-    """Check if page matches the specified category based on technical gaps."""
-    gaps = page.get('technical_gaps', [])
-    
-    if category == "poor":
-        # Poor performers: orphaned or multiple issues
-        return 'orphaned' in gaps or len(gaps) >= 2
-    elif category == "moderate":
-        # Moderate: single issue, not orphaned
-        return len(gaps) == 1 and 'orphaned' not in gaps
-    
-    return True
+async def _warm_link_graph(crawl_id: str, crawl: Dict) -> None:
+    if link_graphs.get(crawl_id) is None:
+        start_url = crawl.get('crawl_config', {}).get('start_url')
+        await link_graphs.build(oncrawl_client, crawl_id, start_url=start_url)
+
+
+async def _warm_rollups(crawl_id: str, crawl: Dict) -> None:
+    # Builds every market's summary and the priority page table if missing or scored without link equity
+    await market_rollups.get(snapshot_store, crawl_id, GLOBAL_MARKET, link_graphs.get(crawl_id))
+
 
+async def _warm_minhash(crawl_id: str, crawl: Dict) -> None:
+    if await minhash_indexes.get(snapshot_store, crawl_id) is None:
+        await minhash_indexes.build(snapshot_store, crawl_id, job_manager.pool)
+
+
+async def _warm_relevance(crawl_id: str, crawl: Dict) -> None:
+    await relevance_indexes.get(snapshot_store, crawl_id, exclude_source=is_excluded_url)
+
+
+async def _warm_diff_keys(crawl_id: str, crawl: Dict) -> None:
+    # Interned URL keys for /api/diff, saved with the crawl's columns
+    await asyncio.to_thread(url_keys, await snapshot_store.get_columns(crawl_id))
+
+
+crawl_watcher = CrawlWatcher(
+    oncrawl_client.get_crawl_details,
+    [
+        ('snapshot', _warm_snapshot),
+        ('link_graph', _warm_link_graph),
+        ('rollups', _warm_rollups),
+        ('minhash', _warm_minhash),
+        ('relevance', _warm_relevance),
+        ('diff_keys', _warm_diff_keys)
+    ],
+    invalidate=oncrawl_client.cache.invalidate_crawl
+)
 
-def _calculate_priority(page: Dict, technical_gaps: List[str]) -> float:
+
+def watched_crawls() -> Dict[str, str]:
+    """Crawl ID of every configured project, by project key."""
+    return {key: project["crawl_id"] for key, project in PROJECT_CONFIG["projects"].items()}
+
+
+@app.get("/api/watcher/status")
+async def get_watcher_status():
     """
-    Calculate priority score based on technical gaps.
-    
-    Scoring weights (adjusted):
-    - Low inlinks: 1.0 (highest priority - most actionable)
-    - Orphaned page: 0.85 (high priority)
-    - Deep page: 0.6
-    - Multiple issues: bonus multiplier
+    Get the crawl watcher's state: when it last polled and, per configured
+    crawl, its OnCrawl status and warm-up progress (waiting, warming, warm
+    or failed, with the current step).
     """
-    base_score = 0
-    
-    gap_weights = {
-        'low_inlinks': 1.0,      # Highest priority - most actionable
-        'orphaned': 0.85,        # High priority
-        'deep_page': 0.6,
-        'not_in_sitemap': 0.4
-    }
-    
-    for gap in technical_gaps:
-        base_score += gap_weights.get(gap, 0.3)
-    
-    # Bonus for multiple issues
-    if len(technical_gaps) > 1:
-        base_score *= 1.2
-    
-    # Depth penalty (deeper = higher priority)
-    depth = page.get('depth', 1)
-    if depth > 3:
-        base_score *= (1 + (depth - 3) * 0.1)
-    
-    # Normalize to 0-100 scale
-    return min(round(base_score * 50, 1), 100)
+    return crawl_watcher.status()
+
+
+# ============== Helper Functions ==============
+
+def _page_category(page: Dict) -> Optional[str]:
+    """Dashboard category ('poor' / 'moderate') of a page, or None if it has no gaps."""
+    return page_category(page.get('technical_gaps'))
 
 
 # ============== Run Server ==============
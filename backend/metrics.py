@@ -0,0 +1,279 @@
+"""
+Process metrics in the Prometheus text format, and per-request timing.
+
+Counters and histograms are kept in memory per process and rendered by
+GET /metrics. Each API request also carries a RequestTiming (in a context
+variable, so it follows the request into gathered tasks and threads) that
+collects wall time spent waiting on OnCrawl and named compute phases; it
+is returned as the request's Server-Timing header.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Callable, Iterator
+
+
+# Latency buckets in seconds, from cached lookups to full-crawl pagination
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Starlette appends the charset
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_string(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_label_string(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observation counts per bucket, plus their sum and count, per label set."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_label_string(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_string(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_label_string(self.labels, key)} {count}"
+
+
+class CallbackMetric:
+    """A counter or gauge read from existing state when rendered (e.g. cache statistics)."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labels: Tuple[str, ...],
+        collect: Callable[[], Dict[Tuple[str, ...], float]]
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}{_label_string(self.labels, key)} {_format_value(value)}"
+
+
+class Registry:
+    """The metrics of this process, rendered in registration order."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        labels: Tuple[str, ...] = ()
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, kind, labels, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# ============== Metrics ==============
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'API request latency until response headers are sent.',
+    ('method', 'route', 'status')
+)
+ONCRAWL_REQUEST_SECONDS = registry.histogram(
+    'oncrawl_request_duration_seconds', 'Latency of each HTTP call to the OnCrawl API (each retry counts).',
+    ('endpoint', 'status')
+)
+ONCRAWL_BYTES = registry.counter(
+    'oncrawl_bytes_total', 'Request and response body bytes exchanged with the OnCrawl API.',
+    ('endpoint', 'direction')
+)
+ONCRAWL_RETRIES = registry.counter(
+    'oncrawl_retries_total', 'OnCrawl calls retried after throttling, gateway errors or timeouts.',
+    ('endpoint',)
+)
+ONCRAWL_ROWS = registry.counter(
+    'oncrawl_rows_total', 'Page and link rows returned by OnCrawl queries (cached or not).',
+    ('endpoint',)
+)
+COMPUTE_SECONDS = registry.histogram(
+    'compute_duration_seconds', 'Python-side time of named processing phases (merging, scoring, paging).',
+    ('phase',)
+)
+
+
+# ============== Request Timing ==============
+
+class RequestTiming:
+    """Upstream wait and named compute phases of one API request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.upstream = 0.0
+        self.phases: Dict[str, float] = {}
+        self._upstream_in_flight = 0
+        self._upstream_since = 0.0
+
+    def upstream_started(self) -> None:
+        # Overlapping calls (e.g. gathered queries) count once, as wall time
+        if self._upstream_in_flight == 0:
+            self._upstream_since = time.perf_counter()
+        self._upstream_in_flight += 1
+
+    def upstream_finished(self) -> None:
+        self._upstream_in_flight -= 1
+        if self._upstream_in_flight == 0:
+            self.upstream += time.perf_counter() - self._upstream_since
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: upstream, compute (the rest), each phase and the total, in ms."""
+        total = time.perf_counter() - self.started
+        entries = [('upstream', self.upstream), ('compute', max(total - self.upstream, 0.0))]
+        entries += list(self.phases.items())
+        entries.append(('total', total))
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in entries)
+
+
+_current_timing: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar(
+    'request_timing', default=None
+)
+
+
+def start_request_timing() -> RequestTiming:
+    """Start timing the current request (call from the HTTP middleware)."""
+    timing = RequestTiming()
+    _current_timing.set(timing)
+    return timing
+
+
+@contextmanager
+def upstream_call() -> Iterator[None]:
+    """Count the enclosed time as waiting on OnCrawl for the current request."""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    timing.upstream_started()
+    try:
+        yield
+    finally:
+        timing.upstream_finished()
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Record the enclosed time as a compute phase, in metrics and the current request's timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        COMPUTE_SECONDS.observe(elapsed, phase=phase)
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.add_phase(phase, elapsed)
@@ -0,0 +1,359 @@
+"""
+MinHash signatures with banded LSH over page shingles.
+
+Each page's text (title, H1, body) becomes a set of word shingles, and a
+MinHash signature of MINHASH_NUM_PERM values estimates the Jaccard
+similarity of any two sets. Signatures are banded into LSH buckets twice
+from the same stored signatures:
+
+- a recall-oriented banding (few rows per band) preselects candidate
+  source pages for the relevance engine, so exact TF-IDF scoring only
+  looks at pages likely to share content with the target;
+- a precision-oriented banding (many rows per band) finds near-duplicate
+  pages that compete for the same links.
+
+Signatures are stored in the snapshot database keyed by a hash of the page
+text. Rebuilding a crawl reuses every signature whose text is unchanged,
+from this crawl or any other, and only hashes new text, spread across
+the shared job process pool.
+"""
+
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Any, Tuple
+
+import numpy as np
+
+from config import config
+from relevance import FIELD_WEIGHTS, tokenize, load_documents
+
+
+# Prime just below 2^32; coefficients stay below 2^31 so a * x + b fits in uint64
+MERSENNE_PRIME = np.uint64(4294967291)
+MAX_HASH = np.uint32(0xFFFFFFFF)
+MINHASH_SEED = 1
+
+# Documents per worker task when hashing in parallel
+MINHASH_CHUNK_SIZE = 2000
+
+# Band hashing (64-bit multiply-xor, top 32 bits kept) and the page bits of a packed bucket entry
+BAND_HASH_SEED = np.uint64(0x9E3779B97F4A7C15)
+BAND_HASH_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+PAGE_MASK = np.uint64(0xFFFFFFFF)
+
+
+def shingles(document: Dict[str, Any]) -> List[str]:
+    """Word unigrams and bigrams of a page's title, H1 and body text."""
+    tokens = []
+    for field in FIELD_WEIGHTS:
+        tokens.extend(tokenize(document.get(field)))
+    return sorted(set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])})
+
+
+def content_hash(document_shingles: List[str]) -> int:
+    """Stable signed 64-bit hash of a shingle set, used to reuse stored signatures."""
+    digest = hashlib.blake2b('\n'.join(document_shingles).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def compute_signatures(shingle_sets: List[List[str]], num_perm: int) -> np.ndarray:
+    """
+    MinHash signatures for a list of shingle sets, shape (len(sets), num_perm).
+
+    Shingles are hashed once to 32-bit values, then each permutation
+    (a * x + b) mod p is applied to every shingle of every document at once
+    and reduced per document with np.minimum.reduceat. Empty sets get
+    MAX_HASH everywhere. Runs in worker processes, so it is a plain
+    module-level function.
+    """
+    signatures = np.full((len(shingle_sets), num_perm), MAX_HASH, dtype=np.uint32)
+    non_empty = [i for i, shingle_set in enumerate(shingle_sets) if shingle_set]
+    if not non_empty:
+        return signatures
+
+    hashed = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+            for i in non_empty for shingle in shingle_sets[i]
+        ],
+        dtype=np.uint64
+    )
+    offsets = np.zeros(len(non_empty), dtype=np.int64)
+    np.cumsum([len(shingle_sets[i]) for i in non_empty[:-1]], out=offsets[1:])
+
+    a, b = _permutations(num_perm)
+    for perm in range(num_perm):
+        values = (a[perm] * hashed + b[perm]) % MERSENNE_PRIME
+        signatures[non_empty, perm] = np.minimum.reduceat(values, offsets)
+    return signatures
+
+
+def _band_hashes(rows: np.ndarray) -> np.ndarray:
+    """32-bit hash of each band along the last axis (multiply-xor over its rows), as uint64."""
+    hashes = np.full(rows.shape[:-1], BAND_HASH_SEED, dtype=np.uint64)
+    for row in range(rows.shape[-1]):
+        hashes = (hashes ^ rows[..., row]) * BAND_HASH_MULTIPLIER
+    return hashes >> np.uint64(32)
+
+
+class LSHBanding:
+    """
+    LSH buckets of a signature matrix for one rows-per-band setting.
+
+    Each band is one sorted uint64 array of (band hash << 32 | page), so a
+    bucket's members are a contiguous slice found by binary search: 8 bytes
+    per page per band. Pages with identical bands always share a bucket; a
+    32-bit hash collision only adds a candidate, which callers score anyway.
+    """
+
+    def __init__(self, signatures: np.ndarray, rows_per_band: int, empty: np.ndarray):
+        self.signatures = signatures
+        self.rows_per_band = rows_per_band
+        self.empty = empty
+        pages = np.arange(signatures.shape[0], dtype=np.uint64)
+        self.buckets = []
+        for band in range(signatures.shape[1] // rows_per_band):
+            rows = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+            packed = (_band_hashes(rows) << np.uint64(32)) | pages
+            packed.sort()
+            self.buckets.append(packed)
+
+    @property
+    def num_bands(self) -> int:
+        return len(self.buckets)
+
+    def bucket(self, band: int, band_hash: np.uint64) -> np.ndarray:
+        """Pages in the bucket of `band_hash` in `band`."""
+        packed = self.buckets[band]
+        lowest = band_hash << np.uint64(32)
+        start = np.searchsorted(packed, lowest, side='left')
+        end = np.searchsorted(packed, lowest | PAGE_MASK, side='right')
+        return (packed[start:end] & PAGE_MASK).astype(np.int64)
+
+    def candidates(self, page: int) -> np.ndarray:
+        """Pages sharing at least one bucket with `page` (excluding itself)."""
+        if self.empty[page]:
+            return np.zeros(0, dtype=np.int64)
+        rows = self.signatures[page, :self.num_bands * self.rows_per_band].astype(np.uint64)
+        band_hashes = _band_hashes(rows.reshape(self.num_bands, self.rows_per_band))
+        members = np.unique(np.concatenate([
+            self.bucket(band, band_hash) for band, band_hash in enumerate(band_hashes)
+        ]))
+        return members[(members != page) & ~self.empty[members]]
+
+    def shared_buckets(self, band: int) -> List[np.ndarray]:
+        """Pages of every bucket of `band` with more than one member."""
+        packed = self.buckets[band]
+        band_hashes = packed >> np.uint64(32)
+        starts = np.flatnonzero(np.r_[True, band_hashes[1:] != band_hashes[:-1]])
+        ends = np.r_[starts[1:], len(packed)]
+        shared = (ends - starts) > 1
+        return [
+            (packed[start:end] & PAGE_MASK).astype(np.int64)
+            for start, end in zip(starts[shared], ends[shared])
+        ]
+
+
+class MinHashIndex:
+    """MinHash signatures of a crawl's pages with candidate and near-duplicate bandings."""
+
+    def __init__(self, crawl_id: str, urls: List[str], signatures: np.ndarray):
+        self.crawl_id = crawl_id
+        self.urls = urls
+        self.url_ids = {url: i for i, url in enumerate(urls)}
+        self.signatures = signatures
+        self.empty = (signatures == MAX_HASH).all(axis=1)
+        self.candidate_banding = LSHBanding(signatures, config.LSH_CANDIDATE_ROWS, self.empty)
+        self.duplicate_banding = LSHBanding(signatures, config.LSH_DUPLICATE_ROWS, self.empty)
+
+    @property
+    def num_pages(self) -> int:
+        return len(self.urls)
+
+    def similarity(self, page: int, others: np.ndarray) -> np.ndarray:
+        """Estimated Jaccard similarity of `page` to each of `others`."""
+        return (self.signatures[others] == self.signatures[page]).mean(axis=1)
+
+    def candidate_urls(self, url: str) -> Optional[List[str]]:
+        """URLs likely to share content with `url`, or None if it is not indexed."""
+        page = self.url_ids.get(url)
+        if page is None:
+            return None
+        return [self.urls[i] for i in self.candidate_banding.candidates(page)]
+
+    def near_duplicates_of(self, url: str, threshold: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """Pages whose estimated Jaccard similarity to `url` is at least `threshold`."""
+        threshold = config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        page = self.url_ids.get(url)
+        if page is None:
+            return None
+        others = self.duplicate_banding.candidates(page)
+        scores = self.similarity(page, others)
+        keep = np.argsort(-scores, kind='stable')
+        return [
+            {'url': self.urls[others[i]], 'similarity': round(float(scores[i]), 3)}
+            for i in keep if scores[i] >= threshold
+        ]
+
+    def near_duplicate_clusters(self, threshold: Optional[float] = None) -> List[List[str]]:
+        """
+        Group near-duplicate pages into clusters.
+
+        Every member of a duplicate-banding bucket is compared with the
+        bucket's first member and joined to it (union-find) when their
+        estimated similarity reaches `threshold`. This is linear in pages x
+        bands, at the cost of occasionally missing a pair only linked
+        through a non-representative member.
+        """
+        threshold = config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        parent = np.arange(self.num_pages)
+
+        def find(page: int) -> int:
+            while parent[page] != page:
+                parent[page] = parent[parent[page]]
+                page = parent[page]
+            return page
+
+        banding = self.duplicate_banding
+        for band in range(banding.num_bands):
+            for members in banding.shared_buckets(band):
+                representative = members[0]
+                if self.empty[representative]:
+                    continue
+                rest = members[1:]
+                for other in rest[self.similarity(representative, rest) >= threshold]:
+                    root_a, root_b = find(representative), find(int(other))
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        clusters: Dict[int, List[str]] = {}
+        for page in range(self.num_pages):
+            clusters.setdefault(find(page), []).append(self.urls[page])
+        return sorted((urls for urls in clusters.values() if len(urls) > 1), key=len, reverse=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'crawl_id': self.crawl_id,
+            'pages': self.num_pages,
+            'empty_pages': int(self.empty.sum()),
+            'num_perm': int(self.signatures.shape[1]),
+            'candidate_bands': self.candidate_banding.num_bands,
+            'duplicate_bands': self.duplicate_banding.num_bands
+        }
+
+
+async def _compute_missing(
+    shingle_sets: List[List[str]],
+    num_perm: int,
+    pool: Optional[ProcessPoolExecutor]
+) -> np.ndarray:
+    """Hash shingle sets across the worker pool (inline for small batches or without a pool)."""
+    if pool is None or len(shingle_sets) <= MINHASH_CHUNK_SIZE:
+        return await asyncio.to_thread(compute_signatures, shingle_sets, num_perm)
+
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*[
+        loop.run_in_executor(pool, compute_signatures, shingle_sets[start:start + MINHASH_CHUNK_SIZE], num_perm)
+        for start in range(0, len(shingle_sets), MINHASH_CHUNK_SIZE)
+    ])
+    return np.concatenate(chunks)
+
+
+async def build_minhash_index(
+    snapshot_store,
+    crawl_id: str,
+    pool: Optional[ProcessPoolExecutor] = None
+) -> Optional[Tuple[MinHashIndex, Dict[str, int]]]:
+    """
+    Build (or incrementally refresh) the MinHash index of a crawl.
+
+    Returns the index and counts of reused vs newly hashed signatures, or
+    None when the crawl has neither a corpus file nor a snapshot.
+    """
+    documents = await load_documents(snapshot_store, crawl_id)
+    if documents is None:
+        return None
+
+    num_perm = config.MINHASH_NUM_PERM
+    urls = [document['url'] for document in documents if document.get('url')]
+    shingle_sets = await asyncio.to_thread(
+        lambda: [shingles(document) for document in documents if document.get('url')]
+    )
+    hashes = [content_hash(shingle_set) for shingle_set in shingle_sets]
+
+    stored = await snapshot_store.find_minhash_signatures(crawl_id, hashes)
+    signatures = np.empty((len(urls), num_perm), dtype=np.uint32)
+    missing = []
+    for i, hash_value in enumerate(hashes):
+        blob = stored.get(hash_value)
+        if blob is not None and len(blob) == num_perm * 4:
+            signatures[i] = np.frombuffer(blob, dtype=np.uint32)
+        else:
+            missing.append(i)
+
+    if missing:
+        signatures[missing] = await _compute_missing([shingle_sets[i] for i in missing], num_perm, pool)
+
+    await snapshot_store.save_minhash_signatures(crawl_id, [
+        (url, hash_value, signatures[i].tobytes())
+        for i, (url, hash_value) in enumerate(zip(urls, hashes))
+    ])
+
+    index = await asyncio.to_thread(MinHashIndex, crawl_id, urls, signatures)
+    return index, {'reused': len(urls) - len(missing), 'computed': len(missing)}
+
+
+class MinHashStore:
+    """MinHash indexes by crawl, loaded from the snapshot database on first use."""
+
+    def __init__(self):
+        self._indexes: Dict[str, MinHashIndex] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, snapshot_store, crawl_id: str) -> Optional[MinHashIndex]:
+        """Return the crawl's index if its signatures have been built, else None."""
+        index = self._indexes.get(crawl_id)
+        if index is not None:
+            return index
+
+        async with self._lock:
+            if crawl_id in self._indexes:
+                return self._indexes[crawl_id]
+            rows = await snapshot_store.get_minhash_signatures(crawl_id)
+            if not rows:
+                return None
+            urls = [url for url, _ in rows]
+            signatures = np.frombuffer(b''.join(blob for _, blob in rows), dtype=np.uint32)
+            signatures = signatures.reshape(len(urls), -1)
+            index = self._indexes[crawl_id] = await asyncio.to_thread(MinHashIndex, crawl_id, urls, signatures)
+            return index
+
+    async def build(
+        self,
+        snapshot_store,
+        crawl_id: str,
+        pool: Optional[ProcessPoolExecutor] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build the crawl's index, store its signatures and cache it. None if there is no text to index.
+
+        New text is hashed on `pool` (the shared job pool) when given.
+        """
+        async with self._lock:
+            result = await build_minhash_index(snapshot_store, crawl_id, pool)
+            if result is None:
+                return None
+            index, counts = result
+            self._indexes[crawl_id] = index
+            return {**index.stats(), **counts}
+
+    def invalidate(self, crawl_id: str) -> None:
+        self._indexes.pop(crawl_id, None)
@@ -3,20 +3,231 @@ OnCrawl API Client for Internal Linking Tool
 Uses the Data API: /api/v2/data/crawl/<crawl_id>/pages
 """
 
+import asyncio
+import json
 import requests
+import httpx
 import os
-from typing import Optional, Dict, List, Any
+import time
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
+from config import config
+from cache import ResponseCache, SingleFlight, make_key, NEVER_EXPIRES
+from rate_limit import RateLimiter, backoff_delay, parse_retry_after
+from metrics import ONCRAWL_REQUEST_SECONDS, ONCRAWL_BYTES, ONCRAWL_RETRIES, ONCRAWL_ROWS, upstream_call
+
 load_dotenv()
 
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# ============== Shared Query Definitions ==============
+# Used by both the sync and async clients so the two never drift apart
+
+DEFAULT_PAGE_FIELDS = ['url', 'nb_inlinks', 'depth', 'status_code', 'title']
+DEFAULT_LINK_FIELDS = ['origin', 'destination', 'follow', 'type']
+
+# Rows per request when paging through a full result set
+PAGE_BATCH_SIZE = 1000
+
+# Upstream statuses worth retrying (throttling and transient gateway errors)
+RETRY_STATUS_CODES = {429, 502, 503}
+
+# Endpoints whose responses depend only on the crawl's data, which is frozen once it is done
+CRAWL_DATA_ENDPOINTS = {'pages', 'aggs', 'links', 'fields'}
+
+# Crawl statuses that no longer change on their own; their details use ONCRAWL_FINISHED_CRAWL_TTL
+FINISHED_CRAWL_STATUSES = {'done', 'archived'}
+
+
+class OnCrawlAPIError(Exception):
+    """Raised by the streaming iterators when the Data API returns an error."""
+    
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _indexable_oql(*conditions: Dict[str, Any]) -> Dict[str, Any]:
+    """OQL filter for fetched 200 pages, plus any extra conditions."""
+    return {
+        'and': [
+            {'field': ['fetched', 'equals', True]},
+            {'field': ['status_code', 'equals', 200]},
+            *conditions
+        ]
+    }
+
+
+def _pages_payload(
+    fields: Optional[List[str]],
+    oql: Optional[Dict[str, Any]],
+    sort: Optional[List[Dict[str, str]]],
+    limit: int,
+    offset: int
+) -> Dict[str, Any]:
+    """Build the request body for a /pages query."""
+    payload = {
+        'offset': offset,
+        'limit': limit,
+        'fields': fields if fields is not None else DEFAULT_PAGE_FIELDS
+    }
+    if oql:
+        payload['oql'] = oql
+    if sort:
+        payload['sort'] = sort
+    return payload
+
+
+def _low_inlinks_query(max_inlinks: int, limit: int) -> Dict[str, Any]:
+    return {
+        'fields': ['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap'],
+        'oql': _indexable_oql(
+            {'field': ['nb_inlinks', 'gt', 0]},  # More than 0 (not orphaned)
+            {'field': ['nb_inlinks', 'lte', max_inlinks]}  # Up to max_inlinks
+        ),
+        'sort': [{'field': 'nb_inlinks', 'order': 'asc'}],
+        'limit': limit
+    }
+
+
+def _orphaned_query(limit: int) -> Dict[str, Any]:
+    return {
+        'fields': ['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap'],
+        'oql': _indexable_oql({'field': ['nb_inlinks', 'equals', 0]}),
+        'sort': [{'field': 'depth', 'order': 'desc'}],
+        'limit': limit
+    }
+
+
+def _deep_pages_query(min_depth: int, limit: int) -> Dict[str, Any]:
+    return {
+        'fields': ['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'in_sitemap'],
+        'oql': _indexable_oql({'field': ['depth', 'gte', min_depth]}),  # Fixed: use 'gte' not 'greater_than'
+        'sort': [{'field': 'depth', 'order': 'desc'}],
+        'limit': limit
+    }
+
+
+def _not_in_sitemap_query(limit: int) -> Dict[str, Any]:
+    return {
+        'fields': ['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'in_sitemap'],
+        'oql': _indexable_oql({'field': ['in_sitemap', 'equals', False]}),
+        'sort': [{'field': 'nb_inlinks', 'order': 'asc'}],
+        'limit': limit
+    }
+
+
+def _inlinks_distribution_agg() -> Dict[str, Any]:
+    return {
+        'fields': [{
+            'name': 'nb_inlinks',
+            'ranges': [
+                {'name': '0', 'to': 1},
+                {'name': '1-3', 'from': 1, 'to': 4},
+                {'name': '4-10', 'from': 4, 'to': 11},
+                {'name': '11-50', 'from': 11, 'to': 51},
+                {'name': '50+', 'from': 51}
+            ]
+        }],
+        'oql': _indexable_oql()
+    }
+
+
+def _depth_distribution_agg() -> Dict[str, Any]:
+    return {
+        'fields': [{'name': 'depth'}],
+        'oql': _indexable_oql()
+    }
+
+
+# Summary counts, in the order they are sent in the batched aggs request.
+# An agg without 'fields' returns the number of pages matching its OQL.
+SUMMARY_COUNT_AGGS = [
+    ('orphaned_count', _orphaned_query(limit=1)['oql']),
+    ('low_inlinks_count', _low_inlinks_query(max_inlinks=3, limit=1)['oql']),
+    ('deep_pages_count', _deep_pages_query(min_depth=4, limit=1)['oql']),
+    ('not_in_sitemap_count', _not_in_sitemap_query(limit=1)['oql']),
+    ('total_pages', _indexable_oql())
+]
+
+
+def _technical_summary_aggs() -> List[Dict[str, Any]]:
+    """All aggregations for the technical summary, batched into one request."""
+    return [
+        _inlinks_distribution_agg(),
+        _depth_distribution_agg(),
+        *[{'oql': oql} for _, oql in SUMMARY_COUNT_AGGS]
+    ]
+
+
+def build_technical_summary(crawl_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the technical summary from a batched aggs response.
+    
+    Distributions keep the same {'aggs': [...]} shape as a standalone
+    get_inlinks_distribution / get_depth_distribution call.
+    """
+    summary = {
+        'crawl_id': crawl_id,
+        'inlinks_distribution': None,
+        'depth_distribution': None,
+        'orphaned_count': 0,
+        'low_inlinks_count': 0,
+        'deep_pages_count': 0,
+        'not_in_sitemap_count': 0,
+        'total_pages': 0
+    }
+    
+    if result.get('error'):
+        return summary
+    
+    aggs = result.get('aggs', [])
+    if len(aggs) > 0:
+        summary['inlinks_distribution'] = {'aggs': [aggs[0]]}
+    if len(aggs) > 1:
+        summary['depth_distribution'] = {'aggs': [aggs[1]]}
+    
+    for (key, _), agg in zip(SUMMARY_COUNT_AGGS, aggs[2:]):
+        rows = agg.get('rows') or [[0]]
+        summary[key] = rows[0][0]
+    
+    return summary
+
+
+def _result_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rows from a /pages or /links response."""
+    return result.get('urls') or result.get('links') or []
+
+
+def _error_result(status_code: int, text: str) -> Dict[str, Any]:
+    """Convert a non-200 Data API response into the client's error dict."""
+    if status_code == 409:
+        return {
+            'error': True,
+            'message': 'Crawl is archived. Only live crawls can be queried.',
+            'status_code': 409
+        }
+    return {
+        'error': True,
+        'message': text,
+        'status_code': status_code
+    }
+
 
 class OnCrawlClient:
     """Client for interacting with OnCrawl's Data API."""
     
     def __init__(self, api_token: Optional[str] = None):
         self.api_token = api_token or os.getenv('ONCRAWL_API_TOKEN')
-        self.base_url = "https://app.oncrawl.com/api/v2"
+        self.base_url = config.ONCRAWL_BASE_URL
         self.headers = {
             'Authorization': f'Bearer {self.api_token}',
             'Content-Type': 'application/json'
@@ -127,42 +338,16 @@ class OnCrawlClient:
         Returns:
             Dict with 'urls' (list of pages), 'meta' (total_hits, etc.)
         """
-        if fields is None:
-            fields = ['url', 'nb_inlinks', 'depth', 'status_code', 'title']
-        
-        payload = {
-            'offset': offset,
-            'limit': limit,
-            'fields': fields
-        }
-        
-        if oql:
-            payload['oql'] = oql
-        
-        if sort:
-            payload['sort'] = sort
-        
         resp = requests.post(
             f"{self.base_url}/data/crawl/{crawl_id}/pages",
             headers=self.headers,
-            json=payload,
+            json=_pages_payload(fields, oql, sort, limit, offset),
             timeout=60
         )
         
         if resp.status_code == 200:
             return resp.json()
-        elif resp.status_code == 409:
-            return {
-                'error': True,
-                'message': 'Crawl is archived. Only live crawls can be queried.',
-                'status_code': 409
-            }
-        else:
-            return {
-                'error': True,
-                'message': resp.text,
-                'status_code': resp.status_code
-            }
+        return _error_result(resp.status_code, resp.text)
     
     def get_pages_with_low_inlinks(
         self,
@@ -171,36 +356,11 @@ class OnCrawlClient:
         limit: int = 1000
     ) -> Dict[str, Any]:
         """Get pages with low internal links (1-3 inlinks, not orphaned)."""
-        return self.query_pages(
-            crawl_id=crawl_id,
-            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count'],
-            oql={
-                'and': [
-                    {'field': ['fetched', 'equals', True]},
-                    {'field': ['status_code', 'equals', 200]},
-                    {'field': ['nb_inlinks', 'gt', 0]},  # More than 0 (not orphaned)
-                    {'field': ['nb_inlinks', 'lte', max_inlinks]}  # Up to max_inlinks
-                ]
-            },
-            sort=[{'field': 'nb_inlinks', 'order': 'asc'}],
-            limit=limit
-        )
+        return self.query_pages(crawl_id=crawl_id, **_low_inlinks_query(max_inlinks, limit))
     
     def get_orphaned_pages(self, crawl_id: str, limit: int = 1000) -> Dict[str, Any]:
         """Get orphaned pages (0 inlinks)."""
-        return self.query_pages(
-            crawl_id=crawl_id,
-            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count'],
-            oql={
-                'and': [
-                    {'field': ['fetched', 'equals', True]},
-                    {'field': ['status_code', 'equals', 200]},
-                    {'field': ['nb_inlinks', 'equals', 0]}
-                ]
-            },
-            sort=[{'field': 'depth', 'order': 'desc'}],
-            limit=limit
-        )
+        return self.query_pages(crawl_id=crawl_id, **_orphaned_query(limit))
     
     def get_deep_pages(
         self,
@@ -209,19 +369,7 @@ class OnCrawlClient:
         limit: int = 1000
     ) -> Dict[str, Any]:
         """Get pages with high crawl depth."""
-        return self.query_pages(
-            crawl_id=crawl_id,
-            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title'],
-            oql={
-                'and': [
-                    {'field': ['fetched', 'equals', True]},
-                    {'field': ['status_code', 'equals', 200]},
-                    {'field': ['depth', 'gte', min_depth]}  # Fixed: use 'gte' not 'greater_than'
-                ]
-            },
-            sort=[{'field': 'depth', 'order': 'desc'}],
-            limit=limit
-        )
+        return self.query_pages(crawl_id=crawl_id, **_deep_pages_query(min_depth, limit))
     
     def get_links(
         self,
@@ -245,12 +393,7 @@ class OnCrawlClient:
         
         if resp.status_code == 200:
             return resp.json()
-        else:
-            return {
-                'error': True,
-                'message': resp.text,
-                'status_code': resp.status_code
-            }
+        return _error_result(resp.status_code, resp.text)
     
     def aggregate_pages(
         self,
@@ -276,51 +419,15 @@ class OnCrawlClient:
         
         if resp.status_code == 200:
             return resp.json()
-        else:
-            return {
-                'error': True,
-                'message': resp.text,
-                'status_code': resp.status_code
-            }
+        return _error_result(resp.status_code, resp.text)
     
     def get_inlinks_distribution(self, crawl_id: str) -> Dict[str, Any]:
         """Get distribution of pages by inlink count ranges."""
-        return self.aggregate_pages(
-            crawl_id=crawl_id,
-            aggs=[{
-                'fields': [{
-                    'name': 'nb_inlinks',
-                    'ranges': [
-                        {'name': '0', 'to': 1},
-                        {'name': '1-3', 'from': 1, 'to': 4},
-                        {'name': '4-10', 'from': 4, 'to': 11},
-                        {'name': '11-50', 'from': 11, 'to': 51},
-                        {'name': '50+', 'from': 51}
-                    ]
-                }],
-                'oql': {
-                    'and': [
-                        {'field': ['fetched', 'equals', True]},
-                        {'field': ['status_code', 'equals', 200]}
-                    ]
-                }
-            }]
-        )
+        return self.aggregate_pages(crawl_id=crawl_id, aggs=[_inlinks_distribution_agg()])
     
     def get_depth_distribution(self, crawl_id: str) -> Dict[str, Any]:
         """Get distribution of pages by crawl depth."""
-        return self.aggregate_pages(
-            crawl_id=crawl_id,
-            aggs=[{
-                'fields': [{'name': 'depth'}],
-                'oql': {
-                    'and': [
-                        {'field': ['fetched', 'equals', True]},
-                        {'field': ['status_code', 'equals', 200]}
-                    ]
-                }
-            }]
-        )
+        return self.aggregate_pages(crawl_id=crawl_id, aggs=[_depth_distribution_agg()])
     
     def get_pages_not_in_sitemap(
         self,
@@ -328,63 +435,519 @@ class OnCrawlClient:
         limit: int = 100
     ) -> Dict[str, Any]:
         """Get pages that are not in the sitemap."""
-        return self.query_pages(
-            crawl_id=crawl_id,
-            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'in_sitemap'],
-            oql={
-                'and': [
-                    {'field': ['fetched', 'equals', True]},
-                    {'field': ['status_code', 'equals', 200]},
-                    {'field': ['in_sitemap', 'equals', False]}
-                ]
-            },
-            sort=[{'field': 'nb_inlinks', 'order': 'asc'}],
-            limit=limit
-        )
+        return self.query_pages(crawl_id=crawl_id, **_not_in_sitemap_query(limit))
     
     def get_technical_summary(self, crawl_id: str) -> Dict[str, Any]:
-        """Get a technical SEO summary for a crawl."""
-        summary = {
-            'crawl_id': crawl_id,
-            'inlinks_distribution': None,
-            'depth_distribution': None,
-            'orphaned_count': 0,
-            'low_inlinks_count': 0,
-            'deep_pages_count': 0,
-            'not_in_sitemap_count': 0
+        """
+        Get a technical SEO summary for a crawl.
+        
+        Distributions and counts all come from one batched aggs request.
+        """
+        result = self.aggregate_pages(crawl_id=crawl_id, aggs=_technical_summary_aggs())
+        return build_technical_summary(crawl_id, result)
+
+
+class AsyncOnCrawlClient:
+    """
+    Async client for OnCrawl's Data API.
+    
+    Mirrors OnCrawlClient but awaits every call and keeps one httpx.AsyncClient
+    open for the lifetime of the app, so requests reuse pooled keep-alive
+    connections (HTTP/2 when `h2` is installed) instead of re-handshaking.
+    Call `open()` on startup and `close()` on shutdown.
+    
+    Requests pass through a token bucket (ONCRAWL_RATE_LIMIT per second) and
+    an AIMD concurrency limit capped at `max_concurrency`, so callers can fan
+    out with asyncio.gather without flooding the API. 429/502/503 responses
+    and timeouts are retried with jittered exponential backoff, honouring
+    Retry-After, and shrink the concurrency limit until the API recovers.
+    
+    Successful responses are cached per (endpoint, crawl_id, payload). Data
+    for crawls with status 'done' never expires; everything else uses the
+    per-endpoint TTLs in config.ONCRAWL_CACHE_TTLS, except the details of
+    done or archived crawls, kept for ONCRAWL_FINISHED_CRAWL_TTL. Identical requests that
+    arrive while one is already in flight share its upstream call.
+    """
+    
+    def __init__(
+        self,
+        api_token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.api_token = api_token or os.getenv('ONCRAWL_API_TOKEN')
+        self.base_url = base_url or config.ONCRAWL_BASE_URL
+        self.max_connections = max_connections or config.ONCRAWL_MAX_CONNECTIONS
+        self.max_concurrency = max_concurrency or config.ONCRAWL_MAX_CONCURRENCY
+        self.rate_limiter = RateLimiter(
+            rate=config.ONCRAWL_RATE_LIMIT,
+            burst=config.ONCRAWL_RATE_BURST,
+            max_concurrency=self.max_concurrency
+        )
+        self.cache = ResponseCache(max_bytes=config.ONCRAWL_CACHE_MAX_BYTES)
+        self.inflight = SingleFlight()
+        self.headers = {
+            'Authorization': f'Bearer {self.api_token}',
+            'Content-Type': 'application/json'
         }
+        self._http: Optional[httpx.AsyncClient] = None
+    
+    async def open(self) -> None:
+        """Open the shared connection pool (no-op if already open)."""
+        if self._http is not None and not self._http.is_closed:
+            return
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=60
+        )
+    
+    async def close(self) -> None:
+        """Close the shared connection pool."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    async def _send(
+        self,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        timeout: float = 60,
+        endpoint: str = 'other'
+    ) -> httpx.Response:
+        """
+        GET `path`, or POST `payload` to it, retrying throttled requests.
+        
+        After ONCRAWL_MAX_RETRIES the last retryable response is returned
+        (a 504 if the last attempt timed out) for the caller to handle as usual.
+        Every attempt is recorded in the OnCrawl metrics under `endpoint`.
+        """
+        await self.open()
+        limiter = self.rate_limiter
+        attempt = 0
+        while True:
+            await limiter.bucket.acquire()
+            async with limiter.concurrency:
+                started = time.perf_counter()
+                sent_at = time.monotonic()
+                try:
+                    if payload is None:
+                        resp = await self._http.get(path, timeout=timeout)
+                    else:
+                        resp = await self._http.post(path, json=payload, timeout=timeout)
+                except httpx.TimeoutException:
+                    ONCRAWL_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status='timeout')
+                    if attempt >= config.ONCRAWL_MAX_RETRIES:
+                        # Surfaced like exhausted 429/5xx retries: a non-200 response
+                        return httpx.Response(
+                            504,
+                            text=f'OnCrawl request timed out after {attempt + 1} attempts',
+                            request=httpx.Request('GET' if payload is None else 'POST', self._http.base_url.join(path))
+                        )
+                    limiter.record_throttle(None, sent_at)
+                    retry_after = None
+                else:
+                    ONCRAWL_REQUEST_SECONDS.observe(
+                        time.perf_counter() - started, endpoint=endpoint, status=resp.status_code
+                    )
+                    ONCRAWL_BYTES.inc(len(resp.request.content), endpoint=endpoint, direction='sent')
+                    ONCRAWL_BYTES.inc(len(resp.content), endpoint=endpoint, direction='received')
+                    if resp.status_code not in RETRY_STATUS_CODES:
+                        limiter.concurrency.on_success()
+                        return resp
+                    retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+                    limiter.record_throttle(retry_after, sent_at)
+                    if attempt >= config.ONCRAWL_MAX_RETRIES:
+                        return resp
+            
+            # Sleep outside the concurrency slot so other requests can proceed
+            delay = backoff_delay(attempt, config.ONCRAWL_BACKOFF_BASE, config.ONCRAWL_BACKOFF_MAX)
+            await asyncio.sleep(max(delay, retry_after or 0))
+            limiter.retries += 1
+            ONCRAWL_RETRIES.inc(endpoint=endpoint)
+            attempt += 1
+    
+    async def _request(
+        self,
+        endpoint: str,
+        crawl_id: Optional[str],
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        timeout: float = 60,
+        cache: bool = True
+    ) -> Tuple[int, Any]:
+        """
+        Send a request through the response cache and single-flight layer.
+        
+        Returns (status_code, parsed JSON) on success and (status_code, text)
+        otherwise. Only 200 responses are cached. Coalesced callers share the
+        raw body but each decodes its own copy. Time spent waiting for the
+        upstream call counts as upstream time of the current API request.
+        """
+        key = make_key(endpoint, crawl_id, payload)
+        body = self.cache.get(key) if cache else None
+        if body is None:
+            with upstream_call():
+                status, raw = await self.inflight.do(
+                    (key, cache),
+                    lambda: self._fetch(key, path, payload, timeout, cache)
+                )
+            if status != 200:
+                return status, raw
+            body = json.loads(raw)
+        
+        if isinstance(body, dict) and isinstance(body.get('urls'), list):
+            ONCRAWL_ROWS.inc(len(body['urls']), endpoint=endpoint)
+        return 200, body
+    
+    async def _fetch(
+        self,
+        key: Tuple[str, str, str],
+        path: str,
+        payload: Optional[Dict[str, Any]],
+        timeout: float,
+        cache: bool
+    ) -> Tuple[int, Any]:
+        """Upstream call behind _request: (200, raw bytes) or (status, text)."""
+        resp = await self._send(path, payload, timeout, endpoint=key[0])
+        if resp.status_code != 200:
+            return resp.status_code, resp.text
+        
+        if cache:
+            endpoint, crawl_id, _ = key
+            self.cache.set(key, resp.content, await self._cache_ttl(endpoint, crawl_id, resp.content))
+        return 200, resp.content
+    
+    async def _cache_ttl(self, endpoint: str, crawl_id: Optional[str], body: bytes = b'') -> Optional[float]:
+        """TTL for a response: forever for finished-crawl data, long for finished crawl details, else per endpoint."""
+        if endpoint == 'crawl':
+            try:
+                crawl = json.loads(body).get('crawl') or {}
+            except (ValueError, AttributeError):
+                crawl = {}
+            if crawl.get('status') in FINISHED_CRAWL_STATUSES:
+                return config.ONCRAWL_FINISHED_CRAWL_TTL
+        elif endpoint in CRAWL_DATA_ENDPOINTS and crawl_id:
+            crawl = await self.get_crawl_details(crawl_id)
+            if crawl and crawl.get('status') == 'done':
+                return NEVER_EXPIRES
+        return config.ONCRAWL_CACHE_TTLS.get(endpoint, 0)
+    
+    async def test_connection(self) -> Dict[str, Any]:
+        """Test API connection by fetching projects."""
+        try:
+            resp = await self._send("/projects", timeout=30, endpoint='projects')
+            if resp.status_code == 200:
+                projects = resp.json().get('projects', [])
+                return {
+                    'success': True,
+                    'message': f'Connected successfully. Found {len(projects)} projects.',
+                    'project_count': len(projects)
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': f'API returned status {resp.status_code}',
+                    'error': resp.text
+                }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Connection failed: {str(e)}',
+                'error': str(e)
+            }
+    
+    async def get_projects(self) -> List[Dict[str, Any]]:
+        """Get all projects."""
+        status, body = await self._request('projects', None, "/projects", timeout=30)
+        if status == 200:
+            return body.get('projects', [])
+        return []
+    
+    async def get_crawl_details(self, crawl_id: str) -> Optional[Dict[str, Any]]:
+        """Get details for a specific crawl."""
+        status, body = await self._request('crawl', crawl_id, f"/crawls/{crawl_id}", timeout=30)
+        if status == 200:
+            return body.get('crawl', {})
+        return None
+    
+    async def get_live_crawls(self) -> List[Dict[str, Any]]:
+        """
+        Get all live crawls across all projects.
+        
+        The last crawl of every project is fetched concurrently (bounded by
+        the rate limiter), so this takes about one round trip after the
+        project list, and finished crawls usually come from the cache.
+        """
+        live_crawls = []
+        projects = [project for project in await self.get_projects() if project.get('last_crawl_id')]
+        crawls = await asyncio.gather(*[
+            self.get_crawl_details(project['last_crawl_id']) for project in projects
+        ])
         
-        # Get inlinks distribution
-        inlinks_dist = self.get_inlinks_distribution(crawl_id)
-        if not inlinks_dist.get('error'):
-            summary['inlinks_distribution'] = inlinks_dist
+        for project, crawl in zip(projects, crawls):
+            if crawl and crawl.get('link_status') == 'live':
+                live_crawls.append({
+                    'project_id': project.get('id'),
+                    'project_name': project.get('name'),
+                    'crawl_id': project['last_crawl_id'],
+                    'status': crawl.get('status'),
+                    'link_status': crawl.get('link_status'),
+                    'crawl_config': crawl.get('crawl_config', {})
+                })
         
-        # Get depth distribution
-        depth_dist = self.get_depth_distribution(crawl_id)
-        if not depth_dist.get('error'):
-            summary['depth_distribution'] = depth_dist
+        return live_crawls
+    
+    async def get_page_fields(self, crawl_id: str) -> List[Dict[str, Any]]:
+        """Get available fields for page data."""
+        status, body = await self._request(
+            'fields', crawl_id, f"/data/crawl/{crawl_id}/pages/fields", timeout=30
+        )
+        if status == 200:
+            return body.get('fields', [])
+        return []
+    
+    async def query_pages(
+        self,
+        crawl_id: str,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        sort: List[Dict[str, str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Query page data from a crawl. See OnCrawlClient.query_pages.
+        
+        Pass cache=False for one-off reads (e.g. full syncs) that should not
+        evict hot dashboard entries.
+        """
+        status, body = await self._request(
+            'pages', crawl_id, f"/data/crawl/{crawl_id}/pages",
+            _pages_payload(fields, oql, sort, limit, offset),
+            cache=cache
+        )
+        if status == 200:
+            return body
+        return _error_result(status, body)
+    
+    async def get_pages_with_low_inlinks(
+        self,
+        crawl_id: str,
+        max_inlinks: int = 3,
+        limit: Optional[int] = 1000
+    ) -> Dict[str, Any]:
+        """Get pages with low internal links (1-3 inlinks, not orphaned). limit=None returns all."""
+        query = _low_inlinks_query(max_inlinks, limit)
+        if limit is None:
+            return await self._query_all_pages(crawl_id, **query)
+        return await self.query_pages(crawl_id=crawl_id, **query)
+    
+    async def get_orphaned_pages(self, crawl_id: str, limit: Optional[int] = 1000) -> Dict[str, Any]:
+        """Get orphaned pages (0 inlinks). limit=None returns all."""
+        query = _orphaned_query(limit)
+        if limit is None:
+            return await self._query_all_pages(crawl_id, **query)
+        return await self.query_pages(crawl_id=crawl_id, **query)
+    
+    async def get_deep_pages(
+        self,
+        crawl_id: str,
+        min_depth: int = 4,
+        limit: Optional[int] = 1000
+    ) -> Dict[str, Any]:
+        """Get pages with high crawl depth. limit=None returns all."""
+        query = _deep_pages_query(min_depth, limit)
+        if limit is None:
+            return await self._query_all_pages(crawl_id, **query)
+        return await self.query_pages(crawl_id=crawl_id, **query)
+    
+    async def get_links(
+        self,
+        crawl_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        sort: List[Dict[str, str]] = None,
+        cache: bool = True
+    ) -> Dict[str, Any]:
+        """Query link data from a crawl."""
+        payload = {
+            'offset': offset,
+            'limit': limit,
+            'fields': fields if fields is not None else DEFAULT_LINK_FIELDS
+        }
+        if oql:
+            payload['oql'] = oql
+        if sort:
+            payload['sort'] = sort
         
-        # Count orphaned pages
-        orphaned = self.get_orphaned_pages(crawl_id, limit=1)
-        if not orphaned.get('error'):
-            summary['orphaned_count'] = orphaned.get('meta', {}).get('total_hits', 0)
+        status, body = await self._request(
+            'links', crawl_id, f"/data/crawl/{crawl_id}/links", payload, cache=cache
+        )
+        if status == 200:
+            return body
+        return _error_result(status, body)
+    
+    # ============== Streaming Iterators ==============
+    
+    async def _iter_batches(self, fetch, batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Follow offsets through a paginated endpoint, one batch at a time.
         
-        # Count low inlinks pages
-        low_inlinks = self.get_pages_with_low_inlinks(crawl_id, max_inlinks=3, limit=1)
-        if not low_inlinks.get('error'):
-            summary['low_inlinks_count'] = low_inlinks.get('meta', {}).get('total_hits', 0)
+        `fetch(offset, limit)` returns one Data API response. The next batch is
+        requested while the caller processes the current one, so at most two
+        batches are held in memory regardless of the result size.
+        """
+        offset = 0
+        pending = asyncio.ensure_future(fetch(offset, batch_size))
+        try:
+            while pending is not None:
+                result = await pending
+                pending = None
+                if result.get('error'):
+                    raise OnCrawlAPIError(result.get('message', ''), result.get('status_code', 500))
+                
+                rows = _result_rows(result)
+                offset += len(rows)
+                total_hits = result.get('meta', {}).get('total_hits')
+                more = len(rows) == batch_size and (total_hits is None or offset < total_hits)
+                if more:
+                    pending = asyncio.ensure_future(fetch(offset, batch_size))
+                if rows:
+                    yield rows
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    def iter_page_batches(
+        self,
+        crawl_id: str,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        sort: List[Dict[str, str]] = None,
+        batch_size: int = PAGE_BATCH_SIZE,
+        cache: bool = True
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield every page matching `oql` in batches of up to `batch_size` rows.
         
-        # Count deep pages
-        deep = self.get_deep_pages(crawl_id, min_depth=4, limit=1)
-        if not deep.get('error'):
-            summary['deep_pages_count'] = deep.get('meta', {}).get('total_hits', 0)
+        Results are sorted by url unless `sort` is given, so offsets stay stable
+        between requests. Raises OnCrawlAPIError if any request fails.
+        """
+        sort = sort or [{'field': 'url', 'order': 'asc'}]
+        return self._iter_batches(
+            lambda offset, limit: self.query_pages(
+                crawl_id=crawl_id, fields=fields, oql=oql, sort=sort,
+                limit=limit, offset=offset, cache=cache
+            ),
+            batch_size
+        )
+    
+    async def iter_pages(
+        self,
+        crawl_id: str,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        sort: List[Dict[str, str]] = None,
+        batch_size: int = PAGE_BATCH_SIZE,
+        cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every page matching `oql`, one row at a time. See iter_page_batches."""
+        async for batch in self.iter_page_batches(crawl_id, fields, oql, sort, batch_size, cache):
+            for row in batch:
+                yield row
+    
+    def iter_link_batches(
+        self,
+        crawl_id: str,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        batch_size: int = PAGE_BATCH_SIZE,
+        cache: bool = True
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield every link matching `oql` in batches of up to `batch_size` rows.
         
-        # Count pages not in sitemap
-        not_in_sitemap = self.get_pages_not_in_sitemap(crawl_id, limit=1)
-        if not not_in_sitemap.get('error'):
-            summary['not_in_sitemap_count'] = not_in_sitemap.get('meta', {}).get('total_hits', 0)
+        Links are sorted by origin then destination so offsets stay stable.
+        Raises OnCrawlAPIError if any request fails.
+        """
+        sort = [{'field': 'origin', 'order': 'asc'}, {'field': 'destination', 'order': 'asc'}]
+        return self._iter_batches(
+            lambda offset, limit: self.get_links(
+                crawl_id=crawl_id, limit=limit, offset=offset,
+                fields=fields, oql=oql, sort=sort, cache=cache
+            ),
+            batch_size
+        )
+    
+    async def iter_links(
+        self,
+        crawl_id: str,
+        fields: List[str] = None,
+        oql: Dict[str, Any] = None,
+        batch_size: int = PAGE_BATCH_SIZE,
+        cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every link matching `oql`, one row at a time. See iter_link_batches."""
+        async for batch in self.iter_link_batches(crawl_id, fields, oql, batch_size, cache):
+            for row in batch:
+                yield row
+    
+    async def _query_all_pages(self, crawl_id: str, **query) -> Dict[str, Any]:
+        """Run a canned query without a row cap, in the same shape as query_pages."""
+        query.pop('limit', None)
+        try:
+            urls = [row async for row in self.iter_pages(crawl_id, **query)]
+        except OnCrawlAPIError as e:
+            return _error_result(e.status_code, e.message)
+        return {'meta': {'total_hits': len(urls)}, 'urls': urls}
+    
+    async def aggregate_pages(
+        self,
+        crawl_id: str,
+        aggs: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Run aggregate queries on page data. See OnCrawlClient.aggregate_pages."""
+        status, body = await self._request(
+            'aggs', crawl_id, f"/data/crawl/{crawl_id}/pages/aggs", {'aggs': aggs}
+        )
+        if status == 200:
+            return body
+        return _error_result(status, body)
+    
+    async def get_inlinks_distribution(self, crawl_id: str) -> Dict[str, Any]:
+        """Get distribution of pages by inlink count ranges."""
+        return await self.aggregate_pages(crawl_id=crawl_id, aggs=[_inlinks_distribution_agg()])
+    
+    async def get_depth_distribution(self, crawl_id: str) -> Dict[str, Any]:
+        """Get distribution of pages by crawl depth."""
+        return await self.aggregate_pages(crawl_id=crawl_id, aggs=[_depth_distribution_agg()])
+    
+    async def get_pages_not_in_sitemap(
+        self,
+        crawl_id: str,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """Get pages that are not in the sitemap."""
+        return await self.query_pages(crawl_id=crawl_id, **_not_in_sitemap_query(limit))
+    
+    async def get_technical_summary(self, crawl_id: str) -> Dict[str, Any]:
+        """
+        Get a technical SEO summary for a crawl.
         
-        return summary
+        Distributions and counts all come from one batched aggs request.
+        """
+        result = await self.aggregate_pages(crawl_id=crawl_id, aggs=_technical_summary_aggs())
+        return build_technical_summary(crawl_id, result)
 
 
 # Quick test
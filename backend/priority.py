@@ -0,0 +1,360 @@
+"""
+Priority scoring for pages with technical gaps.
+
+`calculate_priority` scores one page. `rank_priority_pages` scores a whole
+crawl at once: it flattens the orphaned / low-inlinks / deep-page results
+into NumPy columns (URL id, depth, link equity, gap bitmask), looks base
+scores up per bitmask, applies depth and link-equity multipliers as array
+operations, and selects the top N with argpartition. Both produce
+identical scores; only the top N rows are turned back into dicts.
+
+A ranked list can then be filtered, re-sorted and read a page at a time
+with `query_ranked_pages`, using the same keyset cursors as the snapshot
+store's priority_pages table.
+"""
+
+import base64
+import hashlib
+import json
+from itertools import compress
+from operator import itemgetter
+from typing import Optional, Dict, List, Any, Callable, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from config import config
+
+if TYPE_CHECKING:
+    from link_graph import LinkGraph
+
+
+GAP_WEIGHTS = {
+    'low_inlinks': 1.0,      # Highest priority - most actionable
+    'orphaned': 0.85,        # High priority
+    'deep_page': 0.6,
+    'not_in_sitemap': 0.4
+}
+DEFAULT_GAP_WEIGHT = 0.3
+
+# Gaps in the order the priority-pages endpoint assigns them; bit i = PRIORITY_GAPS[i]
+PRIORITY_GAPS = ('orphaned', 'low_inlinks', 'deep_page')
+# Gap filter matching pages flagged as missing from the sitemap (not a scored gap)
+NOT_IN_SITEMAP = 'not_in_sitemap'
+MASK_GAPS = [
+    [gap for bit, gap in enumerate(PRIORITY_GAPS) if mask & (1 << bit)]
+    for mask in range(1 << len(PRIORITY_GAPS))
+]
+
+
+def _base_score(technical_gaps: List[str]) -> float:
+    """Gap weights summed in list order, with the multiple-issues bonus."""
+    base_score = 0
+    for gap in technical_gaps:
+        base_score += GAP_WEIGHTS.get(gap, DEFAULT_GAP_WEIGHT)
+
+    # Bonus for multiple issues
+    if len(technical_gaps) > 1:
+        base_score *= 1.2
+    return base_score
+
+
+def calculate_priority(page: Dict, technical_gaps: List[str]) -> float:
+    """
+    Calculate priority score based on technical gaps.
+
+    Scoring weights (adjusted):
+    - Low inlinks: 1.0 (highest priority - most actionable)
+    - Orphaned page: 0.85 (high priority)
+    - Deep page: 0.6
+    - Multiple issues: bonus multiplier
+    - Low link equity: up to LINK_EQUITY_WEIGHT bonus (only when the page
+      has a `link_equity` value from the crawl's link graph)
+    """
+    base_score = _base_score(technical_gaps)
+
+    # Depth penalty (deeper = higher priority)
+    depth = page.get('depth', 1)
+    if depth > 3:
+        base_score *= (1 + (depth - 3) * 0.1)
+
+    # Link equity bonus (less internal PageRank = higher priority)
+    equity = page.get('link_equity')
+    if equity is not None:
+        base_score *= (1 + config.LINK_EQUITY_WEIGHT * (1 - equity))
+
+    # Normalize to 0-100 scale
+    return min(round(base_score * 50, 1), 100)
+
+
+def matches_category(technical_gaps: List[str], category: str) -> bool:
+    """Check if a page's technical gaps put it in the specified category."""
+    if category == "poor":
+        # Poor performers: orphaned or multiple issues
+        return 'orphaned' in technical_gaps or len(technical_gaps) >= 2
+    elif category == "moderate":
+        # Moderate: single issue, not orphaned
+        return len(technical_gaps) == 1 and 'orphaned' not in technical_gaps
+
+    return True
+
+
+def matches_gap(page: Dict[str, Any], gap: str) -> bool:
+    """Check if a priority page has a gap (not_in_sitemap = flagged as missing from the sitemap)."""
+    if gap == NOT_IN_SITEMAP:
+        return page.get('in_sitemap') is not None and not page['in_sitemap']
+    return gap in page.get('technical_gaps', [])
+
+
+def page_category(technical_gaps: List[str]) -> Optional[str]:
+    """Dashboard category ('poor' / 'moderate') of a page, or None if it has no gaps."""
+    if not technical_gaps:
+        return None
+    if matches_category(technical_gaps, "poor"):
+        return "poor"
+    if matches_category(technical_gaps, "moderate"):
+        return "moderate"
+    return None
+
+
+def gap_mask(technical_gaps: List[str]) -> int:
+    """PRIORITY_GAPS bitmask of a list of gaps (other gaps have no bit)."""
+    return sum(1 << PRIORITY_GAPS.index(gap) for gap in set(technical_gaps) if gap in PRIORITY_GAPS)
+
+
+# Base score per gap bitmask, from the same code path as calculate_priority
+BASE_SCORES = np.array([_base_score(gaps) for gaps in MASK_GAPS], dtype=np.float64)
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Round an array exactly like Python's round(value, ndigits).
+
+    np.round scales, rounds and unscales, which matches round() except when
+    the scaled value sits within float error of a .5 tie; those few values
+    are rounded with round() itself.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(float(value), ndigits) for value in values[near_tie]]
+    return rounded
+
+
+def score_columns(mask: np.ndarray, depth: np.ndarray, equity: np.ndarray) -> np.ndarray:
+    """
+    Priority scores (rounded, not yet capped at 100) for columns of gap
+    bitmasks, depths (NaN = none) and link equities (NaN = no equity).
+
+    Multipliers are applied in calculate_priority's order with the same
+    float64 operations, so results are bit-identical.
+    """
+    score = BASE_SCORES[mask]
+    score = np.where(depth > 3, score * (1 + (depth - 3) * 0.1), score)
+    score = np.where(np.isnan(equity), score, score * (1 + config.LINK_EQUITY_WEIGHT * (1 - equity)))
+    return round_like_python(score * 50, 1)
+
+
+def _output_score(score: float) -> float:
+    # min(x, 100) returns the int 100 when x exceeds it
+    return 100 if score > 100 else score
+
+
+def rank_priority_pages(
+    gap_results: List[Tuple[str, Dict[str, Any]]],
+    include: Callable[[str], bool],
+    limit: Optional[int],
+    graph: Optional["LinkGraph"] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merge gap query results into the top `limit` pages by priority.
+
+    Args:
+        gap_results: (gap, Data API result) pairs in PRIORITY_GAPS order;
+            results with an 'error' are skipped
+        include: Whether a URL belongs in the list (market / excluded domains)
+        limit: Number of pages to return (None = every page)
+        graph: Link graph supplying `link_equity`, if the crawl has one
+
+    Returns:
+        Page dicts (first occurrence's fields plus link_equity,
+        technical_gaps and priority_score), ordered by priority with ties
+        kept in first-seen order
+    """
+    pages: List[Dict[str, Any]] = []
+    bits = []
+    for gap, result in gap_results:
+        if result.get('error'):
+            continue
+        gap_pages = [page for page in result.get('urls', []) if page.get('url')]
+        pages.extend(gap_pages)
+        bits.append(np.full(len(gap_pages), 1 << PRIORITY_GAPS.index(gap), dtype=np.int64))
+    if limit is None:
+        limit = len(pages)
+    if not pages or limit <= 0:
+        return []
+
+    # Drop rows outside the market / on excluded domains before interning
+    row_urls = list(map(itemgetter('url'), pages))
+    keep = np.fromiter(map(include, row_urls), dtype=bool, count=len(row_urls))
+    pages = list(compress(pages, keep))
+    row_urls = list(compress(row_urls, keep))
+    row_bits = np.concatenate(bits)[keep]
+    if not pages:
+        return []
+
+    # Intern URLs in first-seen order; dict.fromkeys keeps first-insertion order
+    urls = list(dict.fromkeys(row_urls))
+    url_ids = dict(zip(urls, range(len(urls))))
+    row_ids = np.fromiter(map(url_ids.__getitem__, row_urls), dtype=np.int64, count=len(row_urls))
+    rows = np.arange(len(row_ids))
+    first_row = np.full(len(urls), len(row_ids), dtype=np.int64)
+    np.minimum.at(first_row, row_ids, rows)
+    last_row = np.full(len(urls), -1, dtype=np.int64)
+    np.maximum.at(last_row, row_ids, rows)
+
+    # Gap bitmask per URL; depth from the URL's last row, as later gaps rescore with their own row
+    mask = np.zeros(len(urls), dtype=np.int64)
+    np.bitwise_or.at(mask, row_ids, row_bits)
+    row_depths = np.array([page.get('depth', 1) for page in pages], dtype=np.float64)
+    depth = row_depths[last_row]
+
+    equity = np.full(len(urls), np.nan)
+    has_equity = graph is not None and graph.link_equity is not None
+    if has_equity:
+        nodes = np.array([-1 if node is None else node for node in map(graph.url_ids.get, urls)], dtype=np.int64)
+        equity = np.where(nodes >= 0, graph.link_equity[nodes], 0.0)
+        equity = round_like_python(equity, 4)
+
+    scores = score_columns(mask, depth, equity)
+    capped = np.minimum(scores, 100)
+
+    # Top N by (capped) score, ties in first-seen order (URL ids are assigned in that order)
+    candidates = np.arange(len(urls))
+    if len(candidates) > limit:
+        threshold = -np.partition(-capped, limit - 1)[limit - 1]
+        in_top = capped >= threshold
+        candidates, scores, capped = candidates[in_top], scores[in_top], capped[in_top]
+    order = np.lexsort((candidates, -capped))[:limit]
+
+    ranked = []
+    for i in order:
+        url_id = candidates[i]
+        page = pages[first_row[url_id]]
+        if has_equity:
+            page = {**page, 'link_equity': float(equity[url_id])}
+        ranked.append({
+            **page,
+            'technical_gaps': list(MASK_GAPS[mask[url_id]]),
+            'priority_score': _output_score(float(scores[i]))
+        })
+    return ranked
+
+
+# ============== Sorting, Filtering and Cursors ==============
+
+# Sortable fields of a priority page; missing values sort as the fallback.
+# priority_score is the ranking itself, so its sort value is the rank.
+PRIORITY_SORT_FALLBACKS = {
+    'priority_score': None,
+    'url': '',
+    'title': '',
+    'nb_inlinks': -1,
+    'depth': -1,
+    'link_equity': -1
+}
+PRIORITY_CATEGORIES = ('all', 'poor', 'moderate')
+
+
+def priority_sort_value(page: Dict[str, Any], sort: str) -> Any:
+    """A page's value for a sort field other than priority_score, with its fallback if missing."""
+    value = page.get(sort)
+    return PRIORITY_SORT_FALLBACKS[sort] if value is None else value
+
+
+def rank_descending(sort: str, descending: bool) -> bool:
+    """
+    Direction of the (value, rank) keyset. Highest priority is rank 0, so
+    priority_score descending walks ranks upwards; any other field breaks
+    ties by rank in its own direction.
+    """
+    return not descending if sort == 'priority_score' else descending
+
+
+def encode_cursor(query_key: str, value: Any, rank: int) -> str:
+    """Opaque cursor for the row after (value, rank) in the query `query_key`."""
+    payload = json.dumps({'q': query_key, 'v': value, 'r': rank}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, query_key: str) -> Tuple[Any, int]:
+    """
+    (value, rank) of a cursor. Raises ValueError if it is malformed or was
+    issued for a different query.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        key, value, rank = payload['q'], payload['v'], int(payload['r'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if key != query_key:
+        raise ValueError("Cursor does not belong to this query")
+    return value, rank
+
+
+def priority_query_key(*params: Any) -> str:
+    """Short fingerprint of the parameters a cursor is valid for."""
+    return hashlib.sha1(json.dumps(params, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def query_ranked_pages(
+    ranked: List[Dict[str, Any]],
+    sort: str = 'priority_score',
+    descending: bool = True,
+    limit: int = 100,
+    after: Optional[Tuple[Any, int]] = None,
+    gap: Optional[str] = None,
+    category: str = 'all',
+    search: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], int, Optional[Tuple[Any, int]]]:
+    """
+    Filter, sort and page through a ranked priority list in memory.
+
+    Same semantics as SnapshotStore.query_priority_pages: rows are ordered
+    by (sort value, rank) and `after` is the (value, rank) key of the last
+    row already returned. Search is a case-insensitive substring match on
+    URL or title.
+
+    Returns:
+        (pages, total matching rows, key of the last page row if more follow)
+    """
+    needle = search.lower() if search else None
+    rows = []
+    for rank, page in enumerate(ranked):
+        gaps = page.get('technical_gaps', [])
+        if gap and not matches_gap(page, gap):
+            continue
+        if not matches_category(gaps, category):
+            continue
+        if needle and needle not in page['url'].lower() and needle not in (page.get('title') or '').lower():
+            continue
+        value = rank if sort == 'priority_score' else priority_sort_value(page, sort)
+        rows.append(((value, rank), page))
+
+    # Rows are in rank order already, which timsort keeps in linear time
+    reverse = rank_descending(sort, descending)
+    rows.sort(key=itemgetter(0), reverse=reverse)
+
+    start = 0
+    if after is not None:
+        after = tuple(after)
+        start = next(
+            (i for i, (key, _) in enumerate(rows) if (key < after if reverse else key > after)),
+            len(rows)
+        )
+
+    page_rows = rows[start:start + limit]
+    more = start + limit < len(rows)
+    last_key = page_rows[-1][0] if page_rows and more else None
+    return [page for _, page in page_rows], len(rows), last_key
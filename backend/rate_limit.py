@@ -0,0 +1,135 @@
+"""
+Client-side rate limiting for OnCrawl Data API calls.
+
+A token bucket caps the request rate and honours Retry-After pauses, an
+AIMD limiter adapts the number of concurrent requests to observed
+throttling, and `backoff_delay` gives jittered exponential retry delays.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` (e.g. from a Retry-After header)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit adjusted by additive-increase / multiplicative-decrease.
+
+    Each success raises the limit by 1/limit (about +1 per window of
+    successful requests). A throttling signal halves it, but only for
+    requests sent after the previous decrease: a burst of 429s from one
+    window of in-flight requests halves the limit once. The limit stays
+    within [min_limit, max_limit].
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial or max_limit)
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveConcurrencyLimiter":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self, sent_at: float) -> None:
+        """Halve the limit for a request sent at `sent_at` (time.monotonic())."""
+        if sent_at < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit / 2)
+        self._last_decrease = time.monotonic()
+
+
+class RateLimiter:
+    """Token bucket + AIMD concurrency, with counters for reporting."""
+
+    def __init__(self, rate: float, burst: float, max_concurrency: int):
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(max_limit=max_concurrency)
+        self.retries = 0
+        self.throttled = 0
+
+    def record_throttle(self, retry_after: Optional[float], sent_at: float) -> None:
+        self.throttled += 1
+        self.concurrency.on_throttle(sent_at)
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rate_per_second': self.bucket.rate,
+            'burst': self.bucket.capacity,
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'max_concurrency': self.concurrency.max_limit,
+            'in_flight': self.concurrency.in_flight,
+            'retries': self.retries,
+            'throttled': self.throttled
+        }
@@ -0,0 +1,456 @@
+"""
+Semantic relevance engine for interlink recommendations (criteria doc §2.5).
+
+Pages are turned into L2-normalised sparse TF-IDF vectors built from their
+title, H1 and body text, so cosine similarity is a sparse dot product. Top-k
+candidate sources for a batch of target pages come from blocked sparse
+matrix products (targets x all pages, one block of rows at a time), which
+never materialises the O(n^2) dense similarity matrix.
+
+Page text comes from a local corpus file (data/corpus/<crawl_id>.jsonl,
+one {"url", "title", "h1", "text"} object per line) when present, otherwise
+from page titles in the crawl snapshot.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from typing import Optional, Dict, List, Any, Iterable, Set, Callable
+
+import numpy as np
+import scipy.sparse as sp
+
+from config import config
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or our that
+the this to was we what when where which who why will with you your
+""".split())
+
+# Field weights: a term in the title counts three times as much as in the body
+FIELD_WEIGHTS = {'title': 3, 'h1': 2, 'text': 1}
+
+# Max words / characters for suggested anchor text (criteria doc §2.6)
+ANCHOR_MAX_WORDS = 7
+ANCHOR_MAX_CHARS = 60
+
+
+# Arrays written per crawl for worker processes to memory-map
+FEATURE_ARRAYS = (
+    'data', 'indices', 'indptr',
+    'transposed_data', 'transposed_indices', 'transposed_indptr',
+    'blocked', 'shape'
+)
+
+
+def corpus_path(crawl_id: str) -> str:
+    return os.path.join(config.CORPUS_DIR, f"{crawl_id}.jsonl")
+
+
+def features_dir(crawl_id: str) -> str:
+    """Directory of a crawl's memory-mappable feature arrays (next to the snapshot database)."""
+    return os.path.join(os.path.dirname(config.DATABASE_PATH) or '.', 'features', crawl_id)
+
+
+def load_corpus_file(path: str) -> List[Dict[str, Any]]:
+    """Read a JSONL corpus of {"url", "title", "h1", "text"} documents."""
+    documents = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                documents.append(json.loads(line))
+    return documents
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def document_terms(document: Dict[str, Any]) -> Counter:
+    """Weighted term counts for one document across its text fields."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(document.get(field)):
+            counts[token] += weight
+    return counts
+
+
+def suggest_anchor_text(document: Dict[str, Any]) -> str:
+    """Target page title (or H1) truncated to ANCHOR_MAX_WORDS words / ANCHOR_MAX_CHARS chars."""
+    text = (document.get('title') or document.get('h1') or '').strip()
+    words = text.split()[:ANCHOR_MAX_WORDS]
+    anchor = ' '.join(words)
+    while len(anchor) > ANCHOR_MAX_CHARS and len(words) > 1:
+        words = words[:-1]
+        anchor = ' '.join(words)
+    return anchor[:ANCHOR_MAX_CHARS]
+
+
+def _best(
+    blocked: np.ndarray,
+    row: int,
+    page_ids: np.ndarray,
+    scores: np.ndarray,
+    k: int,
+    excluded: Optional[Set[int]]
+) -> List[tuple]:
+    keep = (page_ids != row) & (scores > 0) & ~blocked[page_ids]
+    if excluded:
+        keep &= ~np.isin(page_ids, list(excluded))
+    page_ids, scores = page_ids[keep], scores[keep]
+    if len(scores) > k:
+        top = np.argpartition(-scores, k)[:k]
+        page_ids, scores = page_ids[top], scores[top]
+    order = np.argsort(-scores, kind='stable')
+    return [(int(page_ids[i]), float(scores[i])) for i in order]
+
+
+def blocked_top_k(
+    matrix: sp.csr_matrix,
+    transposed: sp.csr_matrix,
+    blocked: np.ndarray,
+    rows: List[int],
+    k: int,
+    exclude: Optional[Dict[int, Set[int]]] = None,
+    block_size: Optional[int] = None
+) -> Dict[int, List[tuple]]:
+    """
+    Top-k most similar pages for each row, one block of rows per sparse product.
+
+    `transposed` is matrix.T in CSR form. Each product is a sparse
+    (block x pages) matrix holding only pages that share a term with a
+    target, so memory stays bounded by the block size.
+    """
+    block_size = block_size or config.RELEVANCE_BLOCK_SIZE
+    exclude = exclude or {}
+    results: Dict[int, List[tuple]] = {}
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        similarities = (matrix[block] @ transposed).tocsr()
+        for i, row in enumerate(block):
+            begin, end = similarities.indptr[i], similarities.indptr[i + 1]
+            results[row] = _best(
+                blocked, row, similarities.indices[begin:end], similarities.data[begin:end], k, exclude.get(row)
+            )
+    return results
+
+
+def shared_term_ids(matrix: sp.csr_matrix, row: int, other: int, limit: int = 5) -> np.ndarray:
+    """Term ids contributing most to the similarity of two pages."""
+    a_terms = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+    b_terms = matrix.indices[matrix.indptr[other]:matrix.indptr[other + 1]]
+    terms, a_pos, b_pos = np.intersect1d(a_terms, b_terms, assume_unique=True, return_indices=True)
+    weights = (
+        matrix.data[matrix.indptr[row] + a_pos] * matrix.data[matrix.indptr[other] + b_pos]
+    )
+    return terms[np.argsort(-weights, kind='stable')[:limit]]
+
+
+class RelevanceIndex:
+    """Sparse TF-IDF matrix over a crawl's pages, with blocked top-k search."""
+
+    def __init__(
+        self,
+        crawl_id: str,
+        documents: List[Dict[str, Any]],
+        matrix: sp.csr_matrix,
+        vocabulary: Dict[str, int],
+        blocked: Optional[np.ndarray] = None
+    ):
+        self.crawl_id = crawl_id
+        self.documents = documents
+        self.urls = [document['url'] for document in documents]
+        self.url_ids = {url: i for i, url in enumerate(self.urls)}
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        # Pages never recommended as link sources (e.g. excluded domains)
+        self.blocked = blocked if blocked is not None else np.zeros(len(documents), dtype=bool)
+        # Terms x pages, kept in CSR so each block product is CSR @ CSR
+        self.transposed = matrix.T.tocsr()
+        self.features_path: Optional[str] = None
+        # Serializes the first save_features, so concurrent jobs never rewrite files being mapped
+        self._features_lock = asyncio.Lock()
+        self.terms = [None] * len(vocabulary)
+        for term, column in vocabulary.items():
+            self.terms[column] = term
+
+    @classmethod
+    def build(
+        cls,
+        crawl_id: str,
+        documents: Iterable[Dict[str, Any]],
+        exclude_source: Optional[Callable[[str], bool]] = None
+    ) -> "RelevanceIndex":
+        """
+        Build the TF-IDF matrix.
+
+        Uses sublinear term frequency (1 + log tf) and smoothed IDF
+        (log((1 + n) / (1 + df)) + 1), then L2-normalises each row. Pages
+        matching `exclude_source` stay in the index (so they can still be
+        targets) but are never suggested as sources.
+        """
+        documents = [document for document in documents if document.get('url')]
+        vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+
+        for document in documents:
+            for term, count in document_terms(document).items():
+                column = vocabulary.setdefault(term, len(vocabulary))
+                indices.append(column)
+                data.append(1.0 + math.log(count))
+            indptr.append(len(indices))
+
+        matrix = sp.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(documents), len(vocabulary))
+        )
+
+        doc_freq = np.bincount(matrix.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(documents)) / (1 + doc_freq)) + 1
+        matrix = matrix.multiply(idf.astype(np.float32)).tocsr()
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sp.diags((1 / norms).astype(np.float32)) @ matrix
+
+        blocked = np.array(
+            [bool(exclude_source and exclude_source(document['url'])) for document in documents],
+            dtype=bool
+        )
+        return cls(crawl_id, documents, matrix.tocsr(), vocabulary, blocked)
+
+    @property
+    def num_pages(self) -> int:
+        return len(self.urls)
+
+    def save_features(self) -> str:
+        """
+        Write the TF-IDF matrix, its transpose and the blocked mask as .npy
+        files that worker processes memory-map instead of copying.
+        """
+        directory = features_dir(self.crawl_id)
+        tmp_directory = directory + '.tmp'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        # One index dtype for both arrays, so scipy can wrap the maps without upcasting
+        index_dtype = np.int32 if self.matrix.nnz < 2 ** 31 else np.int64
+        arrays = {
+            'data': self.matrix.data,
+            'indices': self.matrix.indices.astype(index_dtype, copy=False),
+            'indptr': self.matrix.indptr.astype(index_dtype, copy=False),
+            'transposed_data': self.transposed.data,
+            'transposed_indices': self.transposed.indices.astype(index_dtype, copy=False),
+            'transposed_indptr': self.transposed.indptr.astype(index_dtype, copy=False),
+            'blocked': self.blocked,
+            'shape': np.array(self.matrix.shape, dtype=np.int64)
+        }
+        for name in FEATURE_ARRAYS:
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), arrays[name])
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        self.features_path = directory
+        return directory
+
+    async def ensure_features(self) -> str:
+        """Save the feature files once (other callers wait for that save) and return their directory."""
+        async with self._features_lock:
+            if self.features_path is None:
+                await asyncio.to_thread(self.save_features)
+        return self.features_path
+
+    def top_k(
+        self,
+        rows: List[int],
+        k: int,
+        exclude: Optional[Dict[int, Set[int]]] = None,
+        candidates: Optional[Dict[int, np.ndarray]] = None,
+        block_size: Optional[int] = None
+    ) -> Dict[int, List[tuple]]:
+        """
+        Top-k most similar pages for each row.
+
+        Args:
+            rows: Target page ids
+            k: Results per target
+            exclude: Per-target page ids to skip (the target itself is always skipped)
+            candidates: Per-target page ids to restrict scoring to (e.g. from
+                an LSH prefilter); targets without an entry score all pages
+            block_size: Targets per sparse product (default config.RELEVANCE_BLOCK_SIZE)
+
+        Returns:
+            {row: [(page_id, similarity), ...]} sorted by similarity descending
+        """
+        exclude = exclude or {}
+        candidates = candidates or {}
+
+        full_rows = [row for row in rows if row not in candidates]
+        results = blocked_top_k(self.matrix, self.transposed, self.blocked, full_rows, k, exclude, block_size)
+
+        for row, page_ids in candidates.items():
+            if row not in rows:
+                continue
+            page_ids = np.asarray(page_ids, dtype=np.int64)
+            scores = (self.matrix[page_ids] @ self.matrix[row].T).toarray().ravel()
+            results[row] = _best(self.blocked, row, page_ids, scores, k, exclude.get(row))
+
+        return results
+
+    def shared_terms(self, row: int, other: int, limit: int = 5) -> List[str]:
+        """Terms contributing most to the similarity of two pages."""
+        return [self.terms[term] for term in shared_term_ids(self.matrix, row, other, limit)]
+
+    def recommend(
+        self,
+        url: str,
+        k: int = 10,
+        exclude_urls: Optional[Set[str]] = None,
+        candidate_urls: Optional[List[str]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Top-k candidate source pages to link to `url`, or None if it is not indexed.
+
+        When `candidate_urls` (e.g. from the MinHash/LSH index) is given, only
+        those pages are scored; if they yield fewer than k matches, all pages
+        are scored instead.
+        """
+        row = self.url_ids.get(url)
+        if row is None:
+            return None
+
+        excluded = {self.url_ids[u] for u in (exclude_urls or ()) if u in self.url_ids}
+        matches = []
+        if candidate_urls is not None:
+            page_ids = np.array([self.url_ids[u] for u in candidate_urls if u in self.url_ids], dtype=np.int64)
+            matches = self.top_k([row], k, exclude={row: excluded}, candidates={row: page_ids})[row]
+        if len(matches) < k:
+            matches = self.top_k([row], k, exclude={row: excluded})[row]
+        anchor = suggest_anchor_text(self.documents[row])
+
+        return [
+            {
+                'source_url': self.urls[page_id],
+                'source_title': self.documents[page_id].get('title'),
+                'relevance_score': round(similarity * 100, 1),
+                'matched_terms': self.shared_terms(row, page_id),
+                'suggested_anchor_text': anchor
+            }
+            for page_id, similarity in matches
+        ]
+
+
+# Feature matrices already mapped by this (worker) process, by directory and write time
+_mapped_features: Dict[tuple, tuple] = {}
+
+
+def _map_features(directory: str) -> tuple:
+    key = (directory, os.stat(os.path.join(directory, 'shape.npy')).st_mtime_ns)
+    features = _mapped_features.get(key)
+    if features is None:
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in FEATURE_ARRAYS
+        }
+        rows, columns = (int(value) for value in arrays['shape'])
+        matrix = sp.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']), shape=(rows, columns), copy=False
+        )
+        transposed = sp.csr_matrix(
+            (arrays['transposed_data'], arrays['transposed_indices'], arrays['transposed_indptr']),
+            shape=(columns, rows),
+            copy=False
+        )
+        _mapped_features.clear()
+        features = _mapped_features[key] = (matrix, transposed, np.asarray(arrays['blocked']))
+    return features
+
+
+def score_feature_chunk(
+    directory: str,
+    rows: List[int],
+    k: int,
+    exclude: Optional[Dict[int, Set[int]]] = None
+) -> List[tuple]:
+    """
+    Top-k matches for a chunk of target rows, against memory-mapped features.
+
+    Runs in worker processes: the matrices are mapped from `directory`
+    (written by RelevanceIndex.save_features) rather than pickled, so every
+    worker shares one copy through the page cache.
+
+    Returns:
+        [(row, [(page_id, similarity, [term ids]), ...]), ...]
+    """
+    matrix, transposed, blocked = _map_features(directory)
+    results = blocked_top_k(matrix, transposed, blocked, rows, k, exclude)
+    return [
+        (row, [
+            (page_id, similarity, shared_term_ids(matrix, row, page_id).tolist())
+            for page_id, similarity in results[row]
+        ])
+        for row in rows
+    ]
+
+
+async def load_documents(snapshot_store, crawl_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Page text for a crawl: the local corpus file if present, else snapshot titles."""
+    path = corpus_path(crawl_id)
+    if os.path.exists(path):
+        return await asyncio.to_thread(load_corpus_file, path)
+    if await snapshot_store.has_snapshot(crawl_id):
+        return await snapshot_store.get_page_documents(crawl_id)
+    return None
+
+
+class RelevanceStore:
+    """Relevance indexes by crawl, built on first use and kept in memory."""
+
+    def __init__(self):
+        self._indexes: Dict[str, RelevanceIndex] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(
+        self,
+        snapshot_store,
+        crawl_id: str,
+        exclude_source: Optional[Callable[[str], bool]] = None
+    ) -> Optional[RelevanceIndex]:
+        """
+        Return the index for a crawl, building it on first use.
+
+        Returns None when the crawl has neither a corpus file nor a snapshot.
+        The TF-IDF build runs in a worker thread so it does not block the
+        event loop.
+        """
+        index = self._indexes.get(crawl_id)
+        if index is not None:
+            return index
+
+        async with self._lock:
+            if crawl_id in self._indexes:
+                return self._indexes[crawl_id]
+            documents = await load_documents(snapshot_store, crawl_id)
+            if documents is None:
+                return None
+            index = await asyncio.to_thread(RelevanceIndex.build, crawl_id, documents, exclude_source)
+            self._indexes[crawl_id] = index
+            return index
+
+    def invalidate(self, crawl_id: str) -> None:
+        self._indexes.pop(crawl_id, None)
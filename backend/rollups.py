@@ -0,0 +1,94 @@
+"""
+Per-market rollups of snapshotted crawls.
+
+A finished crawl's dashboard numbers only depend on the market filter, so
+they are computed once per market when the crawl is snapshotted: the
+technical summary (gap counts and inlink / depth histograms) and the
+ranked priority page list. Both are stored in the snapshot database, so
+switching markets is a single-row lookup and priority pages of any market
+are read a page at a time from the indexed priority_pages table.
+"""
+
+import asyncio
+from typing import Optional, Dict, List, Any, TYPE_CHECKING
+
+from priority import rank_priority_pages
+from metrics import timed
+from url_classifier import MARKET_PREFIXES, GLOBAL_MARKET
+
+if TYPE_CHECKING:
+    from link_graph import LinkGraph
+    from snapshot import SnapshotStore
+
+
+ROLLUP_MARKETS = [GLOBAL_MARKET, *MARKET_PREFIXES]
+
+
+def _has_equity(graph: Optional["LinkGraph"]) -> bool:
+    return graph is not None and graph.link_equity is not None
+
+
+class MarketRollups:
+    """Builds and serves the stored per-market rollups of snapshotted crawls."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def build(
+        self,
+        snapshot_store: "SnapshotStore",
+        crawl_id: str,
+        graph: Optional["LinkGraph"] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Compute and store the rollups of every market for a snapshotted crawl.
+
+        The gap pages of all markets (excluded domains removed) are ranked
+        once; a market's list is that ranking filtered by market. Priority
+        scores include link equity when the crawl's graph has it, so rollups
+        are rebuilt after a graph build.
+        """
+        summaries = await snapshot_store.get_market_summaries(crawl_id, ROLLUP_MARKETS)
+        orphaned, low_inlinks, deep_pages = await asyncio.gather(
+            snapshot_store.get_orphaned_pages(crawl_id, limit=None, market=GLOBAL_MARKET),
+            snapshot_store.get_pages_with_low_inlinks(crawl_id, max_inlinks=3, limit=None, market=GLOBAL_MARKET),
+            snapshot_store.get_deep_pages(crawl_id, min_depth=4, limit=None, market=GLOBAL_MARKET)
+        )
+        gap_results = [('orphaned', orphaned), ('low_inlinks', low_inlinks), ('deep_page', deep_pages)]
+        with timed('merge_score'):
+            ranked = await asyncio.to_thread(rank_priority_pages, gap_results, lambda url: True, None, graph)
+
+        rollups = [
+            {'market': market, 'with_equity': _has_equity(graph), 'summary': summaries[market]}
+            for market in ROLLUP_MARKETS
+        ]
+        await snapshot_store.save_market_rollups(crawl_id, rollups, ranked)
+        return rollups
+
+    async def get(
+        self,
+        snapshot_store: "SnapshotStore",
+        crawl_id: str,
+        market: str,
+        graph: Optional["LinkGraph"] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The stored rollup of a market, building the crawl's rollups first if
+        they are missing or were scored with a different link equity state.
+
+        Returns None for markets without a rollup (unknown market codes) and
+        crawls without a complete snapshot.
+        """
+        if market not in ROLLUP_MARKETS or not await snapshot_store.has_snapshot(crawl_id):
+            return None
+
+        rollup = await snapshot_store.get_market_rollup(crawl_id, market)
+        if rollup is not None and rollup['with_equity'] == _has_equity(graph):
+            return rollup
+
+        async with self._lock:
+            rollup = await snapshot_store.get_market_rollup(crawl_id, market)
+            if rollup is not None and rollup['with_equity'] == _has_equity(graph):
+                return rollup
+            rollups = await self.build(snapshot_store, crawl_id, graph)
+        return next(rollup for rollup in rollups if rollup['market'] == market)
@@ -0,0 +1,162 @@
+"""
+"What-if" simulation of proposed internal links on a crawl's link graph.
+
+New follow links can only shorten paths, so crawl depth is updated by an
+incremental BFS seeded at the targets whose depth drops. It visits only
+pages whose depth actually changes, never the whole graph.
+
+Targets start from the crawl snapshot's nb_inlinks and depth, the numbers
+the priority table uses, and each new follow link adds one inlink.
+"""
+
+import heapq
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+
+from columns import CrawlColumns, MISSING
+from link_graph import LinkGraph, UNREACHABLE
+
+
+# Gap thresholds, matching the dashboard's low-inlinks and deep-page queries
+LOW_INLINKS_MAX = 3
+DEEP_PAGE_MIN_DEPTH = 4
+
+
+def technical_gaps(nb_inlinks: int, depth: Optional[int]) -> List[str]:
+    """Gap labels in the same order the priority-pages endpoint assigns them."""
+    gaps = []
+    if nb_inlinks == 0:
+        gaps.append('orphaned')
+    elif nb_inlinks <= LOW_INLINKS_MAX:
+        gaps.append('low_inlinks')
+    if depth is not None and depth >= DEEP_PAGE_MIN_DEPTH:
+        gaps.append('deep_page')
+    return gaps
+
+
+def _page_state(nb_inlinks: int, depth: int) -> Dict[str, Any]:
+    depth_value = None if depth == UNREACHABLE else int(depth)
+    return {
+        'nb_inlinks': int(nb_inlinks),
+        'depth': depth_value,
+        'orphaned': nb_inlinks == 0,
+        'technical_gaps': technical_gaps(nb_inlinks, depth_value)
+    }
+
+
+def _baseline(graph: LinkGraph, columns: Optional[CrawlColumns], node: int) -> Tuple[int, int]:
+    """
+    A page's (nb_inlinks, depth) from the snapshot columns, falling back to
+    its unique follow inlinks and BFS depth in the graph.
+    """
+    nb_inlinks = int(graph.in_degree(follow_only=True, unique=True)[node])
+    depth = int(graph.depth[node])
+    row = columns.row_of(graph.urls[node]) if columns is not None else None
+    if row is not None:
+        if columns.nb_inlinks[row] != MISSING:
+            nb_inlinks = int(columns.nb_inlinks[row])
+        if columns.depth[row] != MISSING:
+            depth = int(columns.depth[row])
+    return nb_inlinks, depth
+
+
+def simulate_links(
+    graph: LinkGraph,
+    links: List[Tuple[str, str, bool]],
+    columns: Optional[CrawlColumns] = None
+) -> Dict[str, Any]:
+    """
+    Apply proposed (source, target, follow) links to the graph, without
+    changing it, and report before/after state for every target.
+
+    Before nb_inlinks and depth come from the snapshot `columns` when given
+    (pages not in the snapshot, or without columns, use unique follow links
+    and BFS depth in the graph). The same baseline depth seeds the BFS and
+    is reported in 'depth_changes', so a page's depth after is the shorter
+    of its depth before and any new path. Only new follow links add inlinks.
+
+    Returns:
+        Dict with 'pages' (per target before/after), 'depth_changes' (every
+        page whose depth improved, including ones downstream of a target)
+        and 'skipped' (links whose URLs are not in the graph or that exist
+        already, as a follow link or, for a nofollow link, at all)
+    """
+    if graph.depth is None:
+        graph.compute_depths()
+
+    # Baselines of the pages the simulation touches, looked up on first use
+    baselines: Dict[int, Tuple[int, int]] = {}
+
+    def baseline_of(node: int) -> Tuple[int, int]:
+        if node not in baselines:
+            baselines[node] = _baseline(graph, columns, node)
+        return baselines[node]
+
+    added_inlinks: Dict[int, int] = defaultdict(int)
+    extra_out: Dict[int, List[int]] = defaultdict(list)
+    skipped = []
+    seen = set()
+
+    for source_url, target_url, follow in links:
+        source, target = graph.node_id(source_url), graph.node_id(target_url)
+        if source is None or target is None:
+            skipped.append({'source': source_url, 'target': target_url, 'reason': 'url_not_in_graph'})
+            continue
+        if (source, target) in seen or target in graph.out_links(source, follow_only=follow):
+            skipped.append({'source': source_url, 'target': target_url, 'reason': 'link_exists'})
+            continue
+        seen.add((source, target))
+        added_inlinks[target] += int(follow)
+        if follow:
+            extra_out[source].append(target)
+
+    # Incremental BFS: depth overrides for changed pages only
+    new_depth: Dict[int, int] = {}
+
+    def depth_of(node: int) -> int:
+        return new_depth.get(node, baseline_of(node)[1])
+
+    def improves(candidate: int, node: int) -> bool:
+        current = depth_of(node)
+        return current == UNREACHABLE or candidate < current
+
+    queue: List[Tuple[int, int]] = []
+    for source, targets in extra_out.items():
+        source_depth = depth_of(source)
+        if source_depth == UNREACHABLE:
+            continue
+        for target in targets:
+            if improves(source_depth + 1, target):
+                new_depth[target] = source_depth + 1
+                heapq.heappush(queue, (source_depth + 1, target))
+
+    while queue:
+        node_depth, node = heapq.heappop(queue)
+        if node_depth != depth_of(node):
+            continue  # Stale entry, already reached by a shorter path
+        for neighbour in graph.out_links(node, follow_only=True).tolist() + extra_out.get(node, []):
+            if improves(node_depth + 1, neighbour):
+                new_depth[neighbour] = node_depth + 1
+                heapq.heappush(queue, (node_depth + 1, neighbour))
+
+    pages = []
+    for node in sorted(added_inlinks):
+        inlinks_before, depth_before = baseline_of(node)
+        pages.append({
+            'url': graph.urls[node],
+            'before': _page_state(inlinks_before, depth_before),
+            'after': _page_state(inlinks_before + added_inlinks[node], depth_of(node))
+        })
+
+    return {
+        'pages': pages,
+        'depth_changes': [
+            {
+                'url': graph.urls[node],
+                'before': _page_state(*baseline_of(node))['depth'],
+                'after': depth
+            }
+            for node, depth in new_depth.items()
+        ],
+        'skipped': skipped
+    }
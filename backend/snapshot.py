@@ -0,0 +1,901 @@
+"""
+Local crawl snapshot store for the Internal Linking Tool.
+
+Finished OnCrawl crawls never change, so each one is synced once into an
+indexed SQLite table and dashboard queries then run locally instead of
+against the live Data API. Page queries and aggregations read a
+memory-mapped columnar copy of each snapshot (columns.py), written once
+after sync. Query methods mirror AsyncOnCrawlClient's signatures and
+response shapes so callers can use either interchangeably.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Any, Set, AsyncIterator, Callable
+
+import aiosqlite
+import numpy as np
+
+from config import config
+from oncrawl_client import build_technical_summary, OnCrawlAPIError
+from url_classifier import UrlClassifier, GLOBAL_MARKET
+from columns import CrawlColumns, SOURCE_COLUMNS, MISSING, FLAG_EXCLUDED, FLAG_NOT_IN_SITEMAP
+from priority import PRIORITY_GAPS, NOT_IN_SITEMAP, rank_descending, gap_mask, page_category
+
+
+SNAPSHOT_FIELDS = [
+    'url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap'
+]
+
+# SQL sort expression per priority page sort field (missing values as in PRIORITY_SORT_FALLBACKS)
+PRIORITY_SORT_COLUMNS = {
+    'priority_score': 'rank',
+    'url': 'url',
+    'title': "IFNULL(title, '')",
+    'nb_inlinks': 'IFNULL(nb_inlinks, -1)',
+    'depth': 'IFNULL(depth, -1)',
+    'link_equity': 'IFNULL(link_equity, -1)'
+}
+
+# Column order of _page_row
+PAGE_COLUMNS = [
+    'crawl_id', 'url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap',
+    'market_mask', 'excluded'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    crawl_id TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL,
+    synced_at TEXT NOT NULL,
+    classifier TEXT
+);
+
+CREATE TABLE IF NOT EXISTS pages (
+    crawl_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    nb_inlinks INTEGER,
+    depth INTEGER,
+    status_code INTEGER,
+    title TEXT,
+    word_count INTEGER,
+    in_sitemap INTEGER,
+    market_mask INTEGER,
+    excluded INTEGER,
+    PRIMARY KEY (crawl_id, url)
+);
+
+-- Pages of a sync in progress, moved into pages in one transaction when it completes
+CREATE TABLE IF NOT EXISTS pages_staging (
+    crawl_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    nb_inlinks INTEGER,
+    depth INTEGER,
+    status_code INTEGER,
+    title TEXT,
+    word_count INTEGER,
+    in_sitemap INTEGER,
+    market_mask INTEGER,
+    excluded INTEGER,
+    PRIMARY KEY (crawl_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pages_inlinks ON pages (crawl_id, status_code, nb_inlinks);
+CREATE INDEX IF NOT EXISTS idx_pages_depth ON pages (crawl_id, status_code, depth);
+CREATE INDEX IF NOT EXISTS idx_pages_sitemap ON pages (crawl_id, status_code, in_sitemap);
+
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    crawl_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    content_hash INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (crawl_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_minhash_content ON minhash_signatures (content_hash);
+
+CREATE TABLE IF NOT EXISTS market_rollups (
+    crawl_id TEXT NOT NULL,
+    market TEXT NOT NULL,
+    with_equity INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (crawl_id, market)
+);
+
+CREATE TABLE IF NOT EXISTS priority_pages (
+    id INTEGER PRIMARY KEY,
+    crawl_id TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    market_mask INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    nb_inlinks INTEGER,
+    depth INTEGER,
+    link_equity REAL,
+    gap_mask INTEGER NOT NULL,
+    category TEXT,
+    in_sitemap INTEGER,
+    page TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_priority_rank ON priority_pages (crawl_id, rank);
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_priority_{field} ON priority_pages (crawl_id, {expression}, rank);\n"
+    for field, expression in PRIORITY_SORT_COLUMNS.items()
+    if field != 'priority_score'
+)
+
+# Trigram full-text index over priority page URLs and titles (rowid = priority_pages.id),
+# for substring search. Needs SQLite 3.34+ built with FTS5; LIKE scans are used otherwise.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS priority_search USING fts5(url, title, tokenize='trigram');
+"""
+
+# Shortest search the trigram index can answer
+MIN_TRIGRAM_SEARCH = 3
+
+# Columns added after the first release, created on open for older databases
+MIGRATED_COLUMNS = {
+    'snapshots': {'classifier': 'TEXT'},
+    'pages': {'market_mask': 'INTEGER', 'excluded': 'INTEGER'},
+    'priority_pages': {'in_sitemap': 'INTEGER'}
+}
+
+# Max bound parameters per SQLite statement
+SQL_PARAM_CHUNK = 900
+
+# Rows fetched per round trip when writing a snapshot's columns
+COLUMN_FETCH_SIZE = 10000
+
+# Same buckets as the live inlinks distribution aggregation
+INLINK_RANGES = [
+    ('0', 0, 1),
+    ('1-3', 1, 4),
+    ('4-10', 4, 11),
+    ('11-50', 11, 51),
+    ('50+', 51, None)
+]
+
+
+def _page_row(crawl_id: str, page: Dict[str, Any], classifier: Optional[UrlClassifier]) -> tuple:
+    in_sitemap = page.get('in_sitemap')
+    market_mask, excluded = None, None
+    if classifier is not None and page.get('url'):
+        market_mask, excluded = classifier.classify(page['url'])
+    return (
+        crawl_id,
+        page.get('url'),
+        page.get('nb_inlinks'),
+        page.get('depth'),
+        page.get('status_code'),
+        page.get('title'),
+        page.get('word_count'),
+        None if in_sitemap is None else int(bool(in_sitemap)),
+        market_mask,
+        None if excluded is None else int(excluded)
+    )
+
+
+def _depth_descending(columns: CrawlColumns) -> np.ndarray:
+    # Missing depths (-1) sort last, as NULLs do in SQL's DESC order
+    return -columns.depth.astype(np.int64)
+
+
+def _inlinks_agg(columns: CrawlColumns, selected: np.ndarray) -> Dict[str, Any]:
+    inlinks = columns.nb_inlinks[selected]
+    return {
+        'cols': ['nb_inlinks', 'count'],
+        'rows': [
+            [name, int(np.count_nonzero((inlinks >= low) & (inlinks < high if high is not None else True)))]
+            for name, low, high in INLINK_RANGES
+        ]
+    }
+
+
+def _depth_agg(columns: CrawlColumns, selected: np.ndarray) -> Dict[str, Any]:
+    # Missing depth (None) first, as SQL sorts NULLs
+    depths, counts = np.unique(columns.depth[selected], return_counts=True)
+    return {
+        'cols': ['depth', 'count'],
+        'rows': [
+            [None if depth == MISSING else depth, count]
+            for depth, count in zip(depths.tolist(), counts.tolist())
+        ]
+    }
+
+
+def _summary_aggs(columns: CrawlColumns, selected: np.ndarray) -> List[Dict[str, Any]]:
+    """Aggs in the order build_technical_summary expects, over the selected rows."""
+    inlinks = columns.nb_inlinks[selected]
+    counts = [
+        np.count_nonzero(inlinks == 0),
+        np.count_nonzero((inlinks > 0) & (inlinks <= 3)),
+        np.count_nonzero(columns.depth[selected] >= 4),
+        np.count_nonzero(columns.flags[selected] & FLAG_NOT_IN_SITEMAP),
+        len(inlinks)
+    ]
+    return [
+        _inlinks_agg(columns, selected),
+        _depth_agg(columns, selected),
+        *[{'cols': ['count'], 'rows': [[int(count)]]} for count in counts]
+    ]
+
+
+class SnapshotStore:
+    """SQLite-backed store of full page snapshots for finished crawls."""
+
+    def __init__(self, db_path: Optional[str] = None, classifier: Optional[UrlClassifier] = None):
+        self.db_path = db_path or config.DATABASE_PATH
+        # Market / excluded-domain classifier whose results are stored per page
+        self.classifier = classifier
+        self._db: Optional[aiosqlite.Connection] = None
+        self._complete: Set[str] = set()
+        # Crawls being (re)synced: reported as having no snapshot until the sync commits
+        self._syncing: Set[str] = set()
+        # Every transaction on the shared connection begins and commits under this
+        # lock, so no writer commits (or rolls back) another's half-written rows
+        self._write_lock = asyncio.Lock()
+        # One sync per crawl at a time (they share the crawl's staging rows)
+        self._sync_locks: Dict[str, asyncio.Lock] = {}
+        self._search_index = False
+        # Memory-mapped columns of complete snapshots
+        self._columns: Dict[str, CrawlColumns] = {}
+        self._columns_lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        """Open the database and create tables (no-op if already open)."""
+        if self._db is not None:
+            return
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = await aiosqlite.connect(self.db_path)
+        self._db.row_factory = aiosqlite.Row
+        await self._db.executescript(SCHEMA)
+        migrated = await self._migrate()
+        try:
+            await self._db.executescript(SEARCH_SCHEMA)
+            self._search_index = True
+        except sqlite3.OperationalError:
+            self._search_index = False
+        if 'priority_pages' in migrated:
+            # Priority lists stored without the new columns are rebuilt on next use
+            async with self._db.execute("SELECT DISTINCT crawl_id FROM market_rollups") as cursor:
+                for crawl_id in [row['crawl_id'] for row in await cursor.fetchall()]:
+                    await self._delete_rollups(crawl_id)
+        await self._db.commit()
+        async with self._db.execute("SELECT crawl_id FROM snapshots") as cursor:
+            self._complete = {row['crawl_id'] async for row in cursor}
+        await self._reclassify_stale()
+        for crawl_id in self._complete:
+            if CrawlColumns.exists(crawl_id):
+                self._columns[crawl_id] = CrawlColumns.load(crawl_id)
+
+    async def _migrate(self) -> Set[str]:
+        """Add columns introduced since the database was created, returning the tables altered."""
+        migrated = set()
+        for table, columns in MIGRATED_COLUMNS.items():
+            async with self._db.execute(f"PRAGMA table_info({table})") as cursor:
+                existing = {row['name'] async for row in cursor}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    await self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                    migrated.add(table)
+        return migrated
+
+    async def _reclassify_stale(self) -> None:
+        """
+        Re-run URL classification for snapshots stored with a different
+        classifier config (or before classification existed).
+        """
+        if self.classifier is None:
+            return
+        async with self._db.execute(
+            "SELECT crawl_id FROM snapshots WHERE classifier IS NULL OR classifier != ?",
+            (self.classifier.fingerprint,)
+        ) as cursor:
+            stale = [row['crawl_id'] for row in await cursor.fetchall()]
+
+        for crawl_id in stale:
+            async with self._db.execute("SELECT url FROM pages WHERE crawl_id = ?", (crawl_id,)) as cursor:
+                urls = [row['url'] for row in await cursor.fetchall()]
+            rows = []
+            for url in urls:
+                market_mask, excluded = self.classifier.classify(url)
+                rows.append((market_mask, int(excluded), crawl_id, url))
+            await self._db.executemany(
+                "UPDATE pages SET market_mask = ?, excluded = ? WHERE crawl_id = ? AND url = ?", rows
+            )
+            await self._db.execute(
+                "UPDATE snapshots SET classifier = ? WHERE crawl_id = ?",
+                (self.classifier.fingerprint, crawl_id)
+            )
+            await self._delete_rollups(crawl_id)
+            self._delete_columns(crawl_id)
+        await self._db.commit()
+
+    async def close(self) -> None:
+        """Close the database."""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def has_snapshot(self, crawl_id: str) -> bool:
+        """True if a complete snapshot exists for this crawl (False while it is being synced)."""
+        await self.open()
+        return crawl_id in self._complete
+
+    async def list_snapshots(self) -> List[Dict[str, Any]]:
+        """List all complete snapshots."""
+        await self.open()
+        async with self._db.execute(
+            "SELECT crawl_id, page_count, synced_at FROM snapshots ORDER BY synced_at DESC"
+        ) as cursor:
+            return [dict(row) async for row in cursor]
+
+    # ============== Sync ==============
+
+    async def sync_crawl(self, client, crawl_id: str) -> Dict[str, Any]:
+        """
+        Page through every fetched page of a crawl and store it locally.
+
+        Pages are downloaded into a staging table (each batch committed on
+        its own, so other writers only wait for one batch insert) and moved
+        into the pages table in one transaction at the end. The crawl is
+        reported as having no snapshot while it syncs; if the sync fails or
+        is cancelled, the previous snapshot, untouched, is visible again.
+
+        Args:
+            client: AsyncOnCrawlClient used to read the crawl
+            crawl_id: The crawl ID to snapshot
+
+        Returns:
+            Dict with 'success', 'crawl_id', 'page_count' (or 'message' on error)
+        """
+        await self.open()
+        async with self._sync_locks.setdefault(crawl_id, asyncio.Lock()):
+            was_complete = crawl_id in self._complete
+            self._complete.discard(crawl_id)
+            self._syncing.add(crawl_id)
+            result = None
+            try:
+                result = await self._sync_crawl(client, crawl_id)
+            finally:
+                self._syncing.discard(crawl_id)
+                if (result is not None and result['success']) or was_complete:
+                    self._complete.add(crawl_id)
+                if result is None or not result['success']:
+                    await self._clear_staging(crawl_id)
+        if result['success']:
+            # Cached upstream responses may predate the data just stored
+            client.cache.invalidate_crawl(crawl_id)
+            await self.get_columns(crawl_id)
+        return result
+
+    async def _sync_crawl(self, client, crawl_id: str) -> Dict[str, Any]:
+        # Rows left by an interrupted sync are replaced wholesale
+        await self._clear_staging(crawl_id)
+
+        page_count = 0
+        try:
+            async for pages in client.iter_page_batches(
+                crawl_id,
+                fields=SNAPSHOT_FIELDS,
+                oql={'field': ['fetched', 'equals', True]},
+                cache=False
+            ):
+                rows = [_page_row(crawl_id, page, self.classifier) for page in pages]
+                async with self._transaction():
+                    await self._db.executemany(
+                        f"INSERT OR REPLACE INTO pages_staging ({', '.join(PAGE_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(PAGE_COLUMNS))})",
+                        rows
+                    )
+                page_count += len(pages)
+        except OnCrawlAPIError as e:
+            return {
+                'success': False,
+                'crawl_id': crawl_id,
+                'message': e.message,
+                'status_code': e.status_code
+            }
+
+        # Swap the staged pages in; readers see the old snapshot or the new one, never a mix
+        async with self._transaction():
+            await self._db.execute("DELETE FROM pages WHERE crawl_id = ?", (crawl_id,))
+            await self._db.execute(
+                f"INSERT INTO pages ({', '.join(PAGE_COLUMNS)}) "
+                f"SELECT {', '.join(PAGE_COLUMNS)} FROM pages_staging WHERE crawl_id = ?",
+                (crawl_id,)
+            )
+            await self._db.execute("DELETE FROM pages_staging WHERE crawl_id = ?", (crawl_id,))
+            await self._delete_rollups(crawl_id)
+            await self._db.execute(
+                "INSERT OR REPLACE INTO snapshots (crawl_id, page_count, synced_at, classifier) VALUES (?, ?, ?, ?)",
+                (
+                    crawl_id,
+                    page_count,
+                    datetime.now(timezone.utc).isoformat(),
+                    self.classifier.fingerprint if self.classifier else None
+                )
+            )
+        self._delete_columns(crawl_id)
+
+        return {'success': True, 'crawl_id': crawl_id, 'page_count': page_count}
+
+    async def _clear_staging(self, crawl_id: str) -> None:
+        async with self._transaction():
+            await self._db.execute("DELETE FROM pages_staging WHERE crawl_id = ?", (crawl_id,))
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[None]:
+        """Hold the write lock for one transaction: committed on exit, rolled back on error."""
+        async with self._write_lock:
+            try:
+                yield
+            except BaseException:
+                await self._db.rollback()
+                raise
+            await self._db.commit()
+
+    # ============== Columns ==============
+
+    async def get_columns(self, crawl_id: str) -> CrawlColumns:
+        """
+        The memory-mapped columns of a snapshot, writing them from the
+        pages table first if they are missing (e.g. snapshots synced before
+        columns existed, or after reclassification). Crawls without a
+        snapshot have no pages.
+        """
+        await self.open()
+        if crawl_id not in self._complete:
+            return CrawlColumns.from_rows(crawl_id, [])
+        columns = self._columns.get(crawl_id)
+        if columns is not None:
+            return columns
+        async with self._columns_lock:
+            columns = self._columns.get(crawl_id)
+            if columns is None:
+                # No sync may start (and delete the pages being read) while columns are written
+                async with self._write_lock:
+                    if crawl_id not in self._complete:
+                        return CrawlColumns.from_rows(crawl_id, [])
+                    if not CrawlColumns.exists(crawl_id):
+                        await self._write_columns(crawl_id)
+                    columns = self._columns[crawl_id] = CrawlColumns.load(crawl_id)
+        return columns
+
+    async def _write_columns(self, crawl_id: str) -> None:
+        rows = []
+        async with self._db.execute(
+            f"SELECT {', '.join(SOURCE_COLUMNS)} FROM pages WHERE crawl_id = ? ORDER BY url",
+            (crawl_id,)
+        ) as cursor:
+            while True:
+                batch = await cursor.fetchmany(COLUMN_FETCH_SIZE)
+                if not batch:
+                    break
+                rows.extend(tuple(row) for row in batch)
+
+        def write() -> None:
+            CrawlColumns.from_rows(crawl_id, rows).save()
+
+        await asyncio.to_thread(write)
+
+    def _delete_columns(self, crawl_id: str) -> None:
+        self._columns.pop(crawl_id, None)
+        CrawlColumns.delete(crawl_id)
+
+    # ============== Queries ==============
+
+    def select_pages(self, columns: CrawlColumns, market: Optional[str] = None) -> np.ndarray:
+        """
+        Rows of the 200 pages of a crawl's columns. With a `market`, only
+        pages in that market ('global' = any) and not on an excluded domain.
+        """
+        selected = columns.status_code == 200
+        if market is not None:
+            selected &= (columns.flags & FLAG_EXCLUDED) == 0
+            if market != GLOBAL_MARKET:
+                bit = self.classifier.market_bit(market) if self.classifier else 0
+                selected &= (columns.market_mask & bit) != 0
+        return selected
+
+    async def _query_pages(
+        self,
+        crawl_id: str,
+        fields: List[str],
+        where: Callable[[CrawlColumns], np.ndarray],
+        sort_key: Callable[[CrawlColumns], np.ndarray],
+        limit: Optional[int],
+        market: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a filtered page query, returning the Data API's {'meta', 'urls'} shape.
+
+        `where` selects rows of the crawl's columns and matching 200 pages
+        are returned by ascending `sort_key`, then URL. limit=None returns
+        every matching row. With a `market`, only pages in that market
+        ('global' = any) and not on an excluded domain are returned, using
+        the classification stored at sync time.
+        """
+        columns = await self.get_columns(crawl_id)
+
+        def query() -> Dict[str, Any]:
+            selected = self.select_pages(columns, market) & where(columns)
+
+            # Rows are in URL order, so a stable sort breaks ties by URL
+            rows = np.flatnonzero(selected)
+            rows = rows[np.argsort(sort_key(columns)[rows], kind='stable')][:limit]
+            return {'meta': {'total_hits': int(np.count_nonzero(selected))}, 'urls': columns.pages(rows, fields)}
+
+        # Building every row dict of a limit=None query blocks for seconds on large crawls
+        return await asyncio.to_thread(query)
+
+    async def get_pages_with_low_inlinks(
+        self,
+        crawl_id: str,
+        max_inlinks: int = 3,
+        limit: Optional[int] = 1000,
+        market: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get pages with low internal links (1-3 inlinks, not orphaned)."""
+        return await self._query_pages(
+            crawl_id,
+            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap'],
+            where=lambda columns: (columns.nb_inlinks > 0) & (columns.nb_inlinks <= max_inlinks),
+            sort_key=lambda columns: columns.nb_inlinks,
+            limit=limit,
+            market=market
+        )
+
+    async def get_orphaned_pages(
+        self,
+        crawl_id: str,
+        limit: Optional[int] = 1000,
+        market: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get orphaned pages (0 inlinks)."""
+        return await self._query_pages(
+            crawl_id,
+            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'word_count', 'in_sitemap'],
+            where=lambda columns: columns.nb_inlinks == 0,
+            sort_key=_depth_descending,
+            limit=limit,
+            market=market
+        )
+
+    async def get_deep_pages(
+        self,
+        crawl_id: str,
+        min_depth: int = 4,
+        limit: Optional[int] = 1000,
+        market: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get pages with high crawl depth."""
+        return await self._query_pages(
+            crawl_id,
+            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'in_sitemap'],
+            where=lambda columns: columns.depth >= min_depth,
+            sort_key=_depth_descending,
+            limit=limit,
+            market=market
+        )
+
+    async def get_pages_not_in_sitemap(
+        self,
+        crawl_id: str,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """Get pages that are not in the sitemap."""
+        return await self._query_pages(
+            crawl_id,
+            fields=['url', 'nb_inlinks', 'depth', 'status_code', 'title', 'in_sitemap'],
+            where=lambda columns: (columns.flags & FLAG_NOT_IN_SITEMAP) != 0,
+            sort_key=lambda columns: columns.nb_inlinks,
+            limit=limit
+        )
+
+    async def get_page_documents(self, crawl_id: str) -> List[Dict[str, Any]]:
+        """URL and title of every 200 page, as text documents for the relevance engine."""
+        columns = await self.get_columns(crawl_id)
+        return await asyncio.to_thread(columns.pages, np.flatnonzero(columns.status_code == 200), ['url', 'title'])
+
+    # ============== MinHash Signatures ==============
+
+    async def get_minhash_signatures(self, crawl_id: str) -> List[tuple]:
+        """(url, signature blob) of every page with a stored MinHash signature."""
+        await self.open()
+        async with self._db.execute(
+            "SELECT url, signature FROM minhash_signatures WHERE crawl_id = ? ORDER BY rowid",
+            (crawl_id,)
+        ) as cursor:
+            return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+    async def find_minhash_signatures(self, crawl_id: str, content_hashes: List[int]) -> Dict[int, bytes]:
+        """
+        Stored signatures by content hash, from this crawl first and then
+        any other crawl with the same page text.
+        """
+        await self.open()
+        found: Dict[int, bytes] = {}
+        async with self._db.execute(
+            "SELECT content_hash, signature FROM minhash_signatures WHERE crawl_id = ?",
+            (crawl_id,)
+        ) as cursor:
+            found.update((row[0], row[1]) for row in await cursor.fetchall())
+
+        missing = list({h for h in content_hashes if h not in found})
+        for start in range(0, len(missing), SQL_PARAM_CHUNK):
+            chunk = missing[start:start + SQL_PARAM_CHUNK]
+            async with self._db.execute(
+                f"SELECT content_hash, signature FROM minhash_signatures "
+                f"WHERE content_hash IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ) as cursor:
+                found.update((row[0], row[1]) for row in await cursor.fetchall())
+        return found
+
+    async def save_minhash_signatures(self, crawl_id: str, rows: List[tuple]) -> None:
+        """Replace a crawl's signatures with (url, content_hash, signature blob) rows."""
+        await self.open()
+        async with self._write_lock:
+            await self._db.execute("DELETE FROM minhash_signatures WHERE crawl_id = ?", (crawl_id,))
+            await self._db.executemany(
+                "INSERT INTO minhash_signatures (crawl_id, url, content_hash, signature) VALUES (?, ?, ?, ?)",
+                [(crawl_id, *row) for row in rows]
+            )
+            await self._db.commit()
+
+    async def get_inlinks_distribution(self, crawl_id: str) -> Dict[str, Any]:
+        """Get distribution of pages by inlink count ranges."""
+        columns = await self.get_columns(crawl_id)
+        return {'aggs': [_inlinks_agg(columns, columns.status_code == 200)]}
+
+    async def get_depth_distribution(self, crawl_id: str) -> Dict[str, Any]:
+        """Get distribution of pages by crawl depth."""
+        columns = await self.get_columns(crawl_id)
+        return {'aggs': [_depth_agg(columns, columns.status_code == 200)]}
+
+    async def get_technical_summary(self, crawl_id: str) -> Dict[str, Any]:
+        """Get a technical SEO summary for a crawl from the snapshot."""
+        columns = await self.get_columns(crawl_id)
+        # Same assembly as the live batched aggs response
+        return build_technical_summary(crawl_id, {'aggs': _summary_aggs(columns, columns.status_code == 200)})
+
+    # ============== Market Rollups ==============
+
+    async def get_market_summaries(self, crawl_id: str, markets: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Technical summaries of several markets, from the crawl's columns.
+
+        Pages on excluded domains are left out, as in market-filtered page
+        queries.
+        """
+        columns = await self.get_columns(crawl_id)
+        included = (columns.status_code == 200) & ((columns.flags & FLAG_EXCLUDED) == 0)
+        summaries = {}
+        for market in markets:
+            selected = included
+            if market != GLOBAL_MARKET:
+                bit = self.classifier.market_bit(market) if self.classifier else 0
+                selected = included & ((columns.market_mask & bit) != 0)
+            summaries[market] = build_technical_summary(crawl_id, {'aggs': _summary_aggs(columns, selected)})
+        return summaries
+
+    async def _delete_rollups(self, crawl_id: str) -> None:
+        if self._search_index:
+            await self._db.execute(
+                "DELETE FROM priority_search WHERE rowid IN (SELECT id FROM priority_pages WHERE crawl_id = ?)",
+                (crawl_id,)
+            )
+        await self._db.execute("DELETE FROM priority_pages WHERE crawl_id = ?", (crawl_id,))
+        await self._db.execute("DELETE FROM market_rollups WHERE crawl_id = ?", (crawl_id,))
+
+    async def save_market_rollups(
+        self,
+        crawl_id: str,
+        rollups: List[Dict[str, Any]],
+        priority_pages: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Replace a crawl's rollups with {'market', 'with_equity', 'summary'}
+        dicts and its ranked global priority list.
+
+        Every market's ranking is the global ranking restricted to that
+        market (a page's score does not depend on the market), so pages are
+        stored once, in rank order, with their market bitmask.
+        """
+        await self.open()
+        async with self._write_lock:
+            # Rollups computed from a snapshot that has since been resynced are dropped
+            if crawl_id not in self._complete:
+                return
+            await self._delete_rollups(crawl_id)
+            await self._db.executemany(
+                "INSERT INTO market_rollups (crawl_id, market, with_equity, summary) VALUES (?, ?, ?, ?)",
+                [
+                    (crawl_id, rollup['market'], int(rollup['with_equity']), json.dumps(rollup['summary']))
+                    for rollup in rollups
+                ]
+            )
+            await self._db.executemany(
+                "INSERT INTO priority_pages "
+                "(crawl_id, rank, market_mask, url, title, nb_inlinks, depth, link_equity, gap_mask, category, "
+                "in_sitemap, page) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        crawl_id,
+                        rank,
+                        self.classifier.classify(page['url'])[0] if self.classifier else 0,
+                        page['url'],
+                        page.get('title'),
+                        page.get('nb_inlinks'),
+                        page.get('depth'),
+                        page.get('link_equity'),
+                        gap_mask(page['technical_gaps']),
+                        page_category(page['technical_gaps']),
+                        None if page.get('in_sitemap') is None else int(bool(page['in_sitemap'])),
+                        json.dumps(page, separators=(',', ':'))
+                    )
+                    for rank, page in enumerate(priority_pages)
+                ]
+            )
+            if self._search_index:
+                await self._db.execute(
+                    "INSERT INTO priority_search (rowid, url, title) "
+                    "SELECT id, url, IFNULL(title, '') FROM priority_pages WHERE crawl_id = ?",
+                    (crawl_id,)
+                )
+            await self._db.commit()
+
+    async def get_market_rollup(self, crawl_id: str, market: str) -> Optional[Dict[str, Any]]:
+        """A stored market rollup ({'market', 'with_equity', 'summary'}), or None."""
+        await self.open()
+        async with self._db.execute(
+            "SELECT with_equity, summary FROM market_rollups WHERE crawl_id = ? AND market = ?",
+            (crawl_id, market)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'market': market,
+            'with_equity': bool(row['with_equity']),
+            'summary': json.loads(row['summary'])
+        }
+
+    def _priority_filter(
+        self,
+        crawl_id: str,
+        market: str,
+        gap: Optional[str],
+        category: str,
+        search: Optional[str]
+    ) -> tuple:
+        """WHERE clause and parameters selecting a crawl's priority pages."""
+        clause = "crawl_id = ?"
+        params: list = [crawl_id]
+        if market != GLOBAL_MARKET:
+            clause += " AND (market_mask & ?) != 0"
+            params.append(self.classifier.market_bit(market) if self.classifier else 0)
+        if gap == NOT_IN_SITEMAP:
+            clause += " AND in_sitemap = 0"
+        elif gap:
+            clause += " AND (gap_mask & ?) != 0"
+            params.append(1 << PRIORITY_GAPS.index(gap) if gap in PRIORITY_GAPS else 0)
+        if category != 'all':
+            clause += " AND category = ?"
+            params.append(category)
+        if search:
+            if self._search_index and len(search) >= MIN_TRIGRAM_SEARCH:
+                clause += " AND id IN (SELECT rowid FROM priority_search WHERE priority_search MATCH ?)"
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                clause += " AND (url LIKE ? ESCAPE '\\' OR IFNULL(title, '') LIKE ? ESCAPE '\\')"
+                params.extend([pattern, pattern])
+        return clause, params
+
+    async def _read_priority_rows(
+        self,
+        clause: str,
+        params: list,
+        sort: str,
+        descending: bool,
+        limit: int,
+        after: Optional[tuple]
+    ) -> tuple:
+        """
+        Up to `limit` rows after the (value, rank) key `after`, as
+        ((page JSON, market mask) rows, key of the last row if more follow).
+        """
+        expression = PRIORITY_SORT_COLUMNS[sort]
+        reverse = rank_descending(sort, descending)
+        direction = "DESC" if reverse else "ASC"
+        params = list(params)
+        if after is not None:
+            operator = "<" if reverse else ">"
+            if sort == 'priority_score':
+                clause += f" AND rank {operator} ?"
+                params.append(after[1])
+            else:
+                clause += f" AND ({expression}, rank) {operator} (?, ?)"
+                params.extend(after)
+        order_by = f"rank {direction}" if sort == 'priority_score' else f"{expression} {direction}, rank {direction}"
+
+        async with self._db.execute(
+            f"SELECT {expression}, rank, page, market_mask FROM priority_pages WHERE {clause} "
+            f"ORDER BY {order_by} LIMIT ?",
+            (*params, limit + 1)
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        last_key = (rows[-1][0], rows[-1][1]) if rows and more else None
+        return [(row[2], row[3]) for row in rows], last_key
+
+    async def query_priority_pages(
+        self,
+        crawl_id: str,
+        market: str,
+        sort: str = 'priority_score',
+        descending: bool = True,
+        limit: int = 100,
+        after: Optional[tuple] = None,
+        gap: Optional[str] = None,
+        category: str = 'all',
+        search: Optional[str] = None
+    ) -> tuple:
+        """
+        Read one page of a market's stored priority list ('global' = all).
+
+        Rows are ordered by (sort value, rank) via the matching
+        idx_priority_* index, and `after` is the (value, rank) key of the
+        last row already returned, so every page is an index seek however
+        deep it is. Search is a case-insensitive substring match on URL or
+        title through the trigram index.
+
+        Returns:
+            (pages, total matching rows, key of the last page row if more follow)
+        """
+        await self.open()
+        clause, params = self._priority_filter(crawl_id, market, gap, category, search)
+
+        async with self._db.execute(f"SELECT COUNT(*) FROM priority_pages WHERE {clause}", params) as cursor:
+            total = (await cursor.fetchone())[0]
+
+        rows, last_key = await self._read_priority_rows(clause, params, sort, descending, limit, after)
+        return [json.loads(page) for page, _ in rows], total, last_key
+
+    async def iter_priority_pages(
+        self,
+        crawl_id: str,
+        market: str,
+        sort: str = 'priority_score',
+        descending: bool = True,
+        gap: Optional[str] = None,
+        category: str = 'all',
+        search: Optional[str] = None,
+        batch_size: int = 5000
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Yield every matching priority page in batches of (page, market mask)
+        pairs, in query_priority_pages order. Each batch is one keyset
+        query, so memory stays at one batch however many pages match.
+        """
+        await self.open()
+        clause, params = self._priority_filter(crawl_id, market, gap, category, search)
+        after = None
+        while True:
+            rows, after = await self._read_priority_rows(clause, params, sort, descending, batch_size, after)
+            if rows:
+                yield [(json.loads(page), market_mask) for page, market_mask in rows]
+            if after is None:
+                return
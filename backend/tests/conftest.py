@@ -0,0 +1,65 @@
+"""
+Shared test setup: backend modules on sys.path, a throwaway data
+directory, and OnCrawl clients backed by the in-process fake API from
+benchmarks/fake_oncrawl.py.
+
+Run from backend/:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')]
+
+# Read by config at import time, so set before any backend module is imported
+DATA_DIR = tempfile.mkdtemp(prefix='oncrawl-tests-')
+os.environ.update(
+    DATABASE_PATH=os.path.join(DATA_DIR, 'cache.db'),
+    CORPUS_DIR=os.path.join(DATA_DIR, 'corpus'),
+    CRAWL_WATCH_INTERVAL='0',
+    ONCRAWL_RATE_LIMIT='1000',
+    ONCRAWL_RATE_BURST='1000'
+)
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from fake_oncrawl import create_app
+from oncrawl_client import AsyncOnCrawlClient
+
+FAKE_BASE_URL = 'http://fake-oncrawl/api/v2'
+
+
+def connect_to_fake(client: AsyncOnCrawlClient, fake_app) -> AsyncOnCrawlClient:
+    """Point a client's connection pool at the fake API (open() keeps an open pool)."""
+    client._http = httpx.AsyncClient(
+        base_url=FAKE_BASE_URL,
+        headers=client.headers,
+        transport=httpx.ASGITransport(app=fake_app)
+    )
+    return client
+
+
+@pytest.fixture(scope='session')
+def fake_api():
+    """Fake OnCrawl API; crawl `bench-<n>` has n deterministic pages."""
+    return create_app(default_pages=500)
+
+
+@pytest.fixture
+def oncrawl(fake_api) -> AsyncOnCrawlClient:
+    """A fresh async client (empty cache) talking to the fake API."""
+    return connect_to_fake(AsyncOnCrawlClient('test-token'), fake_api)
+
+
+@pytest.fixture
+def api(fake_api):
+    """The backend app, with its shared OnCrawl client talking to the fake API."""
+    import main
+    connect_to_fake(main.oncrawl_client, fake_api)
+    with TestClient(main.app) as client:
+        yield client
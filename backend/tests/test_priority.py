@@ -0,0 +1,98 @@
+"""
+rank_priority_pages must match the scalar calculate_priority merge it
+replaced: same pages, same scores, same order (ties in first-seen order),
+for every market filter and category.
+"""
+
+import numpy as np
+import pytest
+
+from link_graph import LinkGraph
+from priority import PRIORITY_CATEGORIES, matches_category, query_ranked_pages, rank_priority_pages
+from priority_scoring import global_market, legacy_rank, synthetic_graph, synthetic_results, us_market
+
+
+def tie_results():
+    """Hand-written gap rows: equal scores, repeated URLs and scores past the 100 cap."""
+    def page(path, nb_inlinks, depth=None):
+        row = {'url': f"https://squareup.com/{path}", 'nb_inlinks': nb_inlinks, 'status_code': 200}
+        if depth is not None:
+            row['depth'] = depth
+        return row
+
+    return [
+        ('orphaned', {'urls': [
+            page('us/en/b', 0, 2), page('us/en/a', 0, 2), page('gb/en/c', 0, 2),
+            page('us/en/capped-1', 0, 9), page('us/en/capped-2', 0, 12), page('us/en/no-depth', 0),
+            {'url': 'https://community.squareup.com/us/en/thread', 'nb_inlinks': 0, 'depth': 2}
+        ]}),
+        ('low_inlinks', {'urls': [
+            page('us/en/d', 1, 3), page('us/en/a', 1, 2), page('gb/en/e', 2, 3),
+            page('us/en/capped-2', 1, 12), page('us/en/capped-1', 1, 9), {'url': None}
+        ]}),
+        ('deep_page', {'error': 'Data API timeout'}),
+    ]
+
+
+def tie_graph(gap_results) -> LinkGraph:
+    """Equal link equity for half the URLs; the last URL is missing from the graph."""
+    urls = sorted({page['url'] for _, result in gap_results for page in result.get('urls', []) if page['url']})
+    urls = urls[:-1]
+    graph = LinkGraph('ties', urls, np.zeros(len(urls) + 1, dtype=np.int64),
+                      np.zeros(0, dtype=np.int32), np.zeros(0, dtype=bool))
+    graph.link_equity = np.array([0.25 if i % 2 else 0.123456 for i in range(len(urls))])
+    return graph
+
+
+FIXTURES = {
+    'ties': (tie_results, tie_graph),
+    'synthetic': (lambda: synthetic_results(3000, seed=7), synthetic_graph)
+}
+
+
+@pytest.mark.parametrize('fixture', sorted(FIXTURES))
+@pytest.mark.parametrize('include', [global_market, us_market], ids=['global', 'us'])
+@pytest.mark.parametrize('with_graph', [False, True], ids=['no-equity', 'equity'])
+@pytest.mark.parametrize('limit', [None, 3, 50])
+def test_matches_scalar_merge(fixture, include, with_graph, limit):
+    make_results, make_graph = FIXTURES[fixture]
+    graph = make_graph(make_results()) if with_graph else None
+
+    # Fresh rows for each side: the scalar merge writes link_equity into them
+    expected = legacy_rank(make_results(), include, limit, graph)
+    ranked = rank_priority_pages(make_results(), include, limit, graph)
+
+    assert ranked == expected
+    assert [page['url'] for page in ranked] == [page['url'] for page in expected]
+    assert [page['priority_score'] for page in ranked] == [page['priority_score'] for page in expected]
+
+
+@pytest.mark.parametrize('fixture', sorted(FIXTURES))
+@pytest.mark.parametrize('include', [global_market, us_market], ids=['global', 'us'])
+@pytest.mark.parametrize('category', PRIORITY_CATEGORIES)
+def test_category_filter_matches_scalar_merge(fixture, include, category):
+    make_results, make_graph = FIXTURES[fixture]
+    graph = make_graph(make_results())
+    expected = [
+        page for page in legacy_rank(make_results(), include, None, graph)
+        if matches_category(page['technical_gaps'], category)
+    ]
+
+    ranked = rank_priority_pages(make_results(), include, None, graph)
+    pages, total, last_key = query_ranked_pages(ranked, category=category, limit=len(ranked) or 1)
+
+    assert pages == expected
+    assert total == len(expected)
+    assert last_key is None
+
+
+def test_ties_keep_first_seen_order():
+    ranked = rank_priority_pages(tie_results(), global_market, None)
+    scores = [page['priority_score'] for page in ranked]
+
+    assert scores == sorted(scores, reverse=True)
+    assert [page['url'].rsplit('/', 1)[1] for page in ranked if page['priority_score'] == 42.5] == ['b', 'c', 'no-depth']
+    # Pages with both gaps all pass the 100 cap, so they tie and stay in first-seen order
+    assert [page['url'].rsplit('/', 1)[1] for page in ranked[:3]] == ['a', 'capped-1', 'capped-2']
+    assert all(page['priority_score'] == 100 for page in ranked[:3])
+    assert not any('community.squareup.com' in page['url'] for page in ranked)
@@ -0,0 +1,147 @@
+"""
+/api/dashboard/priority-pages paging, sorting and search, for both the
+snapshot path (SQL keyset over priority_pages) and the live path
+(in-memory query_ranked_pages over the fake OnCrawl API).
+"""
+
+import pytest
+
+from priority import PRIORITY_SORT_FALLBACKS
+
+ENDPOINT = '/api/dashboard/priority-pages'
+SNAPSHOT_CRAWL = 'bench-300'
+LIVE_CRAWL = 'bench-301'
+
+
+@pytest.fixture(params=['snapshot', 'live'])
+def crawl_id(request, api):
+    if request.param == 'live':
+        return LIVE_CRAWL
+    response = api.post(f'/api/snapshots/{SNAPSHOT_CRAWL}/sync')
+    assert response.status_code == 200, response.text
+    return SNAPSHOT_CRAWL
+
+
+def fetch(api, crawl_id, **params):
+    response = api.get(ENDPOINT, params={'crawl_id': crawl_id, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def fetch_all(api, crawl_id, page_size, **params):
+    """Every page of a query, following next_cursor."""
+    pages, cursor = [], None
+    while True:
+        body = fetch(api, crawl_id, limit=page_size, cursor=cursor, **params)
+        assert len(body['pages']) <= page_size
+        pages.extend(body['pages'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages, body['total_matches']
+
+
+def urls(pages):
+    return [page['url'] for page in pages]
+
+
+def ranks(api, crawl_id, **params):
+    """Rank of each URL: its position in the priority order for the same filters."""
+    ranked = fetch(api, crawl_id, limit=5000, **params)['pages']
+    return {page['url']: rank for rank, page in enumerate(ranked)}
+
+
+@pytest.mark.parametrize('sort', sorted(PRIORITY_SORT_FALLBACKS))
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_cursor_pages_match_one_request(api, crawl_id, sort, order):
+    whole = fetch(api, crawl_id, limit=5000, sort=sort, order=order)
+    assert whole['next_cursor'] is None
+    assert whole['pages']
+
+    paged, total = fetch_all(api, crawl_id, 7, sort=sort, order=order)
+
+    assert urls(paged) == urls(whole['pages'])
+    assert len(set(urls(paged))) == len(paged)
+    assert total == whole['total_matches'] == len(paged)
+
+
+@pytest.mark.parametrize('sort', ['nb_inlinks', 'depth', 'url'])
+def test_sort_direction_and_rank_tie_break(api, crawl_id, sort):
+    rank = ranks(api, crawl_id)
+    fallback = PRIORITY_SORT_FALLBACKS[sort]
+    for order in ('asc', 'desc'):
+        pages, _ = fetch_all(api, crawl_id, 50, sort=sort, order=order)
+        keys = [(fallback if page.get(sort) is None else page[sort], rank[page['url']]) for page in pages]
+
+        assert keys == sorted(keys, reverse=order == 'desc')
+        # Tied values fall back to rank in the same direction, so the keys never repeat
+        assert len(set(keys)) == len(keys)
+        if sort == 'url':
+            values = [key[0] for key in keys]
+            assert values == sorted(values, reverse=order == 'desc')
+            assert len(set(values)) == len(values)
+
+    ties = [page[sort] for page in pages]
+    if sort != 'url':
+        assert len(set(ties)) < len(ties), "fixture should have tied values"
+
+
+def test_priority_order_is_rank_order(api, crawl_id):
+    desc, _ = fetch_all(api, crawl_id, 11)
+    asc, _ = fetch_all(api, crawl_id, 11, order='asc')
+    scores = [page['priority_score'] for page in desc]
+
+    assert scores == sorted(scores, reverse=True)
+    assert urls(asc) == urls(desc)[::-1]
+
+
+@pytest.mark.parametrize('search', ['payroll', 'PAGE-1', 'point of', '/ca/', 'pa', 'no-such-page'])
+def test_search_matches_substring_filter(api, crawl_id, search):
+    everything = fetch(api, crawl_id, limit=5000)['pages']
+    needle = search.lower()
+    expected = [
+        page for page in everything
+        if needle in page['url'].lower() or needle in (page.get('title') or '').lower()
+    ]
+
+    found, total = fetch_all(api, crawl_id, 9, search=search)
+    if search != 'no-such-page':
+        assert found, "search should match fixture pages"
+
+    assert urls(found) == urls(expected)
+    assert total == len(expected)
+
+
+def test_search_uses_title(api):
+    assert api.post(f'/api/snapshots/{SNAPSHOT_CRAWL}/sync').status_code == 200
+    pages = fetch(api, SNAPSHOT_CRAWL, limit=5000, search='online store')['pages']
+
+    assert pages
+    assert all('online store' in page['title'] for page in pages)
+
+
+def test_filters_combine_with_cursor(api, crawl_id):
+    params = {'category': 'moderate', 'gap': 'deep_page', 'sort': 'depth', 'search': 'squareup'}
+    whole = fetch(api, crawl_id, limit=5000, **params)['pages']
+    paged, _ = fetch_all(api, crawl_id, 4, **params)
+
+    assert whole
+    assert urls(paged) == urls(whole)
+    assert all('deep_page' in page['technical_gaps'] and len(page['technical_gaps']) == 1 for page in paged)
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_rejects_non_positive_limit(api, crawl_id, limit):
+    response = api.get(ENDPOINT, params={'crawl_id': crawl_id, 'limit': limit})
+
+    assert response.status_code == 422
+
+
+def test_rejects_cursor_from_another_query(api, crawl_id):
+    cursor = fetch(api, crawl_id, limit=5, sort='depth')['next_cursor']
+    assert cursor
+
+    other = api.get(ENDPOINT, params={'crawl_id': crawl_id, 'limit': 5, 'sort': 'url', 'cursor': cursor})
+    garbled = api.get(ENDPOINT, params={'crawl_id': crawl_id, 'limit': 5, 'cursor': 'not-a-cursor'})
+
+    assert other.status_code == 400
+    assert garbled.status_code == 400
@@ -0,0 +1,264 @@
+"""
+SnapshotStore sync: staged resyncs that stay hidden until they commit,
+keep the previous snapshot when they fail or are cancelled, and the
+memory-mapped columns written (and reloaded) for each snapshot.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from cache import ResponseCache, make_key
+from columns import CrawlColumns
+from oncrawl_client import OnCrawlAPIError
+from snapshot import SnapshotStore
+
+
+class StubClient:
+    """
+    Serves `urls` in batches of 100. With a `gate`, it waits for the gate
+    after the first batch; with `fail_after`, it raises once that many
+    pages have been served.
+    """
+
+    def __init__(self, urls, gate: asyncio.Event = None, fail_after: int = None):
+        self.urls = urls
+        self.gate = gate
+        self.fail_after = fail_after
+        self.cache = ResponseCache(max_bytes=1024 * 1024)
+        self.first_batch = asyncio.Event()
+
+    async def iter_page_batches(self, crawl_id, fields=None, oql=None, cache=True):
+        for start in range(0, len(self.urls), 100):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise OnCrawlAPIError("Upstream unavailable", 502)
+            yield [
+                {'url': url, 'title': f"Page {i}", 'nb_inlinks': i % 5, 'depth': 2 + i % 4, 'status_code': 200}
+                for i, url in enumerate(self.urls[start:start + 100], start)
+            ]
+            self.first_batch.set()
+            if self.gate is not None:
+                await self.gate.wait()
+
+
+def page_urls(prefix: str, count: int):
+    return [f"https://squareup.com/us/en/{prefix}-{i:04d}" for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Opened by its first call, inside the test's event loop
+    store = SnapshotStore(db_path=str(tmp_path / 'cache.db'))
+    yield store
+    asyncio.run(store.close())
+
+
+async def column_urls(store, crawl_id):
+    columns = await store.get_columns(crawl_id)
+    return columns.urls.take(np.arange(columns.num_pages))
+
+
+async def staged_rows(store, crawl_id):
+    async with store._db.execute("SELECT COUNT(*) FROM pages_staging WHERE crawl_id = ?", (crawl_id,)) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+# ============== Sync ==============
+
+def test_sync_from_api(tmp_path, oncrawl):
+    crawl_id = 'bench-240'
+
+    async def run():
+        store = SnapshotStore(db_path=str(tmp_path / 'cache.db'))
+        oncrawl.cache.set(make_key('pages', crawl_id, {'limit': 1}), b'{}', None)
+        result = await store.sync_crawl(oncrawl, crawl_id)
+        columns = await store.get_columns(crawl_id)
+        snapshots = await store.list_snapshots()
+        has_snapshot = await store.has_snapshot(crawl_id)
+        await store.close()
+        return result, columns, snapshots, has_snapshot
+
+    result, columns, snapshots, has_snapshot = asyncio.run(run())
+    urls = columns.urls.take(np.arange(columns.num_pages))
+
+    assert result['success'] and has_snapshot
+    assert 0 < result['page_count'] <= 240
+    assert columns.num_pages == result['page_count']
+    assert urls == sorted(urls) and len(set(urls)) == len(urls)
+    assert columns.row_of('https://squareup.com/us/en') is not None
+    assert [(s['crawl_id'], s['page_count']) for s in snapshots] == [(crawl_id, result['page_count'])]
+    # Upstream responses cached before the sync are dropped
+    assert oncrawl.cache.stats()['entries'] == 0
+
+
+def test_resync_replaces_pages(store):
+    crawl_id = 'resync'
+
+    async def run():
+        await store.sync_crawl(StubClient(page_urls('old', 250)), crawl_id)
+        before = await column_urls(store, crawl_id)
+        result = await store.sync_crawl(StubClient(page_urls('new', 120)), crawl_id)
+        return before, result, await column_urls(store, crawl_id), await staged_rows(store, crawl_id)
+
+    before, result, after, staged = asyncio.run(run())
+
+    assert before == page_urls('old', 250)
+    assert result == {'success': True, 'crawl_id': crawl_id, 'page_count': 120}
+    assert after == page_urls('new', 120)
+    assert staged == 0
+
+
+def test_hidden_while_syncing(store):
+    crawl_id = 'hidden'
+
+    async def run():
+        await store.sync_crawl(StubClient(page_urls('old', 150)), crawl_id)
+        gate = asyncio.Event()
+        client = StubClient(page_urls('new', 300), gate=gate)
+        sync = asyncio.create_task(store.sync_crawl(client, crawl_id))
+        await client.first_batch.wait()
+
+        during = {
+            'has_snapshot': await store.has_snapshot(crawl_id),
+            'pages': (await store.get_columns(crawl_id)).num_pages,
+            'snapshot_pages': (await store.get_page_documents(crawl_id))
+        }
+        # Other writers only wait for one staged batch, not the whole sync
+        await asyncio.wait_for(store.save_minhash_signatures('other', [('https://squareup.com/x', 1, b'sig')]), 1)
+        during['sync_done'] = sync.done()
+
+        gate.set()
+        result = await sync
+        return during, result, await store.has_snapshot(crawl_id), await column_urls(store, crawl_id)
+
+    during, result, has_snapshot, urls = asyncio.run(run())
+
+    assert during == {'has_snapshot': False, 'pages': 0, 'snapshot_pages': [], 'sync_done': False}
+    assert result['success'] and result['page_count'] == 300
+    assert has_snapshot
+    assert urls == page_urls('new', 300)
+
+
+def test_failed_resync_keeps_snapshot(store):
+    crawl_id = 'failed'
+
+    async def run():
+        await store.sync_crawl(StubClient(page_urls('old', 200)), crawl_id)
+        result = await store.sync_crawl(StubClient(page_urls('new', 400), fail_after=200), crawl_id)
+        return result, await store.has_snapshot(crawl_id), await column_urls(store, crawl_id), \
+            await staged_rows(store, crawl_id)
+
+    result, has_snapshot, urls, staged = asyncio.run(run())
+
+    assert not result['success'] and result['status_code'] == 502
+    assert has_snapshot
+    assert urls == page_urls('old', 200)
+    assert staged == 0
+
+
+def test_cancelled_resync_keeps_snapshot(store):
+    crawl_id = 'cancelled'
+
+    async def run():
+        await store.sync_crawl(StubClient(page_urls('old', 200)), crawl_id)
+        client = StubClient(page_urls('new', 400), gate=asyncio.Event())
+        sync = asyncio.create_task(store.sync_crawl(client, crawl_id))
+        await client.first_batch.wait()
+        sync.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sync
+        return await store.has_snapshot(crawl_id), await column_urls(store, crawl_id), \
+            await staged_rows(store, crawl_id)
+
+    has_snapshot, urls, staged = asyncio.run(run())
+
+    assert has_snapshot
+    assert urls == page_urls('old', 200)
+    assert staged == 0
+
+
+def test_first_sync_failure_leaves_no_snapshot(store):
+    crawl_id = 'never-synced'
+
+    async def run():
+        result = await store.sync_crawl(StubClient(page_urls('new', 300), fail_after=100), crawl_id)
+        return result, await store.has_snapshot(crawl_id), (await store.get_columns(crawl_id)).num_pages
+
+    result, has_snapshot, pages = asyncio.run(run())
+
+    assert not result['success']
+    assert not has_snapshot
+    assert pages == 0
+
+
+# ============== Columns ==============
+
+def test_columns_reload_memory_mapped(tmp_path):
+    crawl_id = 'reload'
+    db_path = str(tmp_path / 'cache.db')
+
+    async def run():
+        store = SnapshotStore(db_path=db_path)
+        await store.sync_crawl(StubClient(page_urls('page', 180)), crawl_id)
+        synced = await store.get_columns(crawl_id)
+        await store.close()
+
+        # A new process (or worker) maps the files written at sync time
+        reopened = SnapshotStore(db_path=db_path)
+        columns = await reopened.get_columns(crawl_id)
+        again = await reopened.get_columns(crawl_id)
+        await reopened.close()
+        return synced, columns, again
+
+    synced, columns, again = asyncio.run(run())
+
+    assert CrawlColumns.exists(crawl_id)
+    assert again is columns
+    assert all(isinstance(array, np.memmap) for array in columns.arrays.values())
+    for name, array in synced.arrays.items():
+        assert np.array_equal(columns.arrays[name], array), name
+    assert columns.urls.take(np.arange(columns.num_pages)) == page_urls('page', 180)
+    assert columns.pages(np.array([3]), ['url', 'title', 'nb_inlinks', 'depth']) == [
+        {'url': page_urls('page', 180)[3], 'title': 'Page 3', 'nb_inlinks': 3, 'depth': 5}
+    ]
+
+
+def test_missing_columns_rewritten_from_pages(tmp_path):
+    crawl_id = 'rewrite'
+    db_path = str(tmp_path / 'cache.db')
+
+    async def run():
+        store = SnapshotStore(db_path=db_path)
+        await store.sync_crawl(StubClient(page_urls('page', 130)), crawl_id)
+        await store.close()
+        CrawlColumns.delete(crawl_id)
+
+        reopened = SnapshotStore(db_path=db_path)
+        columns = await reopened.get_columns(crawl_id)
+        documents = await reopened.get_page_documents(crawl_id)
+        await reopened.close()
+        return columns, documents
+
+    columns, documents = asyncio.run(run())
+
+    assert CrawlColumns.exists(crawl_id)
+    assert columns.urls.take(np.arange(columns.num_pages)) == page_urls('page', 130)
+    assert [document['url'] for document in documents] == page_urls('page', 130)
+
+
+def test_resync_rewrites_columns(store):
+    crawl_id = 'columns-resync'
+
+    async def run():
+        await store.sync_crawl(StubClient(page_urls('old', 90)), crawl_id)
+        old = await store.get_columns(crawl_id)
+        await store.sync_crawl(StubClient(page_urls('new', 60)), crawl_id)
+        return old, await store.get_columns(crawl_id)
+
+    old, new = asyncio.run(run())
+
+    assert new is not old
+    assert new.urls.take(np.arange(new.num_pages)) == page_urls('new', 60)
+    # Arrays mapped before the resync still read the old snapshot
+    assert old.urls.take(np.arange(old.num_pages)) == page_urls('old', 90)
@@ -0,0 +1,105 @@
+"""
+URL classification by market and excluded domain.
+
+All market prefixes and excluded domains are compiled into one regex when
+the classifier is built. A URL is lowercased and scanned once, and the
+scan yields both its market bitmask and whether it is on an excluded
+domain. Results are cached per URL and stored with each snapshot page, so
+snapshot queries can filter by market on a column.
+"""
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+
+MARKET_PREFIXES = {
+    'us': ['/us/', '/en-us/', 'squareup.com/us'],
+    'ca': ['/ca/', '/en-ca/', 'squareup.com/ca'],
+    'gb': ['/gb/', '/en-gb/', 'squareup.com/gb'],
+    'au': ['/au/', '/en-au/', 'squareup.com/au'],
+    'ie': ['/ie/', '/en-ie/', 'squareup.com/ie'],
+    'es': ['/es/', '/es-es/', 'squareup.com/es'],
+    'jp': ['/jp/', '/ja-jp/', 'squareup.com/jp'],
+    'fr': ['/fr/', '/fr-fr/', 'squareup.com/fr']
+}
+
+GLOBAL_MARKET = 'global'
+
+# Classified URLs kept in memory
+CLASSIFY_CACHE_SIZE = 1 << 20
+
+
+class UrlClassifier:
+    """
+    Market bitmask and excluded-domain flag for URLs, with the same results
+    as substring-matching every prefix and domain against url.lower().
+
+    Bit i of a market mask is set when the URL contains any prefix of the
+    i-th market in `market_prefixes` (a URL can match several markets).
+    """
+
+    def __init__(self, market_prefixes: Dict[str, List[str]], excluded_domains: List[str]):
+        self.markets = list(market_prefixes)
+        self.market_bits = {market: 1 << i for i, market in enumerate(self.markets)}
+        self.excluded_domains = list(excluded_domains)
+
+        # Each pattern's own tag: market bitmask plus excluded flag
+        tags: Dict[str, Tuple[int, bool]] = {}
+        for market, prefixes in market_prefixes.items():
+            for prefix in prefixes:
+                mask, excluded = tags.get(prefix, (0, False))
+                tags[prefix] = (mask | self.market_bits[market], excluded)
+        for domain in self.excluded_domains:
+            mask, _ = tags.get(domain, (0, False))
+            tags[domain] = (mask, True)
+
+        # The regex reports one (longest) pattern per start position; any
+        # shorter pattern matching at the same position is a prefix of it,
+        # so fold the tags of every pattern that is a prefix of another
+        self._tags: Dict[str, Tuple[int, bool]] = {}
+        for pattern in tags:
+            mask, excluded = 0, False
+            for other, (other_mask, other_excluded) in tags.items():
+                if pattern.startswith(other):
+                    mask |= other_mask
+                    excluded = excluded or other_excluded
+            self._tags[pattern] = (mask, excluded)
+
+        # Zero-width lookahead so overlapping matches are all found
+        alternatives = '|'.join(re.escape(pattern) for pattern in sorted(tags, key=len, reverse=True))
+        self._regex = re.compile(f"(?=({alternatives}))") if tags else None
+        self.fingerprint = hashlib.sha1(
+            json.dumps([market_prefixes, self.excluded_domains], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        self.classify = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._classify)
+
+    def _classify(self, url: str) -> Tuple[int, bool]:
+        """(market bitmask, is excluded) of a URL."""
+        mask, excluded = 0, False
+        if self._regex is not None:
+            for match in self._regex.finditer(url.lower()):
+                pattern_mask, pattern_excluded = self._tags[match.group(1)]
+                mask |= pattern_mask
+                excluded = excluded or pattern_excluded
+        return mask, excluded
+
+    def market_bit(self, market: str) -> int:
+        """Bit of a market code; 0 for unknown markets (which match nothing)."""
+        return self.market_bits.get(market.lower(), 0)
+
+    def markets_in(self, mask: int) -> List[str]:
+        """Market codes of a market bitmask, in market_prefixes order."""
+        return [market for market in self.markets if mask & self.market_bits[market]]
+
+    def is_excluded(self, url: str) -> bool:
+        return self.classify(url)[1]
+
+    def includes(self, url: str, market: str) -> bool:
+        """True if the URL is in `market` and not on an excluded domain."""
+        mask, excluded = self.classify(url)
+        if excluded:
+            return False
+        return market == GLOBAL_MARKET or bool(mask & self.market_bit(market))
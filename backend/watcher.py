@@ -0,0 +1,167 @@
+"""
+Background watcher that warms crawls as soon as they finish.
+
+Every CRAWL_WATCH_INTERVAL seconds the watcher reads the status of each
+configured crawl. Once a crawl is done and its data is live, it runs the
+warm-up steps (snapshot sync, link graph, rollups, indexes) in order, so
+the first dashboard request after a crawl completes is served warm. Steps
+skip work that already exists, so warming a crawl that was synced before
+a restart only loads it. Progress is kept per crawl for the status endpoint.
+"""
+
+import asyncio
+import time
+from typing import Optional, Dict, List, Any, Callable, Awaitable, Tuple
+
+from config import config
+
+
+WARM_STATES = ('waiting', 'warming', 'warm', 'failed')
+
+# A warm-up step: (name, async fn(crawl_id, crawl details))
+WarmStep = Tuple[str, Callable[[str, Dict[str, Any]], Awaitable[Any]]]
+
+
+def is_ready(crawl: Optional[Dict[str, Any]]) -> bool:
+    """True once a crawl is finished and its data can be queried."""
+    return bool(crawl) and crawl.get('status') == 'done' and crawl.get('link_status') == 'live'
+
+
+class CrawlWarmup:
+    """Last seen status and warm-up progress of one watched crawl."""
+
+    def __init__(self, project_key: str, crawl_id: str, steps_total: int):
+        self.project_key = project_key
+        self.crawl_id = crawl_id
+        self.status = 'unknown'
+        self.link_status = 'unknown'
+        self.state = 'waiting'
+        self.step: Optional[str] = None
+        self.steps_done = 0
+        self.steps_total = steps_total
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            'project_key': self.project_key,
+            'crawl_id': self.crawl_id,
+            'status': self.status,
+            'link_status': self.link_status,
+            'state': self.state,
+            'step': self.step,
+            'progress': {
+                'done': self.steps_done,
+                'total': self.steps_total,
+                'percent': round(100 * self.steps_done / self.steps_total, 1) if self.steps_total else 0.0
+            },
+            'checked_at': self.checked_at,
+            'elapsed_seconds': round(end - self.started_at, 2) if self.started_at else None,
+            'error': self.error
+        }
+
+
+class CrawlWatcher:
+    """Polls configured crawls in the background and warms each one when it becomes ready."""
+
+    def __init__(
+        self,
+        get_crawl: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        steps: List[WarmStep],
+        interval: Optional[float] = None,
+        invalidate: Optional[Callable[[str], Any]] = None
+    ):
+        self.get_crawl = get_crawl
+        self.steps = steps
+        # Drops a crawl's cached upstream responses (fetched while it ran) before it is warmed
+        self.invalidate = invalidate
+        self.interval = config.CRAWL_WATCH_INTERVAL if interval is None else interval
+        self.last_check: Optional[float] = None
+        self._crawls: Dict[str, CrawlWarmup] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, targets: Callable[[], Dict[str, str]]) -> None:
+        """
+        Start polling `targets()` ({project_key: crawl_id}, re-read every
+        round). No-op when the interval is 0 or the watcher already runs.
+        """
+        if self.interval <= 0 or self.running:
+            return
+        self._task = asyncio.create_task(self._run(targets))
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, targets: Callable[[], Dict[str, str]]) -> None:
+        while True:
+            await self.check_all(targets())
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self, targets: Dict[str, str]) -> None:
+        """Check every target once, warming ready crawls one at a time."""
+        for project_key, crawl_id in targets.items():
+            await self.check(project_key, crawl_id)
+        self.last_check = time.time()
+
+    async def check(self, project_key: str, crawl_id: str) -> CrawlWarmup:
+        """Refresh a crawl's status and warm it if it is ready and not warm yet (failed warm-ups are retried)."""
+        warmup = self._crawls.get(crawl_id)
+        if warmup is None:
+            warmup = self._crawls[crawl_id] = CrawlWarmup(project_key, crawl_id, len(self.steps))
+        warmup.project_key = project_key
+
+        try:
+            crawl = await self.get_crawl(crawl_id)
+        except Exception as e:
+            warmup.error = str(e)
+            return warmup
+        warmup.checked_at = time.time()
+        if crawl:
+            warmup.status = crawl.get('status', 'unknown')
+            warmup.link_status = crawl.get('link_status', 'unknown')
+
+        if is_ready(crawl) and warmup.state in ('waiting', 'failed'):
+            await self._warm(warmup, crawl)
+        return warmup
+
+    async def _warm(self, warmup: CrawlWarmup, crawl: Dict[str, Any]) -> None:
+        warmup.state = 'warming'
+        warmup.steps_done = 0
+        warmup.error = None
+        warmup.started_at = time.time()
+        warmup.finished_at = None
+        if self.invalidate is not None:
+            self.invalidate(warmup.crawl_id)
+        try:
+            for name, step in self.steps:
+                warmup.step = name
+                await step(warmup.crawl_id, crawl)
+                warmup.steps_done += 1
+            warmup.state = 'warm'
+            warmup.step = None
+        except asyncio.CancelledError:
+            warmup.state = 'waiting'
+            raise
+        except Exception as e:
+            warmup.state = 'failed'
+            warmup.error = str(e)
+        finally:
+            warmup.finished_at = time.time()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'last_check': self.last_check,
+            'steps': [name for name, _ in self.steps],
+            'crawls': [warmup.to_dict() for warmup in self._crawls.values()]
+        }
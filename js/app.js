@@ -12,6 +12,25 @@ let currentPage = 1;
 const rowsPerPage = 100;
 let sortColumn = 'priority_score';
 let sortDirection = 'desc';
+let backendConnected = false;
+
+// Server-side paging state (cursor that loads page i is tableCursors[i - 1])
+let tableCursors = [null];
+let totalResults = 0;
+let tableRequest = 0;
+let searchTimer = null;
+
+// Table columns the API can sort by, and category filter values it expects
+const apiSortFields = {
+    'priority_score': 'priority_score',
+    'url': 'url',
+    'inlinks': 'nb_inlinks',
+    'depth': 'depth'
+};
+const apiCategories = {
+    'critical': 'poor',
+    'moderate': 'moderate'
+};
 
 const techLabels = {
     'low_inlinks': 'Low Inlinks',
@@ -73,6 +92,7 @@ async function initializeApp() {
     
     const backendAvailable = await testBackendConnection();
     
+    backendConnected = backendAvailable;
     if (backendAvailable) {
         showToast('Connected to backend!', 'success');
         await loadDashboardData();
@@ -101,41 +121,83 @@ async function testBackendConnection() {
 }
 
 async function loadDashboardData() {
+    const market = document.getElementById('marketFilter')?.value || 'global';
     try {
-        // Load metrics
-        const metrics = await fetchFromAPI('/api/dashboard/metrics');
+        // Load metrics (per-market rollups are precomputed by the backend)
+        const metrics = await fetchFromAPI(`/api/dashboard/metrics?market=${encodeURIComponent(market)}`);
         updateSidebarStats(metrics);
         updateGapsCards(metrics);
         
-        // Load pages
-        const priorityData = await fetchFromAPI('/api/dashboard/priority-pages?limit=1000');
-        
-        pagesData = priorityData.pages.map((page, index) => ({
-            id: index,
-            url: page.url,
-            title: page.title || page.url,
-            priority_score: page.priority_score,
-            bucket: page.technical_gaps.includes('orphaned') || page.technical_gaps.length >= 2 ? 1 : 2,
-            position: null,
-            inlinks: page.nb_inlinks || 0,
-            depth: page.depth || 0,
-            techIssues: page.technical_gaps || [],
-            recommendations: []
-        }));
-        
-        applyFilters();
-        renderPageCards();
-        renderTable();
+        // Load the first page of results; later pages are fetched on demand
+        tableCursors = [null];
+        await loadTablePage(1);
         renderGapsTable();
         
-        showToast(`Loaded ${pagesData.length} pages`, 'success');
+        showToast(`Loaded ${totalResults.toLocaleString()} pages`, 'success');
     } catch (error) {
         console.error('Failed to load data:', error);
         showToast('Failed to load data', 'error');
+        backendConnected = false;
         generateMockData();
     }
 }
 
+function toPageRow(page, index) {
+    return {
+        id: index,
+        url: page.url,
+        title: page.title || page.url,
+        priority_score: page.priority_score,
+        bucket: page.technical_gaps.includes('orphaned') || page.technical_gaps.length >= 2 ? 1 : 2,
+        position: null,
+        inlinks: page.nb_inlinks || 0,
+        depth: page.depth || 0,
+        techIssues: page.in_sitemap === false
+            ? [...(page.technical_gaps || []), 'not_in_sitemap']
+            : page.technical_gaps || [],
+        recommendations: []
+    };
+}
+
+function priorityQueryParams() {
+    const market = document.getElementById('marketFilter')?.value || 'global';
+    const search = document.getElementById('globalSearch')?.value.trim() || '';
+    const techIssue = document.getElementById('techIssueFilter')?.value || 'all';
+    const category = document.getElementById('categoryFilter')?.value || 'all';
+    
+    const params = new URLSearchParams({
+        market: market,
+        sort: apiSortFields[sortColumn] || 'priority_score',
+        order: apiSortFields[sortColumn] ? sortDirection : 'desc'
+    });
+    if (search) params.set('search', search);
+    if (techIssue !== 'all') params.set('gap', techIssue);
+    if (apiCategories[category]) params.set('category', apiCategories[category]);
+    return params;
+}
+
+async function loadTablePage(pageNumber) {
+    const params = priorityQueryParams();
+    params.set('limit', rowsPerPage);
+    const cursor = tableCursors[pageNumber - 1];
+    if (cursor) params.set('cursor', cursor);
+    
+    // Drop responses that arrive after a newer request (e.g. while typing a search)
+    const request = ++tableRequest;
+    const data = await fetchFromAPI(`/api/dashboard/priority-pages?${params}`);
+    if (request !== tableRequest) return;
+    
+    const offset = (pageNumber - 1) * rowsPerPage;
+    pagesData = data.pages.map((page, index) => toPageRow(page, offset + index));
+    filteredData = pagesData;
+    tableCursors[pageNumber] = data.next_cursor;
+    totalResults = data.total_matches;
+    currentPage = pageNumber;
+    
+    renderTable();
+    renderPageCards();
+}
+
 function generateMockData() {
     const urls = [
         '/us/blog/payment-processing', '/us/guides/pos-systems', '/au/products/invoices',
@@ -201,6 +263,13 @@ function updateGapsCards(metrics) {
 // Filtering
 // ========================================
 function applyFilters() {
+    if (backendConnected) {
+        // Filtering, sorting and paging happen on the server
+        tableCursors = [null];
+        loadTablePage(1).catch(() => showToast('Failed to load pages', 'error'));
+        return;
+    }
+    
     const search = document.getElementById('globalSearch')?.value.toLowerCase() || '';
     const market = document.getElementById('marketFilter')?.value || 'global';
     const techIssue = document.getElementById('techIssueFilter')?.value || 'all';
@@ -235,7 +304,16 @@ function applyFilters() {
 }
 
 function handleSearch() {
-    applyFilters();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(applyFilters, backendConnected ? 250 : 0);
+}
+
+function handleMarketChange() {
+    if (backendConnected) {
+        loadDashboardData();
+    } else {
+        applyFilters();
+    }
 }
 
 // ========================================
@@ -314,7 +392,7 @@ function renderDetailsPanel() {
         { key: 'low_inlinks', label: 'Sufficient Inlinks (≥3)' },
         { key: 'orphaned', label: 'Not Orphaned' },
         { key: 'deep_page', label: 'Not Too Deep (≤3)' },
-        { key: 'not_in_sitemap', label: 'In Sitemap' }
+        { key: 'not_in_sitemap', label: 'Not in Sitemap' }
     ];
     
     document.getElementById('techChecklist').innerHTML = techItems.map(item => `
@@ -342,9 +420,10 @@ function renderDetailsPanel() {
 function renderTable() {
     const tbody = document.getElementById('tableBody');
     
-    // Pagination
-    const totalPages = Math.ceil(filteredData.length / rowsPerPage);
-    const start = (currentPage - 1) * rowsPerPage;
+    // Pagination (backend results hold just the current page)
+    const total = backendConnected ? totalResults : filteredData.length;
+    const totalPages = Math.ceil(total / rowsPerPage);
+    const start = backendConnected ? 0 : (currentPage - 1) * rowsPerPage;
     const end = Math.min(start + rowsPerPage, filteredData.length);
     const pageData = filteredData.slice(start, end);
     
@@ -371,10 +450,10 @@ function renderTable() {
     }).join('');
     
     // Update results count
-    document.getElementById('resultsCount').textContent = `${filteredData.length} results`;
+    document.getElementById('resultsCount').textContent = `${total} results`;
     
     // Update pagination
-    renderPagination(filteredData.length, totalPages);
+    renderPagination(total, totalPages);
 }
 
 function renderPagination(total, totalPages) {
@@ -398,6 +477,10 @@ function renderPagination(total, totalPages) {
     const maxPages = 5;
     let startPage = Math.max(1, currentPage - 2);
     let endPage = Math.min(totalPages, startPage + maxPages - 1);
+    if (backendConnected) {
+        // Cursor paging can only reach pages up to the next one
+        endPage = Math.min(endPage, currentPage + 1);
+    }
     
     for (let i = startPage; i <= endPage; i++) {
         pagesHTML += `<button class="pagination-page ${i === currentPage ? 'active' : ''}" onclick="goToPage(${i})">${i}</button>`;
@@ -407,11 +490,14 @@ function renderPagination(total, totalPages) {
 }
 
 function changePage(delta) {
-    currentPage += delta;
-    renderTable();
+    goToPage(currentPage + delta);
 }
 
 function goToPage(page) {
+    if (backendConnected) {
+        loadTablePage(page).catch(() => showToast('Failed to load pages', 'error'));
+        return;
+    }
     currentPage = page;
     renderTable();
 }
@@ -424,7 +510,7 @@ function sortTable(column) {
         sortDirection = 'desc';
     }
     applyFilters();
-    renderTable();
+    if (!backendConnected) renderTable();
 }
 
 function viewPage(pageId) {
@@ -457,7 +543,7 @@ function openModal(page) {
         { key: 'low_inlinks', label: 'Sufficient Inlinks (≥3)' },
         { key: 'orphaned', label: 'Not Orphaned' },
         { key: 'deep_page', label: 'Not Too Deep (≤3)' },
-        { key: 'not_in_sitemap', label: 'In Sitemap' }
+        { key: 'not_in_sitemap', label: 'Not in Sitemap' }
     ];
     
     document.getElementById('modalTechChecklist').innerHTML = techItems.map(item => `
@@ -556,6 +642,16 @@ function testConnections() {
 // Export
 // ========================================
 function exportCSV() {
+    // Full export of the current filters, streamed by the backend
+    if (backendConnected) {
+        const a = document.createElement('a');
+        a.href = `${API_BASE_URL}/api/export/priority-pages.csv?${priorityQueryParams()}`;
+        a.download = 'internal-linking-report.csv';
+        a.click();
+        showToast('CSV export started', 'success');
+        return;
+    }
+    
     const headers = ['URL', 'Score', 'Category', 'Inlinks', 'Depth', 'Tech Issues'];
     const rows = filteredData.map(p => [
         p.url,